@@ -0,0 +1,35 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def repeat_fragment(fragment: str, megabytes: float) -> str:
+	"""Glues numbered copies of the fragment (it must contain two '%d')
+	until the result reaches the size."""
+	parts = []
+	size = 0
+	i = 0
+	while size < megabytes * 1024 * 1024:
+		part = fragment % (i, i)
+		parts.append(part)
+		size += len(part)
+		i += 1
+	return "".join(parts)
+
+
+def measure(name, func, source: str) -> float:
+	started = time.perf_counter()
+	count = sum(1 for _ in func(source))
+	elapsed = time.perf_counter() - started
+	mb = len(source) / 1024 / 1024
+	print(f"{name:>10}: {elapsed:7.3f} s  {mb / elapsed:8.2f} MB/s  {count} comments")
+	return elapsed
+
+
+def megabytes_arg(default: float) -> float:
+	return float(sys.argv[1]) if len(sys.argv) > 1 else default
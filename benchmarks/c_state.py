@@ -0,0 +1,35 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares the throughput of the C/Go skip-scanning engine with the
+character-by-character state machine it replaced.
+
+    python benchmarks/c_state.py [megabytes]
+"""
+
+from _common import repeat_fragment, measure, megabytes_arg
+
+from commie.parsers.c_parser_state import iter_comments_c, _iter_comments_stepwise
+
+FRAGMENT = """
+/**
+ * Generated accessor. Do not edit.
+ */
+static const char* name_%d(void) {
+	// the literal below contains comment markers
+	return "/* not a comment */ // neither";
+}
+
+int ratio_%d = width / height; /* inline */ char c = '\\'';
+"""
+
+
+def main():
+	source = repeat_fragment(FRAGMENT, megabytes_arg(4))
+	stepwise = measure("stepwise", lambda s: _iter_comments_stepwise(s, "\"'"), source)
+	engine = measure("engine", iter_comments_c, source)
+	print(f"speedup: {stepwise / engine:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
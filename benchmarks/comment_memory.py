@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures how much memory stays allocated when the comments of many
+sources are kept: as they come from the parser, and detached.
+
+    python benchmarks/comment_memory.py [files]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+import _common  # noqa
+
+from commie import iter_comments_c
+
+# about one comment per ten lines, as in typical code
+FRAGMENT = """
+/* accessor %d */
+static int value_%d(struct context *ctx, int first, int second) {
+	int result = compute(ctx, first, second);
+	if (result < 0) {
+		log_error(ctx, "compute failed", result);
+		return result;
+	}
+	result += compute(ctx, second, first);
+	ctx->last_result = result;
+	return result;
+}
+"""
+
+
+def make_source(seed: int) -> str:
+	return "".join(FRAGMENT % (seed, i) for i in range(1000))
+
+
+def retained(files: int, detach: bool) -> int:
+	gc.collect()
+	tracemalloc.start()
+	kept = []
+	for seed in range(files):
+		comments = list(iter_comments_c(make_source(seed)))
+		if detach:
+			comments = [c.detach() for c in comments]
+		kept.append(comments)
+		del comments
+	gc.collect()
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return current
+
+
+def main():
+	files = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	source_size = len(make_source(0))
+	print(f"{files} sources of {source_size // 1024} KB, 1000 comments each")
+	for detach in (False, True):
+		mb = retained(files, detach) / 1024 / 1024
+		name = "detached" if detach else "attached"
+		print(f"{name:>10}: {mb:8.2f} MB retained")
+
+
+if __name__ == "__main__":
+	main()
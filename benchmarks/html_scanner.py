@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares the HTML/XML comment scanner with the regex it replaced on an
+XML dump of the given size, with and without an unterminated comment at
+the end.
+
+    python benchmarks/html_scanner.py [megabytes]
+
+The regex is only timed on dumps up to 64 MB: on multi-hundred-MB inputs it
+takes minutes.
+"""
+
+import time
+
+from _common import repeat_fragment, megabytes_arg
+
+from commie import UnterminatedCommentError
+from commie.parsers.html_parser_regex import extract_comments, _extract_comments_regex
+
+FRAGMENT = """<record id="%d">
+  <!-- exported by the nightly job -->
+  <title lang="en">Item %d</title>
+  <note>He said "see <!-- inline --> below</note>
+</record>
+"""
+
+REGEX_LIMIT_MB = 64
+
+
+def measure(name, func, source: str) -> float:
+	started = time.perf_counter()
+	count = 0
+	try:
+		for _ in func(source):
+			count += 1
+	except UnterminatedCommentError:
+		pass
+	elapsed = time.perf_counter() - started
+	mb = len(source) / 1024 / 1024
+	print(f"{name:>24}: {elapsed:8.3f} s  {mb / elapsed:8.2f} MB/s  {count} comments")
+	return elapsed
+
+
+def main():
+	megabytes = megabytes_arg(16)
+	dump = repeat_fragment(FRAGMENT, megabytes)
+	print(f"XML dump, {megabytes} MB")
+	measure("scanner", extract_comments, dump)
+	if megabytes <= REGEX_LIMIT_MB:
+		measure("regex", _extract_comments_regex, dump)
+
+	unterminated = dump + "<!-- never closed " + "x" * 1000
+	print("unterminated comment at the end")
+	measure("scanner", extract_comments, unterminated)
+	if megabytes <= REGEX_LIMIT_MB:
+		measure("regex", _extract_comments_regex, unterminated)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,50 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares parsing a source in full after each keystroke with the
+incremental parse of IncrementalComments.
+
+    python benchmarks/incremental_edit.py [lines]
+"""
+
+import sys
+import time
+
+import _common  # noqa
+
+from commie import IncrementalComments, iter_comments_c
+
+FRAGMENT = """
+/* accessor %d */
+static int value_%d(struct context *ctx) {
+	return compute(ctx, "value", 1);  // the first one
+}
+"""
+
+KEYSTROKES = 200
+
+
+def main():
+	lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+	source = "".join(FRAGMENT % (i, i) for i in range(lines // FRAGMENT.count("\n")))
+	offset = source.index("return", len(source) // 2)
+	print(f"{source.count(chr(10))} lines, {KEYSTROKES} keystrokes in the middle")
+
+	started = time.perf_counter()
+	text = source
+	for i in range(KEYSTROKES):
+		text = text[:offset + i] + "x" + text[offset + i:]
+		comments = list(iter_comments_c(text))
+	full = (time.perf_counter() - started) / KEYSTROKES
+	print(f"{'full':>12}: {full * 1000:8.3f} ms per keystroke  {len(comments)} comments")
+
+	incremental = IncrementalComments(source, "a.c")
+	started = time.perf_counter()
+	for i in range(KEYSTROKES):
+		comments = incremental.edit(offset + i, 0, "x")
+	elapsed = (time.perf_counter() - started) / KEYSTROKES
+	print(f"{'incremental':>12}: {elapsed * 1000:8.3f} ms per keystroke  {len(comments)} comments")
+
+
+if __name__ == "__main__":
+	main()
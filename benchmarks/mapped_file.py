@@ -0,0 +1,53 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares reading a large file with memory-mapping it: time and the peak
+of memory allocated by Python (mapped pages are not counted, they belong to
+the page cache).
+
+    python benchmarks/mapped_file.py [megabytes]
+"""
+
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _common import repeat_fragment, megabytes_arg
+
+from commie import iter_comments_file
+
+FRAGMENT = """
+/* record %d */
+INSERT INTO "events" VALUES (%d, 'сообщение', '2021-05-01', "payload", 42);
+INSERT INTO "events" VALUES (0, 'message', '2021-05-01', "payload", 42);
+INSERT INTO "events" VALUES (0, 'message', '2021-05-01', "payload", 42);
+"""
+
+
+def run(file: Path, mapped: bool):
+	started = time.perf_counter()
+	count = sum(1 for _ in iter_comments_file(file, mapped=mapped))
+	elapsed = time.perf_counter() - started
+	# tracing slows down the parsing, so it is a separate run
+	tracemalloc.start()
+	for _ in iter_comments_file(file, mapped=mapped):
+		pass
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	name = "mapped" if mapped else "read"
+	print(f"{name:>10}: {elapsed:7.3f} s  peak {peak / 1024 / 1024:8.2f} MB  {count} comments")
+
+
+def main():
+	megabytes = megabytes_arg(64)
+	with tempfile.TemporaryDirectory() as tmp:
+		file = Path(tmp) / "dump.c"
+		file.write_text(repeat_fragment(FRAGMENT, megabytes), encoding="utf-8")
+		print(f"{file.stat().st_size / 1024 / 1024:.1f} MB file")
+		for mapped in (False, True):
+			run(file, mapped)
+
+
+if __name__ == "__main__":
+	main()
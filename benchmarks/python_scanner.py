@@ -0,0 +1,47 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares the Python comment scanner with the tokenize-based extraction.
+The corpus is the standard library of the running interpreter.
+
+    python benchmarks/python_scanner.py
+"""
+
+import time
+import tokenize
+from pathlib import Path
+
+import _common  # noqa
+
+from commie.parsers.python_parser import extract_comments, _extract_comments_tokenize
+
+
+def load_corpus():
+	sources = []
+	for file in sorted(Path(tokenize.__file__).parent.glob("*.py")):
+		try:
+			sources.append(file.read_text(encoding="utf-8"))
+		except UnicodeDecodeError:
+			pass
+	return sources
+
+
+def measure(name, func, sources) -> float:
+	started = time.perf_counter()
+	count = sum(sum(1 for _ in func(s)) for s in sources)
+	elapsed = time.perf_counter() - started
+	mb = sum(len(s) for s in sources) / 1024 / 1024
+	print(f"{name:>10}: {elapsed:7.3f} s  {mb / elapsed:8.2f} MB/s  {count} comments")
+	return elapsed
+
+
+def main():
+	sources = load_corpus()
+	print(f"{len(sources)} files")
+	slow = measure("tokenize", _extract_comments_tokenize, sources)
+	fast = measure("scanner", extract_comments, sources)
+	print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
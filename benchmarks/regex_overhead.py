@@ -0,0 +1,53 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures the fixed per-call cost of the regex parsers on tiny inputs:
+with the pattern compiled once at import (now) and with the pattern looked
+up in the `re` cache on every call (as it was before).
+
+    python benchmarks/regex_overhead.py
+"""
+
+import re
+import timeit
+
+import _common  # noqa
+
+from commie.parsers import (c_parser_regex, css_parser_regex, html_parser_regex,
+							ruby_parser_regex)
+
+# the HTML parser is a scanner now: its regex is kept only as the reference
+SMALL_INPUTS = [
+	(c_parser_regex, c_parser_regex.extract_comments, "a { color: red; } // note\n"),
+	(css_parser_regex, css_parser_regex.extract_comments, "a { color: red; } /* note */\n"),
+	(html_parser_regex, html_parser_regex._extract_comments_regex, "<p>hi</p><!-- note -->\n"),
+	(ruby_parser_regex, ruby_parser_regex.extract_comments, "puts 'hi' # note\n"),
+]
+
+
+def main():
+	number = 20000
+	for module, extract, code in SMALL_INPUTS:
+		pattern = module._PATTERN
+
+		def before():
+			# what every call did before: rebuild or look up the pattern
+			re.compile(pattern.pattern, pattern.flags)
+			return list(extract(code))
+
+		def after():
+			return list(extract(code))
+
+		def lookup():
+			re.compile(pattern.pattern, pattern.flags)
+
+		t_before = min(timeit.repeat(before, number=number, repeat=5)) / number * 1e6
+		t_after = min(timeit.repeat(after, number=number, repeat=5)) / number * 1e6
+		t_lookup = min(timeit.repeat(lookup, number=number, repeat=5)) / number * 1e6
+		name = module.__name__.rpartition(".")[-1]
+		print(f"{name:>20}: before {t_before:6.2f} µs/call  after {t_after:6.2f} µs/call  "
+			  f"(pattern lookup alone {t_lookup:4.2f} µs)")
+
+
+if __name__ == "__main__":
+	main()
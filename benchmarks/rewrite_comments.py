@@ -0,0 +1,45 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures strip_comments and replace_comments on sources with more and
+more comments. The time per comment should not grow with the number of
+comments, unlike replacing them one by one by slicing the source.
+
+    python benchmarks/rewrite_comments.py [comments]
+"""
+
+import sys
+import time
+
+import _common  # noqa
+
+from commie import iter_comments_str, replace_comments, strip_comments
+
+LINE = "int a; /* b */ // c\n"
+
+
+def by_slicing(source: str) -> str:
+	for comment in reversed(list(iter_comments_str(source, "a.c"))):
+		start, end = comment.code_span
+		source = source[:start] + source[end:]
+	return source
+
+
+def main():
+	largest = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+	for comments in (largest // 16, largest // 4, largest):
+		source = LINE * (comments // 2)
+		for name, func in [("strip", lambda: strip_comments(source, "a.c")),
+						   ("replace", lambda: replace_comments(source, "a.c", lambda c: "")),
+						   ("slicing", lambda: by_slicing(source))]:
+			if name == "slicing" and comments > 50_000:
+				continue  # quadratic
+			started = time.perf_counter()
+			func()
+			elapsed = time.perf_counter() - started
+			print(f"{comments:>8} comments {name:>8}: {elapsed:7.3f} s  "
+				  f"{elapsed / comments * 1e6:6.2f} µs per comment")
+
+
+if __name__ == "__main__":
+	main()
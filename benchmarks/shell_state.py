@@ -0,0 +1,32 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Compares the throughput of the shell regex engine with the
+character-by-character state machine it replaced.
+
+    python benchmarks/shell_state.py [megabytes]
+"""
+
+from _common import repeat_fragment, measure, megabytes_arg
+
+from commie.parsers.shell_parser_state import extract_comments, _extract_comments_stepwise
+
+FRAGMENT = """
+# step %d: render the config
+cat > "/etc/app/step.conf" <<EOF
+listen = 0.0.0.0:80   # heredoc lines are scanned as code
+name = 'build #%d'
+EOF
+echo "done \\"quoted\\" # not a comment" # trailing comment
+"""
+
+
+def main():
+	source = repeat_fragment(FRAGMENT, megabytes_arg(4))
+	stepwise = measure("stepwise", _extract_comments_stepwise, source)
+	engine = measure("engine", extract_comments, source)
+	print(f"speedup: {stepwise / engine:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
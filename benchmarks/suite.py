@@ -0,0 +1,280 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Measures every parser and the glue on synthetic corpora: throughput
+(MB/s and comments/s) and the peak of memory allocated by Python. The
+corpora are generated from a fixed seed, so results of different runs and
+different versions can be compared.
+
+    python benchmarks/suite.py [--size MB] [--repeat N] [--only NAME ...]
+                               [--output results.json] [--compare old.json]
+
+Every result is identified by "language/corpus" (and "glue/language" for
+`group_singleline_comments`, where the items are groups, not comments). With --compare the times are printed as a
+ratio to the same results of an older run: above 1.0 is slower.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import _common  # noqa
+
+from commie import *
+
+SEED = 2021
+POOL_SIZE = 1000
+
+
+class Syntax(NamedTuple):
+	func: Callable
+	line: Optional[str]  # starts a single-line comment
+	block: Optional[tuple]  # opens and closes a multi-line comment
+	quote: str
+	skips_strings: bool = True  # comment markers in strings are not comments
+
+
+LANGUAGES: Dict[str, Syntax] = {
+	"c": Syntax(iter_comments_c, "//", ("/*", "*/"), '"'),
+	"go": Syntax(iter_comments_go, "//", ("/*", "*/"), "`"),
+	"sass": Syntax(iter_comments_sass, "//", ("/*", "*/"), '"'),
+	"css": Syntax(iter_comments_css, None, ("/*", "*/"), '"', skips_strings=False),
+	"html": Syntax(iter_comments_html, None, ("<!--", "-->"), '"'),
+	"ruby": Syntax(iter_comments_ruby, "#", ("\n=begin\n", "\n=end\n"), '"'),
+	"shell": Syntax(iter_comments_shell, "#", None, "'"),
+	"python": Syntax(iter_comments_python, "#", None, '"'),
+}
+
+WORDS = ["value", "result", "index", "buffer", "context", "ёлка", "日本", "name",
+		 "count", "width", "/", "*", "-", "<", ">", "=", "!"]
+
+
+def _words(rnd: random.Random, n: int) -> str:
+	return " ".join(rnd.choices(WORDS, k=n))
+
+
+def _code(rnd: random.Random, syntax: Syntax, strings: int = 1) -> str:
+	"""A line of code with string literals. The strings contain comment
+	markers, if the parser must skip them."""
+	markers = [m for m in (syntax.line, *(syntax.block or ())) if m]
+	if not syntax.skips_strings:
+		markers = ["-"]
+	parts = [f"x{rnd.randrange(1000)} = {rnd.randrange(1000)}"]
+	for _ in range(strings):
+		marker = rnd.choice(markers).strip()
+		parts.append(f"{syntax.quote}{_words(rnd, 2)} {marker} {_words(rnd, 2)}{syntax.quote}")
+	return " + ".join(parts)
+
+
+def _comment(rnd: random.Random, syntax: Syntax, multiline: bool) -> str:
+	if syntax.line is None or (multiline and syntax.block is not None):
+		opening, closing = syntax.block  # type: ignore
+		return f"{opening} {_words(rnd, 6)}\n{_words(rnd, 4)} {closing}"
+	return f"{syntax.line} {_words(rnd, 8)}"
+
+
+class _Pool(NamedTuple):
+	"""Random lines to pick from: generating every line of a corpus takes
+	longer than parsing it."""
+	lines: List[str]
+	cum_weights: List[int]
+	average: float
+
+
+def _pool(rnd: random.Random, syntax: Syntax, comment_every: int, strings: int) -> _Pool:
+	comments = [_comment(rnd, syntax, multiline=i % 4 == 0) for i in range(POOL_SIZE)]
+	code = [_code(rnd, syntax, strings) for _ in range(POOL_SIZE)]
+	weights = [1] * len(comments) + [comment_every - 1] * len(code)
+	lines = comments + code
+	average = sum(len(line) * w for line, w in zip(lines, weights)) / sum(weights) + 1
+	return _Pool(lines, list(itertools.accumulate(weights)), average)
+
+
+def _lines(rnd: random.Random, pool: _Pool, size: int) -> str:
+	count = int(size / pool.average) + 1
+	return "\n".join(rnd.choices(pool.lines, cum_weights=pool.cum_weights, k=count)) + "\n"
+
+
+def comment_heavy(rnd, syntax: Syntax, size: int) -> List[str]:
+	return [_lines(rnd, _pool(rnd, syntax, comment_every=2, strings=0), size)]
+
+
+def string_heavy(rnd, syntax: Syntax, size: int) -> List[str]:
+	return [_lines(rnd, _pool(rnd, syntax, comment_every=20, strings=4), size)]
+
+
+def huge_file(rnd, syntax: Syntax, size: int) -> List[str]:
+	return [_lines(rnd, _pool(rnd, syntax, comment_every=5, strings=1), size * 8)]
+
+
+def tiny_files(rnd, syntax: Syntax, size: int) -> List[str]:
+	pool = _pool(rnd, syntax, comment_every=3, strings=1)
+	sources = []
+	total = 0
+	while total < size:
+		sources.append(_lines(rnd, pool, 200))
+		total += len(sources[-1])
+	return sources
+
+
+def minified(rnd, syntax: Syntax, size: int) -> List[str]:
+	"""Long lines. Where a multi-line comment does not need line breaks,
+	the whole source is a single line."""
+	code = [_code(rnd, syntax, 2) + ";" for _ in range(POOL_SIZE)]
+	inline = syntax.block is not None and "\n" not in syntax.block[0]
+	if inline:
+		opening, closing = syntax.block  # type: ignore
+		comments = [f"{opening}{_words(rnd, 3)}{closing}" for _ in range(POOL_SIZE)]
+		# a comment after every eighth statement
+		weights = [1] * POOL_SIZE + [7] * POOL_SIZE
+		average = (sum(map(len, comments)) + sum(map(len, code)) * 7) / (POOL_SIZE * 8)
+		return ["".join(rnd.choices(comments + code, weights, k=int(size / average) + 1))]
+	# only the line comments: one at the end of each 64 KB line
+	per_line = 64 * 1024 * POOL_SIZE // sum(map(len, code))
+	lines = ["".join(rnd.choices(code, k=per_line)) + f" {syntax.line} end"
+			 for _ in range(max(1, size // (64 * 1024)))]
+	return ["\n".join(lines) + "\n"]
+
+
+def unterminated(rnd, syntax: Syntax, size: int) -> List[str]:
+	"""Code that opens a comment (or a string, if there are no multi-line
+	comments) and never closes it, the parser looks for the end in vain."""
+	opening = syntax.block[0] if syntax.block else syntax.quote
+	body = _lines(rnd, _pool(rnd, syntax, comment_every=10, strings=0), size)
+	if syntax.block:
+		body = body.replace(syntax.block[1].strip(), "")
+	body = body.replace(syntax.quote, "")
+	return [_code(rnd, syntax) + "\n" + opening + body]
+
+
+CORPORA: Dict[str, Callable[[random.Random, Syntax, int], List[str]]] = {
+	"comment_heavy": comment_heavy,
+	"string_heavy": string_heavy,
+	"huge_file": huge_file,
+	"tiny_files": tiny_files,
+	"minified": minified,
+	"unterminated": unterminated,
+}
+
+
+def _run(func: Callable[[str], Iterable], sources: List[str]) -> tuple:
+	"""Returns the number of items and the name of the error."""
+	count = 0
+	error = None
+	for source in sources:
+		try:
+			for _ in func(source):
+				count += 1
+		except Exception as e:
+			error = type(e).__name__
+	return count, error
+
+
+def measure(name: str, func: Callable[[str], Iterable], sources: List[str],
+			repeat: int) -> dict:
+	size = sum(len(s.encode("utf-8")) for s in sources)
+	best = float("inf")
+	count, error = 0, None
+	for _ in range(repeat):
+		started = time.perf_counter()
+		count, error = _run(func, sources)
+		best = min(best, time.perf_counter() - started)
+	# tracing slows down the parsing, so it is a separate run
+	tracemalloc.start()
+	_run(func, sources)
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	best = max(best, 1e-9)
+	return {"name": name, "files": len(sources), "bytes": size, "items": count,
+			"error": error, "seconds": best, "mb_per_s": size / 1024 / 1024 / best,
+			"items_per_s": count / best, "peak_bytes": peak}
+
+
+def _glue(func: Callable, sources: List[str]) -> Callable[[str], Iterable]:
+	# the comments are found before the measured calls
+	found = {source: list(func(source)) for source in sources}
+	return lambda source: group_singleline_comments(found[source])
+
+
+def benchmarks(size: int, only: List[str] = None) -> Iterable[tuple]:
+	"""Yields (name, function, sources) of the benchmarks whose names
+	contain one of the `only` strings (of all, if `only` is empty)."""
+
+	def selected(name: str) -> bool:
+		return not only or any(part in name for part in only)
+
+	for language, syntax in LANGUAGES.items():
+		for corpus, generate in CORPORA.items():
+			name = f"{language}/{corpus}"
+			if selected(name):
+				rnd = random.Random(f"{SEED}/{name}")
+				yield name, syntax.func, generate(rnd, syntax, size)
+	for language, syntax in LANGUAGES.items():
+		name = f"glue/{language}"
+		if selected(name):
+			rnd = random.Random(f"{SEED}/{language}/comment_heavy")
+			sources = comment_heavy(rnd, syntax, size)
+			yield name, _glue(syntax.func, sources), sources
+
+
+def _revision() -> Optional[str]:
+	try:
+		return subprocess.run(["git", "describe", "--always", "--dirty"],
+							  cwd=Path(__file__).parent, capture_output=True,
+							  text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmarks of the commie parsers.")
+	parser.add_argument("--size", type=float, default=1.0,
+						help="megabytes of each corpus (the huge file is 8 times larger)")
+	parser.add_argument("--repeat", type=int, default=3, help="the best of N runs is taken")
+	parser.add_argument("--only", nargs="*", default=None,
+						help="run only the benchmarks whose name contains one of these")
+	parser.add_argument("--output", type=Path, help="save the results as JSON")
+	parser.add_argument("--compare", type=Path, help="JSON results of an earlier run")
+	args = parser.parse_args()
+
+	old: Dict[str, dict] = {}
+	if args.compare:
+		old = {r["name"]: r for r in json.loads(args.compare.read_text())["results"]}
+
+	results = []
+	for name, func, sources in benchmarks(int(args.size * 1024 * 1024), args.only):
+		result = measure(name, func, sources, args.repeat)
+		results.append(result)
+		line = (f"{name:>22}: {result['seconds']:7.3f} s  {result['mb_per_s']:8.2f} MB/s  "
+				f"{result['items_per_s']:10.0f} items/s  "
+				f"peak {result['peak_bytes'] / 1024:9.1f} KB")
+		if result["error"]:
+			line += f"  {result['error']}"
+		if name in old:
+			line += f"  x{result['seconds'] / old[name]['seconds']:.2f}"
+		print(line, flush=True)
+
+	if args.output:
+		report = {
+			"created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+			"revision": _revision(),
+			"python": sys.version,
+			"platform": platform.platform(),
+			"size": args.size,
+			"repeat": args.repeat,
+			"results": results,
+		}
+		args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+	main()
@@ -1,5 +1,20 @@
 from .parsers import *
-from .x01_common import Comment, Span
+from .x01_common import Comment, Span, LineIndex
+from .x01_filter import CommentFilter
 from .x01_errors import *
-from .x02_detector import iter_comments_str, iter_comments_file, iter_comments
+from .x02_cache import CommentCache, CacheStats
+from .x02_stats import ParseEvent, ParseStats, ParserCounters, add_observer, remove_observer
+from .x02_detector import iter_comments_str, iter_comments_file, iter_comments, \
+	register_language, register_extension
+from .x03_bytes import iter_comments_bytes, ByteComment
 from .x03_glue import group_singleline_comments
+from .x03_pipeline import FileComments
+from .x03_rewrite import strip_comments, replace_comments
+from .x04_tree import scan_tree
+from .x04_many import iter_comments_many, SourceComments
+from .x05_stream import iter_comments_stream
+from .x06_incremental import IncrementalComments
+from .x07_async import aiter_comments_file, aiter_comments_many
+from .x08_blobs import scan_blobs
+from .x09_git import scan_git
+from .x10_archive import scan_archive
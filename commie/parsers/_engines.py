@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Span engines of the parsers.
+
+An engine is called as `engine(source, pos=0, final=True)`. The source is a
+str or a bytes-like object (mmap included). The engine yields the spans of
+the comments that start at `pos` or later as tuples
+`(code_start, code_end, text_start, text_end, multiline)`.
+
+When `final` is False, more code may follow the source. Then the engine
+yields only the comments that cannot change, and returns the position from
+which the scan must be resumed once the code is longer. For a final source
+it returns the length of the source.
+
+Comment markers of all these languages are ASCII, so the engines find the
+same comments in str and in its UTF-8 bytes.
+"""
+
+from typing import Any, Callable, Dict, Generator, Optional
+
+from commie.parsers import *
+from commie.parsers import c_parser_regex, c_parser_state, css_parser_regex, \
+	html_parser_regex, ruby_parser_regex, shell_parser_state
+from commie.parsers._helper import SpanTuple
+
+SpanEngine = Callable[..., Generator[SpanTuple, None, int]]
+
+_ENGINES: Dict[Any, SpanEngine] = {
+	iter_comments_c: c_parser_state._iter_spans_c,
+	iter_comments_go: c_parser_state._iter_spans_go,
+	iter_comments_sass: c_parser_regex._iter_spans,
+	iter_comments_css: css_parser_regex._iter_spans,
+	iter_comments_html: html_parser_regex._iter_spans,
+	iter_comments_ruby: ruby_parser_regex._iter_spans,
+	iter_comments_shell: shell_parser_state._iter_spans,
+}
+
+
+def span_engine(func: Callable) -> Optional[SpanEngine]:
+	"""Returns the span engine of the parser function, or None if the parser
+	has no engine (it works only with complete str sources)."""
+	return _ENGINES.get(func)
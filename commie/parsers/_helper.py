@@ -2,20 +2,124 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import re
+from typing import AnyStr, Collection, Dict, Iterable, Iterator, Pattern, Tuple, Union
 
-from commie.x01_common import Comment, Span
+from commie.x01_common import Comment, Span, LineIndex
+from commie.x01_filter import CommentFilter
 
+# (code_start, code_end, text_start, text_end, multiline)
+SpanTuple = Tuple[int, int, int, int, bool]
 
-def matchGroupToComment(match: re.Match, groupName: str, multiline: bool) -> Comment:
-	fullSpan = match.span()
+_compiledPatterns: Dict[Tuple[Union[str, bytes], int], Pattern] = {}
 
-	fullText = match.group(0)
-	innerText = match.group(groupName)
-	textStart = fullText.index(innerText)
+
+def compiledPattern(pattern: AnyStr, flags: int = re.VERBOSE | re.MULTILINE) -> Pattern:
+	"""Compiles the pattern once per process. Regex parsers call it at import,
+	so extracting comments does not look the pattern up in the `re` cache
+	(or rebuild it after the cache overflows) on every call."""
+	key = (pattern, flags)
+	compiled = _compiledPatterns.get(key)
+	if compiled is None:
+		compiled = _compiledPatterns[key] = re.compile(pattern, flags)
+	return compiled
+
+
+def bytesPattern(pattern: Pattern) -> Pattern:
+	"""The same pattern for scanning bytes (including mmap). The pattern
+	must be ASCII: a UTF-8 sequence never contains ASCII bytes, so the
+	bytes pattern finds the same matches as the str one."""
+	return compiledPattern(pattern.pattern.encode("ascii"), pattern.flags & ~re.UNICODE)
+
+
+def matchGroupToComment(match: re.Match, groupName: str, multiline: bool,
+						lineIndex: LineIndex = None) -> Comment:
+	# the spans are taken from the match as is: no substrings are created
+	codeStart, codeEnd = match.span()
+	textStart, textEnd = match.span(groupName)
 	assert textStart >= 0
 
 	return Comment(
 		match.string,
-		text_span=Span(fullSpan[0] + textStart, fullSpan[0] + textStart + len(innerText)),
-		code_span=Span(fullSpan[0], fullSpan[1]),
-		multiline=multiline)
+		text_span=Span(textStart, textEnd),
+		code_span=Span(codeStart, codeEnd),
+		multiline=multiline,
+		line_index=lineIndex)
+
+
+def completeLinesEnd(source: Union[str, bytes], pos: int) -> int:
+	"""Returns the position after the last newline of the source (but not
+	before `pos`). Regex parsers that see only single-line literals scan
+	unfinished code up to there."""
+	if isinstance(source, str):
+		return max(pos, source.rfind("\n", pos) + 1)
+	return max(pos, source.rfind(b"\n", pos) + 1)
+
+
+class LineMatches:
+	"""Iterates over the matches of a regex parser whose literals do not span
+	lines. Then `resume` is the position from which the scan must be resumed.
+
+	If the source is not final, a match on its unfinished last line is
+	yielded only if it cannot change: it ends before the end of the source,
+	no quote before it (on that line) is waiting for its pair, and it is not
+	of the `growing` groups (that may extend to a quote further on the line).
+	So on a long line the scan stops at an unpaired quote, not at the line
+	start."""
+
+	def __init__(self, pattern: Pattern, quotes: Pattern, source: Union[str, bytes], pos: int,
+				 final: bool, growing: Collection[str] = ()):
+		self.pattern = pattern
+		self.quotes = quotes
+		self.source = source
+		self.pos = pos
+		self.final = final
+		self.growing = growing
+		self.resume = len(source)
+
+	def __iter__(self) -> Iterator[re.Match]:
+		if self.final:
+			return self.pattern.finditer(self.source, self.pos)
+		return self._iter_unfinished()
+
+	def _iter_unfinished(self) -> Iterator[re.Match]:
+		source, quotes = self.source, self.quotes
+		lines = completeLinesEnd(source, self.pos)
+		last = self.pos
+		for match in self.pattern.finditer(source, self.pos):
+			start = match.start()
+			if start >= lines or match.end() == len(source):
+				unpaired = quotes.search(source, max(last, lines), start)
+				if unpaired is not None:
+					self.resume = unpaired.start()
+					return
+				if match.end() == len(source) or match.lastgroup in self.growing:
+					self.resume = start
+					return
+			yield match
+			last = match.end()
+		unpaired = quotes.search(source, max(last, lines))
+		# the last character may begin a comment marker
+		self.resume = max(last, len(source) - 1) if unpaired is None else unpaired.start()
+
+
+def matchGroupToSpans(match: re.Match, groupName: str, multiline: bool) -> SpanTuple:
+	codeStart, codeEnd = match.span()
+	textStart, textEnd = match.span(groupName)
+	assert textStart >= 0
+	return codeStart, codeEnd, textStart, textEnd, multiline
+
+
+def spansToComments(source: str, spans: Iterable[SpanTuple],
+					filter: CommentFilter = None) -> Iterator[Comment]:
+	"""Creates the comments of the spans. The filter is applied to the spans,
+	so the rejected comments are never created."""
+	if filter is not None:
+		spans = filter.spans(source, spans)
+	index = LineIndex(source)
+	for codeStart, codeEnd, textStart, textEnd, multiline in spans:
+		yield Comment(
+			source,
+			text_span=Span(textStart, textEnd),
+			code_span=Span(codeStart, codeEnd),
+			multiline=multiline,
+			line_index=index)
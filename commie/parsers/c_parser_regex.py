@@ -7,15 +7,56 @@
 #
 # The parser will remain here for now for simpler things like SASS
 
-import re
-from typing import Iterable
+from typing import Generator, Iterable, Union
 
 import commie.x01_errors
-from commie.parsers._helper import matchGroupToComment
+from commie.parsers._helper import matchGroupToSpans, compiledPattern, bytesPattern, \
+	spansToComments, SpanTuple, LineMatches
 from commie.x01_common import Comment
+from commie.x01_filter import CommentFilter
 
+_PATTERN = compiledPattern(r"""
+	(?P<literal> (\"([^\"\n])*\")+) |
+	(?P<single> //(?P<single_content>.*)?$) |
+	(?P<multi> /\*(?P<multi_content>(.|\n)*?)?\*/) |
+	(?P<error> /\*(.*)?)
+  """)
+_BYTES_PATTERN = bytesPattern(_PATTERN)
+_QUOTE = compiledPattern(r'"')
+_BYTES_QUOTE = bytesPattern(_QUOTE)
 
-def extract_comments(code: str) -> Iterable[Comment]:
+
+def _iter_spans(code: Union[str, bytes], pos: int = 0,
+				final: bool = True) -> Generator[SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later. Code that
+	is not `final` is scanned while the matches cannot change (see
+	`LineMatches`). Then returns the position where the scan stopped,
+	or of the multi-line comment that is not closed."""
+	# bytes-like sources (mmap included) are scanned by the bytes pattern
+	if isinstance(code, str):
+		pattern, quotes = _PATTERN, _QUOTE
+	else:
+		pattern, quotes = _BYTES_PATTERN, _BYTES_QUOTE
+	# only multi-line comments may span lines, an unclosed one is an "error"
+	matches = LineMatches(pattern, quotes, code, pos, final)
+	for match in matches:
+
+		kind = match.lastgroup
+
+		if kind == "single":
+			yield matchGroupToSpans(match, "single_content", False)
+
+		elif kind == "multi":
+			yield matchGroupToSpans(match, "multi_content", True)
+
+		elif kind == "error":
+			if not final:
+				return match.start()
+			raise commie.x01_errors.UnterminatedCommentError()
+	return matches.resume
+
+
+def extract_comments(code: str, filter: CommentFilter = None) -> Iterable[Comment]:
 	"""Extracts a list of comments from the given C family source code.
 
 	Comments are represented with the Comment class found in the common module.
@@ -29,25 +70,5 @@ def extract_comments(code: str) -> Iterable[Comment]:
 	consideration.
 
 	"""
-	pattern = r"""
-		(?P<literal> (\"([^\"\n])*\")+) |
-		(?P<single> //(?P<single_content>.*)?$) |
-		(?P<multi> /\*(?P<multi_content>(.|\n)*?)?\*/) |
-		(?P<error> /\*(.*)?)
-	  """
-
-	compiled = re.compile(pattern, re.VERBOSE | re.MULTILINE)
-
-	for match in compiled.finditer(code):
 
-		kind = match.lastgroup
-		# markupSpan = match.span(0)
-
-		if kind == "single":
-			yield matchGroupToComment(match, "single_content", False)
-
-		elif kind == "multi":
-			yield matchGroupToComment(match, "multi_content", True)
-
-		elif kind == "error":
-			raise commie.x01_errors.UnterminatedCommentError()
+	return spansToComments(code, _iter_spans(code), filter)
@@ -13,24 +13,101 @@
 #
 # The parser for Go now also relies on the following code. In fact, the only
 # key differnce in Go parsed was `backquoted strings` support
+#
+# The character-by-character state machine was replaced by a skip-scanning
+# regex engine (_iter_spans). The engine jumps straight to the next slash or
+# quote and lets `re` consume comments and string literals. The state
+# machine is kept as _iter_comments_stepwise: it is the reference the engine
+# is tested against.
 
+import re
 from enum import IntEnum, auto
-from typing import Iterable
+from typing import Generator, Iterable, Pattern, Tuple, Union
 
 import commie.x01_errors
 from commie import x01_common
+from commie.parsers._helper import bytesPattern, spansToComments
 from commie.x01_common import Comment, Span
-
-
-def iter_comments_c(source: str) -> Iterable[Comment]:
-	return _iter_comments_universal(source, "\"'")
-
-
-def iter_comments_go(source: str) -> Iterable[Comment]:
-	return _iter_comments_universal(source, "\"'`")
-
-
-def _iter_comments_universal(source: str, string_quote_chars: str) -> Iterable[Comment]:
+from commie.x01_filter import CommentFilter
+
+
+def _compile_scanner(string_quote_chars: str) -> Pattern:
+	# Every alternative mirrors a branch of the state machine below:
+	# - a slash that does not start a comment swallows the next character
+	#   (FOUND_SLASH goes back to DEFAULT without looking at it);
+	# - a string literal runs to the matching quote or to the end of the
+	#   source, a backslash escapes any character including newline.
+	literals = "|".join(
+		r"{0}[^{0}\\]*(?:\\[\s\S][^{0}\\]*)*{0}?".format(re.escape(quote))
+		for quote in string_quote_chars)
+	return re.compile(
+		r"(?P<single>//[^\n]*)"
+		r"|(?P<multi>/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)"
+		r"|(?P<unterminated>/\*)"
+		r"|/[\s\S]?"
+		r"|" + literals)
+
+
+_C_SCANNER = _compile_scanner("\"'")
+_GO_SCANNER = _compile_scanner("\"'`")
+# for bytes-like sources, including mmap
+_C_BYTES_SCANNER = bytesPattern(_C_SCANNER)
+_GO_BYTES_SCANNER = bytesPattern(_GO_SCANNER)
+
+# (code_start, code_end, text_start, text_end, multiline)
+_SpanTuple = Tuple[int, int, int, int, bool]
+
+
+def _iter_spans(source: Union[str, bytes], scanner: Pattern, pos: int = 0,
+				final: bool = True) -> Generator[_SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later.
+
+	If the `source` is not `final`, more code may follow it. Then the scan
+	stops at the first comment or literal that the following code could
+	change, and returns its position: the scan should be resumed from there
+	when more code comes. Otherwise returns the length of the source."""
+	# Only a match that reaches the last character may grow: a literal cut
+	# before a trailing backslash, a lone slash, a single-line comment. And
+	# "/*" without a pair may get one
+	limit = len(source) - 1
+	for match in scanner.finditer(source, pos):
+		kind = match.lastgroup
+		if not final and (match.end() >= limit or kind == "unterminated"):
+			return match.start()
+		if kind is None:
+			# string literal or a lone slash
+			continue
+		start, end = match.span()
+		if kind == "single":
+			yield start, end, start + 2, end, False
+		elif kind == "multi":
+			yield start, end, start + 2, end - 2, True
+		else:
+			raise commie.x01_errors.UnterminatedCommentError()
+	return len(source)
+
+
+def _iter_spans_c(source: Union[str, bytes], pos: int = 0,
+				  final: bool = True) -> Generator[_SpanTuple, None, int]:
+	scanner = _C_SCANNER if isinstance(source, str) else _C_BYTES_SCANNER
+	return _iter_spans(source, scanner, pos, final)
+
+
+def _iter_spans_go(source: Union[str, bytes], pos: int = 0,
+				   final: bool = True) -> Generator[_SpanTuple, None, int]:
+	scanner = _GO_SCANNER if isinstance(source, str) else _GO_BYTES_SCANNER
+	return _iter_spans(source, scanner, pos, final)
+
+
+def iter_comments_c(source: str, filter: CommentFilter = None) -> Iterable[Comment]:
+	return spansToComments(source, _iter_spans(source, _C_SCANNER), filter)
+
+
+def iter_comments_go(source: str, filter: CommentFilter = None) -> Iterable[Comment]:
+	return spansToComments(source, _iter_spans(source, _GO_SCANNER), filter)
+
+
+def _iter_comments_stepwise(source: str, string_quote_chars: str) -> Iterable[Comment]:
 	class State(IntEnum):
 
 		DEFAULT = auto()
@@ -1,26 +1,44 @@
 # SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
 # SPDX-License-Identifier: BSD-3-Clause
 
-import re
-from typing import Iterable
+from typing import Generator, Iterable, Union
 
 import commie.x01_errors
-from commie.parsers._helper import matchGroupToComment
+from commie.parsers._helper import matchGroupToSpans, compiledPattern, bytesPattern, \
+	spansToComments, SpanTuple
 from commie.x01_common import Comment
+from commie.x01_filter import CommentFilter
 
-
-def extract_comments(cssCode: str) -> Iterable[Comment]:
-	pattern = r"""
+_PATTERN = compiledPattern(r"""
     (?P<comment> /\*(?P<content>(.|\n)*?)?\*/) |
     (?P<error> /\*(.*)?)
-  """
+  """)
+_BYTES_PATTERN = bytesPattern(_PATTERN)
+
 
-	for match in re.finditer(pattern, cssCode, flags=re.VERBOSE | re.MULTILINE):
+def _iter_spans(cssCode: Union[str, bytes], pos: int = 0,
+				final: bool = True) -> Generator[SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later. If the
+	code is not `final`, stops at the comment the following code could
+	complete and returns its position (see c_parser_state._iter_spans)."""
+	# bytes-like sources (mmap included) are scanned by the bytes pattern
+	pattern = _PATTERN if isinstance(cssCode, str) else _BYTES_PATTERN
+	for match in pattern.finditer(cssCode, pos):
 
 		kind = match.lastgroup
 
 		if kind == "comment":
-			yield matchGroupToComment(match, "content", True)
+			yield matchGroupToSpans(match, "content", True)
+			pos = match.end()
 
 		elif kind == "error":
+			if not final:
+				return match.start()
 			raise commie.x01_errors.UnterminatedCommentError()
+
+	# the last character may be the slash of "/*"
+	return len(cssCode) if final else max(pos, len(cssCode) - 1)
+
+
+def extract_comments(cssCode: str, filter: CommentFilter = None) -> Iterable[Comment]:
+	return spansToComments(cssCode, _iter_spans(cssCode), filter)
@@ -8,17 +8,84 @@ Works with:
   HTML
   XML
   SGML
+
+The comments are found by a scanner that jumps between double quotes and
+"<!--" and then searches for "-->". It runs in linear time even on
+unterminated comments and lines full of unpaired quotes. The regex it
+replaced is kept as _extract_comments_regex: it is the reference the scanner
+is tested against.
 """
 
 import re
-from typing import Iterable
+from typing import Generator, Iterable, Pattern, Tuple, Union
 
 import commie.x01_errors
-from commie.parsers._helper import matchGroupToComment
-from commie.x01_common import Comment
+from commie.parsers._helper import matchGroupToComment, compiledPattern, bytesPattern, \
+	spansToComments
+from commie.x01_common import Comment, LineIndex
+from commie.x01_filter import CommentFilter
+
+# A double-quoted literal on a single line hides comment markers (the way the
+# regex treats it). A quote without a pair on its line is ignored.
+_START: Pattern = re.compile(r'"|<!--')
+_LITERAL_REST: Pattern = re.compile(r'[^"\n]*(?P<pair>")?')
+_END: Pattern = re.compile(r'-->')
+# for bytes-like sources, including mmap
+_BYTES_START = bytesPattern(_START)
+_BYTES_LITERAL_REST = bytesPattern(_LITERAL_REST)
+_BYTES_END = bytesPattern(_END)
+
+# (code_start, code_end, text_start, text_end, multiline)
+_SpanTuple = Tuple[int, int, int, int, bool]
 
+_PATTERN = compiledPattern(r"""
+	(?P<literal> (\"([^\"\n])*\")+) |
+	(?P<single> <!--(?P<single_content>.*?)-->) |
+	(?P<multi> <!--(?P<multi_content>(.|\n)*?)?-->) |
+	(?P<error> <!--(.*)?)
+  """)
 
-def extract_comments(htmlCode: str) -> Iterable[Comment]:
+
+def _iter_spans(htmlCode: Union[str, bytes], pos: int = 0,
+				final: bool = True) -> Generator[_SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later. If the
+	code is not `final`, stops at the first comment or quote the following
+	code could change and returns its position (see
+	c_parser_state._iter_spans)."""
+	if isinstance(htmlCode, str):
+		search, literalRest, searchEnd = _START.search, _LITERAL_REST.match, _END.search
+	else:
+		search, literalRest, searchEnd = \
+			_BYTES_START.search, _BYTES_LITERAL_REST.match, _BYTES_END.search
+	while True:
+		match = search(htmlCode, pos)
+		if match is None:
+			# the code may end with the first characters of "<!--"
+			return len(htmlCode) if final else max(pos, len(htmlCode) - 3)
+		start = match.start()
+		if match.end() == start + 1:
+			# a quote without a pair means there are no more quotes up to
+			# the end of the line: each character gets here at most once
+			literal = literalRest(htmlCode, start + 1)
+			if literal.lastgroup == "pair":
+				pos = literal.end()
+			elif not final and literal.end() == len(htmlCode):
+				return start  # the pair may be on the rest of the line
+			else:
+				pos = start + 1
+		else:
+			found = searchEnd(htmlCode, start + 4)
+			if found is None:
+				if not final:
+					return start
+				raise commie.x01_errors.UnterminatedCommentError()
+			end = found.start()
+			# all the comments in HTML are multi-line
+			yield start, end + 3, start + 4, end, True
+			pos = end + 3
+
+
+def extract_comments(htmlCode: str, filter: CommentFilter = None) -> Iterable[Comment]:
 	"""Extracts a list of comments from the given HTML family source code.
 
 	Comments are represented with the Comment class found in the common module.
@@ -33,22 +100,22 @@ def extract_comments(htmlCode: str) -> Iterable[Comment]:
 	  common.UnterminatedCommentError: Encountered an unterminated multi-line
 		comment.
 	"""
-	pattern = r"""
-		(?P<literal> (\"([^\"\n])*\")+) |
-		(?P<single> <!--(?P<single_content>.*?)-->) |
-		(?P<multi> <!--(?P<multi_content>(.|\n)*?)?-->) |
-		(?P<error> <!--(.*)?)
-	  """
-	compiled = re.compile(pattern, re.VERBOSE | re.MULTILINE)
+	return spansToComments(htmlCode, _iter_spans(htmlCode), filter)
+
+
+def _extract_comments_regex(htmlCode: str) -> Iterable[Comment]:
+	"""The regex-based extract_comments. Backtracks on unterminated
+	comments and unpaired quotes."""
 
-	for match in compiled.finditer(htmlCode):
+	index = LineIndex(htmlCode)
+	for match in _PATTERN.finditer(htmlCode):
 
 		kind = match.lastgroup
 
 		if kind == "single":
 			# all the comments in HTML are multi-line
-			yield matchGroupToComment(match, "single_content", True)
+			yield matchGroupToComment(match, "single_content", True, index)
 		elif kind == "multi":
-			yield matchGroupToComment(match, "multi_content", True)
+			yield matchGroupToComment(match, "multi_content", True, index)
 		elif kind == "error":
 			raise commie.x01_errors.UnterminatedCommentError()
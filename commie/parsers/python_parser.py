@@ -2,11 +2,31 @@
 # SPDX-FileCopyrightText: Copyright (c) 2015 Jean-Ralph Aviles
 # SPDX-License-Identifier: BSD-3-Clause
 
+# Running the full tokenizer just to find COMMENT tokens is slow. So the
+# comments are found by a regex scanner that only knows about '#', string
+# literals and line continuations. When the scanner meets something it
+# cannot decide on its own (an unterminated string, a stray backslash,
+# unbalanced brackets, old Mac line endings), the code is handed to the
+# tokenizer, so the result is always the same as tokenize would give.
+#
+# Since Python 3.12 tokenize runs the C tokenizer, which rejects more: bad
+# number literals, non-printable characters, too deeply nested brackets,
+# tabs and spaces mixed in indentation, and broken replacement fields of
+# f-strings. The scanner looks for these too and hands anything suspicious
+# to the tokenizer.
+#
+# The only thing the scanner does not check is the indentation levels:
+# tokenize raises IndentationError on inconsistent dedents (and, since 3.12,
+# on more than 100 levels), the scanner just returns the comments.
+
 import io
+import re
+import sys
 import tokenize
-from typing import NamedTuple, Iterable
+from typing import NamedTuple, Iterable, List, Optional, Tuple
 
-from commie.x01_common import Comment, Span
+from commie.x01_common import Comment, Span, LineIndex
+from commie.x01_filter import CommentFilter
 
 
 class PosToken(NamedTuple):
@@ -16,22 +36,25 @@ class PosToken(NamedTuple):
 	end: int
 
 
-def postokenize(infile: io.BytesIO) -> Iterable[PosToken]:
+def postokenize(code: str) -> Iterable[PosToken]:
 	# based on https://stackoverflow.com/a/62761208 (CC BY-SA 4.0)
 
+	infile = io.StringIO(code)
+
 	# Used to track starting position of each line.
 	# Note that tokenize starts line numbers at 1 and column numbers at 0
-	offsets = [0]
+	offsets = [0, 0]
 
 	def wrapped_readline():
-		# Function used to wrap calls to infile.readline(); stores current
-		# stream position at the beginning of each line.
-		offsets.append(infile.tell())
-		return infile.readline()
+		# Function used to wrap calls to infile.readline(); stores the
+		# position where the next line starts
+		line = infile.readline()
+		offsets.append(offsets[-1] + len(line))
+		return line
 
 	# For each returned token, substitute type with exact_type and
-	# add token boundaries as stream positions
-	for t in tokenize.tokenize(wrapped_readline):
+	# add token boundaries as string positions
+	for t in tokenize.generate_tokens(wrapped_readline):
 		startline, startcol = t.start
 		endline, endcol = t.end
 		yield PosToken(t.exact_type, t.string,
@@ -39,10 +62,198 @@ def postokenize(infile: io.BytesIO) -> Iterable[PosToken]:
 					   offsets[endline] + endcol)
 
 
-def extract_comments(code: str) -> Iterable[Comment]:
+# Since Python 3.12 tokenize uses the C tokenizer. It checks more, and
+# replacement fields of f-strings are tokenized as code: they may contain
+# quotes of the same kind and even comments
+_C_TOKENIZER = sys.version_info >= (3, 12)
+
+_SCANNER = re.compile(r"""
+	(?P<comment> \#[^\r\n]* )
+	| (?P<string>
+		  '''[^'\\]*(?:(?:\\[\s\S]|'(?!''))[^'\\]*)*'''
+		| \"\"\"[^"\\]*(?:(?:\\[\s\S]|"(?!""))[^"\\]*)*\"\"\"
+		| '(?!'')[^'\\\n]*(?:\\(?:\r\n|[\s\S])[^'\\\n]*)*'
+		| "(?!"")[^"\\\n]*(?:\\(?:\r\n|[\s\S])[^"\\\n]*)*"
+	)
+	| (?P<continuation> \\\r?\n )
+	| (?P<unknown> ['"\\] )
+	""", re.VERBOSE)
+
+_FIELD_CHARS = re.compile(r"[{}#()\[\]:\\'\"]")
+# the letters before a string literal, like "rf"
+_STRING_PREFIX = re.compile(r"(?<!\w)[A-Za-z]{1,2}$")
+
+# What the C tokenizer may reject outside of strings: non-printable
+# characters and anything like a number (checked against tokenize.Number)
+_SUSPECTS = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f]|(?<!\w)\.?\d(?:[\w.]|(?<=[eE])[-+])*")
+_NUMBER = re.compile(tokenize.Number)
+_BRACKETS = re.compile(r"[()\[\]{}]")
+# the C tokenizer allows 200 nested brackets
+_MAX_DEPTH = 200
+# lines indented with a tab or with a space: when there are both, the C
+# tokenizer may raise TabError
+_TAB_INDENT = re.compile(r"^[ \f]*\t", re.MULTILINE)
+_SPACE_INDENT = re.compile(r"^[\t\f]* ", re.MULTILINE)
+
+# tokenize splits lines at "\n" only, a lone "\r" confuses it in ways that are
+# not worth repeating
+_LONE_CR = re.compile(r"\r(?!\n)")
+
+# (code_start, code_end, text_start, text_end, multiline)
+_SpanTuple = Tuple[int, int, int, int, bool]
+
+
+def _fstring_is_plain(code: str, start: int, end: int) -> bool:
+	"""Returns True if the replacement fields of the f-string are closed,
+	there are no quotes in them, their expressions contain no '#' or
+	backslash and close their brackets. Such a string ends where the scanner
+	thinks it ends, and the C tokenizer accepts it."""
+	# the open fields: [brackets open in the expression, where the
+	# expression starts or -1 in the format spec]
+	fields: List[List[int]] = []
+	pos = start
+	while True:
+		match = _FIELD_CHARS.search(code, pos, end)
+		if match is None:
+			return not fields
+		char = match.group()
+		pos = match.end()
+		if not fields:
+			if char in "{}":
+				if pos < end and code[pos] == char:
+					pos += 1  # escaped brace
+				elif char == "{":
+					fields.append([0, pos])
+				else:
+					return False
+			continue  # literal text
+		if char in "'\"":
+			# a nested string may hide anything, even the end of the field
+			return False
+		field = fields[-1]
+		brackets, expression = field
+		if expression < 0:
+			# the format spec is text, but may have nested fields
+			if char == "{":
+				fields.append([0, pos])
+			elif char == "}":
+				fields.pop()
+		elif char in "#\\":
+			return False
+		elif char in "([{":
+			field[0] += 1
+		elif char in ")]" or (char == "}" and brackets):
+			if not brackets:
+				return False
+			field[0] -= 1
+		elif char == "}" or (char == ":" and not brackets):
+			if _has_suspects(code, expression, match.start()):
+				return False
+			if char == "}":
+				fields.pop()
+			else:
+				field[1] = -1
+
+
+def _is_fstring(code: str, start: int) -> bool:
+	prefix = _STRING_PREFIX.search(code, max(start - 3, 0), start)
+	return prefix is not None and "f" in prefix.group().lower()
+
+
+def _has_suspects(code: str, start: int, end: int) -> bool:
+	for match in _SUSPECTS.finditer(code, start, end):
+		if not _NUMBER.fullmatch(match.group()):
+			return True
+	return False
+
+
+def _strict_depth(code: str, start: int, end: int, depth: int) -> Optional[int]:
+	"""Returns the bracket depth after the code between strings and comments,
+	as the C tokenizer counts it: a closing bracket without an opening one is
+	ignored, and the kinds of brackets are not matched. Returns None if the
+	tokenizer may reject the code."""
+	if _has_suspects(code, start, end):
+		return None
+	count = code.count
+	opening = count("(", start, end) + count("[", start, end) + count("{", start, end)
+	closing = count(")", start, end) + count("]", start, end) + count("}", start, end)
+	if closing <= depth and depth + opening <= _MAX_DEPTH:
+		return depth + opening - closing  # the depth stays in the limits
+	for match in _BRACKETS.finditer(code, start, end):
+		if match.group() in "([{":
+			if depth >= _MAX_DEPTH:
+				return None
+			depth += 1
+		elif depth:
+			depth -= 1
+	return depth
+
+
+def _bracket_balance(code: str, start: int, end: int) -> int:
+	count = code.count
+	return (count("(", start, end) + count("[", start, end) + count("{", start, end)
+			- count(")", start, end) - count("]", start, end) - count("}", start, end))
+
+
+def _scan_spans(code: str) -> Optional[List[_SpanTuple]]:
+	"""Returns the spans of all comments, or None if the code has to be
+	tokenized to know them for sure."""
+	if _LONE_CR.search(code):
+		return None
+	if _C_TOKENIZER and ("\0" in code or (_TAB_INDENT.search(code)
+										   and _SPACE_INDENT.search(code))):
+		return None
+	spans: List[_SpanTuple] = []
+	depth: Optional[int] = 0
+	code_start = 0
+	for match in _SCANNER.finditer(code):
+		start, end = match.span()
+		kind = match.lastgroup
+		if _C_TOKENIZER:
+			depth = _strict_depth(code, code_start, start, depth)
+			if depth is None:
+				return None
+		else:
+			depth += _bracket_balance(code, code_start, start)
+		code_start = end
+		if kind == "comment":
+			spans.append((start, end, start + 1, end, False))
+		elif kind == "string":
+			if _C_TOKENIZER and _is_fstring(code, start) \
+					and not _fstring_is_plain(code, start, end):
+				return None
+		elif kind == "continuation":
+			if end == len(code):
+				return None  # EOF in multi-line statement
+		else:
+			return None
+	if _C_TOKENIZER:
+		depth = _strict_depth(code, code_start, len(code), depth)
+	else:
+		depth += _bracket_balance(code, code_start, len(code))
+	if depth != 0:
+		return None  # EOF in multi-line statement
+	return spans
+
+
+def _extract_comments_tokenize(code: str) -> Iterable[Comment]:
+	index = LineIndex(code)
+	for token in postokenize(code):
+		if token.tokenType == tokenize.COMMENT:
+			yield Comment(
+				code,
+				text_span=Span(token.start + 1, token.end),
+				code_span=Span(token.start, token.end),
+				multiline=False,
+				line_index=index
+			)
+
+
+def extract_comments(code: str, filter: CommentFilter = None) -> Iterable[Comment]:
 	"""Extracts a list of comments from the given Python script.
-	Comments are identified using the tokenize module. Does not include function,
-	class, or module docstrings. All comments are single line comments.
+	Comments are identified exactly as the tokenize module would identify them,
+	though the tokenizer itself only runs for code the fast scanner is unsure
+	about. Does not include function, class, or module docstrings. All comments are single line comments.
 	Args:
 	  code: String containing code to extract comments from.
 	Returns:
@@ -51,14 +262,24 @@ def extract_comments(code: str) -> Iterable[Comment]:
 	  tokenize.TokenError
 	"""
 
-	for token in postokenize(io.BytesIO(code.encode())):
-		if token.tokenType == tokenize.COMMENT:
-			yield Comment(
-				code,
-				text_span=Span(token.start + 1, token.end),
-				code_span=Span(token.start, token.end),
-				multiline=False
-			)
+	spans = _scan_spans(code)
+	if spans is None:
+		for comment in _extract_comments_tokenize(code):
+			if filter is None or filter.accepts_comment(comment):
+				yield comment
+		return
+
+	if filter is not None:
+		spans = list(filter.spans(code, spans))
+	index = LineIndex(code)
+	for code_start, code_end, text_start, text_end, multiline in spans:
+		yield Comment(
+			code,
+			text_span=Span(text_start, text_end),
+			code_span=Span(code_start, code_end),
+			multiline=multiline,
+			line_index=index
+		)
 
 
 if __name__ == "__main__":
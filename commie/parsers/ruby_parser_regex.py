@@ -2,14 +2,42 @@
 # SPDX-FileCopyrightText: Copyright (c) 2015 Jean-Ralph Aviles
 # SPDX-License-Identifier: BSD-3-Clause
 
-import re
-from typing import Iterable
+from typing import Generator, Iterable, Union
 
-from commie.parsers._helper import matchGroupToComment
+from commie.parsers._helper import matchGroupToSpans, compiledPattern, bytesPattern, \
+	spansToComments, SpanTuple, LineMatches
 from commie.x01_common import Comment
-
-
-def extract_comments(rubyCode: str) -> Iterable[Comment]:
+from commie.x01_filter import CommentFilter
+
+_PATTERN = compiledPattern(r"""
+	(?P<literal> ([\"'])((?:\\\2|(?:(?!\2)).)*)(\2)) |
+	(?P<single> \#(?P<single_content>.*?)$)
+  """)
+_BYTES_PATTERN = bytesPattern(_PATTERN)
+_QUOTE = compiledPattern(r"[\"']")
+_BYTES_QUOTE = bytesPattern(_QUOTE)
+
+
+def _iter_spans(rubyCode: Union[str, bytes], pos: int = 0,
+				final: bool = True) -> Generator[SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later. Code that
+	is not `final` is scanned while the matches cannot change (see
+	`LineMatches`), the position where the scan stopped is returned."""
+	# bytes-like sources (mmap included) are scanned by the bytes pattern
+	if isinstance(rubyCode, str):
+		pattern, quotes = _PATTERN, _QUOTE
+	else:
+		pattern, quotes = _BYTES_PATTERN, _BYTES_QUOTE
+	# literals and comments of the pattern do not span lines, but a literal
+	# ends at the last quote it can reach on its line
+	matches = LineMatches(pattern, quotes, rubyCode, pos, final, ("literal",))
+	for match in matches:
+		if match.lastgroup == "single":
+			yield matchGroupToSpans(match, "single_content", False)
+	return matches.resume
+
+
+def extract_comments(rubyCode: str, filter: CommentFilter = None) -> Iterable[Comment]:
 	"""Extracts a list of comments from the given Ruby source code.
 
 	Comments are represented with the Comment class found in the common module.
@@ -22,17 +50,5 @@ def extract_comments(rubyCode: str) -> Iterable[Comment]:
 	Returns:
 	  Python list of common.Comment in the order that they appear in the code..
 	"""
-	pattern = r"""
-		(?P<literal> ([\"'])((?:\\\2|(?:(?!\2)).)*)(\2)) |
-		(?P<single> \#(?P<single_content>.*?)$)
-	  """
-	compiled = re.compile(pattern, re.VERBOSE | re.MULTILINE)
-
-	#comments: List = []
-	for match in compiled.finditer(rubyCode):
-		kind = match.lastgroup
-
-		if kind == "single":
-			yield matchGroupToComment(match, "single_content", False)
 
-	#return comments
+	return spansToComments(rubyCode, _iter_spans(rubyCode), filter)
@@ -2,12 +2,50 @@
 # SPDX-FileCopyrightText: Copyright (c) 2015 Jean-Ralph Aviles
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Iterable
+# Comments are found by a regex engine that jumps between '#', quotes and
+# backslashes. The original character-by-character state machine is kept as
+# _extract_comments_stepwise: it is the reference the engine is tested
+# against.
 
+import re
+from typing import Generator, Iterable, Pattern, Tuple, Union
+
+from commie.parsers._helper import bytesPattern, spansToComments
 from commie.x01_common import Comment, Span
+from commie.x01_filter import CommentFilter
+
+# Mirrors the state machine below: a backslash outside of a string escapes
+# the next character, a string runs to the matching quote (or to the end of
+# the code) and a backslash inside it escapes any character.
+_SCANNER: Pattern = re.compile(
+	r"(?P<comment>#[^\n]*)"
+	r"|\\[\s\S]?"
+	r"|\"[^\"\\]*(?:\\[\s\S][^\"\\]*)*\"?"
+	r"|'[^'\\]*(?:\\[\s\S][^'\\]*)*'?")
+_BYTES_SCANNER = bytesPattern(_SCANNER)
+
+# (code_start, code_end, text_start, text_end, multiline)
+_SpanTuple = Tuple[int, int, int, int, bool]
+
 
+def _iter_spans(code: Union[str, bytes], pos: int = 0,
+				final: bool = True) -> Generator[_SpanTuple, None, int]:
+	"""Yields spans of the comments that start at `pos` or later. If the
+	code is not `final`, stops at the first match the following code could
+	change and returns its position (see c_parser_state._iter_spans)."""
+	# bytes-like sources (mmap included) are scanned by the bytes pattern
+	scanner = _SCANNER if isinstance(code, str) else _BYTES_SCANNER
+	limit = len(code) - 1
+	for match in scanner.finditer(code, pos):
+		start, end = match.span()
+		if not final and end >= limit:
+			return start
+		if match.lastgroup is not None:
+			yield start, end, start + 1, end, False
+	return len(code)
 
-def extract_comments(code: str) -> Iterable[Comment]:
+
+def extract_comments(code: str, filter: CommentFilter = None) -> Iterable[Comment]:
 	"""Extracts a list of comments from the given shell script.
 	Comments are represented with the Comment class found in the common module.
 	Shell script comments only come in one form, single-line. Single line
@@ -20,6 +58,12 @@ def extract_comments(code: str) -> Iterable[Comment]:
 	Returns:
 	  Python list of common.Comment in the order that they appear in the code.
 	"""
+	return spansToComments(code, _iter_spans(code), filter)
+
+
+def _extract_comments_stepwise(code: str) -> Iterable[Comment]:
+	"""The character-by-character state machine that extract_comments
+	replaced. Finds exactly the same comments."""
 
 	DEFAULT = 0
 	IN_COMMENT = 1
@@ -29,8 +73,6 @@ def extract_comments(code: str) -> Iterable[Comment]:
 
 	state = DEFAULT
 	string_char = ''
-	current_comment_text = ''
-	line_counter = 1
 
 	comment_start_pos = None
 	position = -1
@@ -51,10 +93,7 @@ def extract_comments(code: str) -> Iterable[Comment]:
 			if char == '\n':
 				yield Comment(code, code_span=Span(comment_start_pos, position),
 							  text_span=Span(comment_start_pos + 1, position), multiline=False)
-				current_comment_text = ''
 				state = DEFAULT
-			else:
-				current_comment_text += char
 		elif state == IN_STRING:
 			if char == string_char:
 				state = DEFAULT
@@ -65,8 +104,6 @@ def extract_comments(code: str) -> Iterable[Comment]:
 		elif state == ESCAPING_CHAR_OUTSIDE_OF_STRING:
 			# Escaping current char, outside of string.
 			state = DEFAULT
-		if char == '\n':
-			line_counter += 1
 
 	# end of file
 
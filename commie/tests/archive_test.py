@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import os
+import tarfile
+import unittest
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+
+FILES = {
+	"pkg/a.py": "# a\nx = 1\n",
+	"pkg/src/b.c": "/* b */ int b; // ё\n",
+	"pkg/readme.txt": "# not a comment\n",
+	"pkg/bad.c": "/* unterminated",
+}
+
+EXPECTED = {
+	"pkg/a.py": [" a"],
+	"pkg/src/b.c": [" b ", " ё"],
+	"pkg/bad.c": "UnterminatedCommentError",
+}
+
+
+def texts(results) -> dict:
+	return {r.path.as_posix(): type(r.error).__name__ if r.error else [c.text for c in r.comments]
+			for r in results}
+
+
+def makeTar(mode):
+	buffer = io.BytesIO()
+	with tarfile.open(fileobj=buffer, mode=mode) as archive:
+		for name, content in FILES.items():
+			data = content.encode()
+			info = tarfile.TarInfo(name)
+			info.size = len(data)
+			archive.addfile(info, io.BytesIO(data))
+		link = tarfile.TarInfo("pkg/link.c")
+		link.type = tarfile.SYMTYPE
+		link.linkname = "bad.c"
+		archive.addfile(link)
+	return buffer.getvalue()
+
+
+def makeZip() -> bytes:
+	buffer = io.BytesIO()
+	with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+		archive.writestr("pkg/", "")
+		for name, content in FILES.items():
+			archive.writestr(name, content)
+	return buffer.getvalue()
+
+
+class ArchiveTest(unittest.TestCase):
+
+	def testFileObjects(self):
+		for data in (makeTar("w"), makeTar("w:gz"), makeTar("w:bz2"), makeZip()):
+			for workers in (1, 2):
+				results = scan_archive(io.BytesIO(data), workers=workers, chunk_size=1)
+				self.assertEqual(texts(results), EXPECTED)
+
+	def testPaths(self):
+		with TemporaryDirectory() as temp:
+			for name, data in (("a.tar.gz", makeTar("w:gz")), ("a.zip", makeZip())):
+				path = Path(temp) / name
+				path.write_bytes(data)
+				self.assertEqual(texts(scan_archive(path, workers=1)), EXPECTED)
+				self.assertEqual(texts(scan_archive(str(path), workers=1)), EXPECTED)
+
+	def testPipe(self):
+		read, write = os.pipe()
+		with os.fdopen(write, "wb") as w:
+			w.write(makeTar("w:gz"))
+		with os.fdopen(read, "rb") as r:
+			self.assertEqual(texts(scan_archive(r, workers=1)), EXPECTED)
+
+	def testFilter(self):
+		results = scan_archive(io.BytesIO(makeZip()), workers=1,
+							   filter=CommentFilter(multiline=False))
+		self.assertEqual(texts(results)["pkg/src/b.c"], [" ё"])
+
+	def testNotArchive(self):
+		with self.assertRaises(tarfile.TarError):
+			list(scan_archive(io.BytesIO(b"not an archive" * 100)))
@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+from commie.tests.tree_test import makeTree
+
+
+async def collect(asyncIterator):
+	return [item async for item in asyncIterator]
+
+
+class AsyncTest(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = TemporaryDirectory()
+		self.root = Path(self.tempDir.name)
+		makeTree(self.root)
+		self.files = sorted(p for p in self.root.rglob("*.*") if p.suffix != ".txt"
+							and ".git" not in p.parts)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def testFile(self):
+		comments = asyncio.run(collect(aiter_comments_file(self.root / "a.c")))
+		self.assertEqual([c.code for c in comments], ["// first", "/* second */"])
+		self.assertEqual(comments[1].line, 2)
+
+	def testFileError(self):
+		with self.assertRaises(UnterminatedCommentError):
+			asyncio.run(collect(aiter_comments_file(self.root / "sub" / "bad.js")))
+
+	def check(self, results):
+		byName = {r.path.name: r for r in results}
+		self.assertEqual(sorted(byName), ["a.c", "b.py", "bad.js"])
+		self.assertEqual([c.text for c in byName["b.py"].comments], [" third"])
+		self.assertIsInstance(byName["bad.js"].error, UnterminatedCommentError)
+
+	def testMany(self):
+		self.check(asyncio.run(collect(aiter_comments_many(self.files, concurrency=2))))
+
+	def testManyInProcesses(self):
+		with ProcessPoolExecutor(2) as executor:
+			self.check(asyncio.run(collect(aiter_comments_many(self.files, executor))))
+
+	def testBackpressure(self):
+		taken = []
+
+		def files():
+			for i in range(100):
+				taken.append(i)
+				yield self.root / "a.c"
+
+		async def takeTwo():
+			results = aiter_comments_many(files(), concurrency=3)
+			first = await results.__anext__()
+			second = await results.__anext__()
+			await results.aclose()
+			return first, second
+
+		first, second = asyncio.run(takeTwo())
+		self.assertEqual(first.comments[0].code, "// first")
+		self.assertLessEqual(len(taken), 5)
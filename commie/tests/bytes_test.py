@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import mmap
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+from commie.tests.helper import random_sources
+
+NAMES = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh", "a.py"]
+
+
+def byteSpans(source: str, comments) -> tuple:
+	"""Spans of the comments found in str, as UTF-8 byte offsets."""
+	def b(pos: int) -> int:
+		return len(source[:pos].encode())
+
+	result = []
+	try:
+		for c in comments:
+			result.append(((b(c.code_span.start), b(c.code_span.end)),
+						   (b(c.text_span.start), b(c.text_span.end)), c.multiline, c.text))
+	except Exception as e:
+		return result, type(e).__name__
+	return result, ""
+
+
+def spans(comments) -> tuple:
+	result = []
+	try:
+		for c in comments:
+			result.append((tuple(c.code_span), tuple(c.text_span), c.multiline, c.text))
+	except Exception as e:
+		return result, type(e).__name__
+	return result, ""
+
+
+class BytesTest(unittest.TestCase):
+
+	def testSameAsStr(self):
+		pieces = ['"', "'", "`", "\\", "\n", "#", "//", "/*", "*/", "<!--", "-->",
+				  "x", " ", "ё", "€"]
+		for i, source in enumerate(random_sources(pieces, count=2000)):
+			name = NAMES[i % len(NAMES)]
+			data = source.encode()
+			expected = byteSpans(source, iter_comments_str(source, name))
+			self.assertEqual(spans(iter_comments_bytes(data, name)), expected, (source, name))
+			self.assertEqual(spans(iter_comments_bytes(memoryview(data), name)), expected)
+
+	def testLinesSameAsStr(self):
+		pieces = ["\n", "//", "/*", "*/", "#", "x", " ", "ё", "€"]
+		for i, source in enumerate(random_sources(pieces, count=500)):
+			name = NAMES[i % len(NAMES)]
+			try:
+				comments = list(iter_comments_str(source, name))
+			except UnterminatedCommentError:
+				continue
+			lines = source.split("\n")
+
+			def byteColumn(line: int, column: int) -> int:
+				return len(lines[line - 1][:column].encode())
+
+			expected = [(c.line, byteColumn(c.line, c.column), c.end_line,
+						 byteColumn(c.end_line, c.end_column)) for c in comments]
+			found = list(iter_comments_bytes(source.encode(), name))
+			self.assertEqual([(c.line, c.column, c.end_line, c.end_column) for c in found],
+							 expected, (source, name))
+			self.assertEqual(list(iter_comments_bytes(bytearray(source.encode()), name)), found)
+
+	def testFilter(self):
+		data = "/* ё */ // abc\n# ёё\n".encode()
+		for name in ("a.c", "a.py"):
+			everything = list(iter_comments_bytes(data, name))
+			for filter in (CommentFilter("ё"), CommentFilter(min_length=4),
+						   CommentFilter(start=1, multiline=False)):
+				expected = [c.code_span for c in everything
+							if filter.accepts_bytes(data, *c.code_span, *c.text_span, c.multiline)]
+				self.assertEqual([c.code_span for c in iter_comments_bytes(data, name, filter)],
+								 expected)
+		self.assertEqual([c.text for c in iter_comments_bytes(data, "a.c", CommentFilter("ё"))],
+						 [" ё "])
+
+	def testMapped(self):
+		with TemporaryDirectory() as temp:
+			path = Path(temp) / "a.go"
+			path.write_bytes("// ё\r\nvar s = `/* no */`\n/* yes */".encode())
+			with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+				comments = list(iter_comments_bytes(data, path.name))
+				self.assertEqual([(c.text, c.line, c.column) for c in comments],
+								 [(" ё\r", 1, 0), (" yes ", 3, 0)])
+				self.assertEqual(comments[1].code_bytes, b"/* yes */")
+
+	def testObserved(self):
+		events = []
+		add_observer(events.append)
+		try:
+			self.assertEqual(len(list(iter_comments_bytes(b"# a\n# b", "a.sh"))), 2)
+		finally:
+			remove_observer(events.append)
+		self.assertEqual([(e.parser, e.bytes, e.comments) for e in events], [("shell", 7, 2)])
@@ -6,7 +6,8 @@ import unittest
 from typing import List
 
 from commie import iter_comments_c, UnterminatedCommentError
-from commie.tests.helper import minimize
+from commie.parsers.c_parser_state import _iter_comments_stepwise
+from commie.tests.helper import minimize, random_sources, spansOrError
 from commie.x01_common import Comment
 
 
@@ -187,3 +188,34 @@ class CParserTest(unittest.TestCase):
 		self.assertEqual(comments[1].text, ' comment at eof')
 		self.assertEqual(comments[1].multiline, False)
 
+
+	def testLineNumbers(self):
+		code = "int a; // one\n\n/* two\n   lines */ int b;"
+		comments = commentsToList(code)
+
+		self.assertEqual([(c.line, c.column, c.end_line, c.end_column) for c in comments],
+						 [(1, 7, 1, 13), (3, 0, 4, 11)])
+		self.assertIs(comments[0].line_index, comments[1].line_index)
+
+
+class StepwiseEquivalenceTest(unittest.TestCase):
+	"""The skip-scanning engine must find exactly the same comments as the
+	original character-by-character state machine."""
+
+	def assertSameAsStepwise(self, code: str):
+		self.assertEqual(spansOrError(iter_comments_c(code)),
+						 spansOrError(_iter_comments_stepwise(code, "\"'")),
+						 repr(code))
+
+	def testKnownCases(self):
+		for code in [
+			"", "/", "//", "/*", "/**/", "/*/", "/***/", "a / b // c",
+			"/\"// x\"", "'/* ' */", '"\\', '"abc\\"// x', "x//\r\ny",
+			"/* a */ /* b */ // c\n// d", "\"\n// x\n\" // y",
+		]:
+			self.assertSameAsStepwise(code)
+
+	def testRandom(self):
+		pieces = ['/', '*', '"', "'", '\\', '\n', 'a', ' ', '//', '/*', '*/']
+		for code in random_sources(pieces):
+			self.assertSameAsStepwise(code)
@@ -0,0 +1,133 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from commie import *
+from commie.tests.tree_test import makeTree
+
+
+def describe(comments):
+	return [(c.code_span, c.text_span, c.multiline, c.code, c.text, c.line, c.column)
+			for c in comments]
+
+
+class CommentCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = TemporaryDirectory()
+		self.dir = Path(self.tempDir.name)
+		self.cacheFile = self.dir / "cache.sqlite"
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def testHitAndMiss(self):
+		file = self.dir / "a.c"
+		file.write_text("int x; // ё\n/* two\nlines */")
+		expected = describe(iter_comments_file(file))
+
+		with CommentCache(self.cacheFile) as cache:
+			self.assertEqual(describe(iter_comments_file(file, cache=cache)), expected)
+			self.assertEqual(describe(iter_comments_file(file, cache=cache)), expected)
+			self.assertEqual(cache.stats()[:2], (1, 1))
+
+			file.write_text("// changed")
+			self.assertEqual([c.code for c in iter_comments_file(file, cache=cache)],
+							 ["// changed"])
+			self.assertEqual(cache.misses, 2)
+
+		# the cache persists
+		with CommentCache(self.cacheFile) as cache:
+			self.assertEqual([c.code for c in iter_comments_file(file, cache=cache)],
+							 ["// changed"])
+			self.assertEqual((cache.hits, cache.misses), (1, 0))
+			self.assertEqual(cache.stats().entries, 2)
+
+	def testReadOnce(self):
+		file = self.dir / "a.c"
+		file.write_text("x = 1; // ё\r\n/* two\r\n */\r\n")
+		expected = describe(iter_comments_file(file))
+		expectedMapped = describe(iter_comments_file(file, mapped=True))
+		reads = []
+		readBytes = Path.read_bytes
+
+		def countedReadBytes(path):
+			reads.append(path)
+			return readBytes(path)
+
+		def noReadText(path, *args, **kwargs):
+			raise AssertionError("read again")
+
+		with CommentCache(self.cacheFile) as cache, \
+				patch.object(Path, "read_bytes", countedReadBytes), \
+				patch.object(Path, "read_text", noReadText):
+			self.assertEqual(describe(iter_comments_file(file, cache=cache)), expected)
+			self.assertEqual(describe(iter_comments_file(file, cache=cache)), expected)
+			self.assertEqual(describe(iter_comments_file(file, mapped=True, cache=cache)),
+							 expectedMapped)
+			self.assertEqual((cache.hits, cache.misses), (1, 2))
+		self.assertEqual(reads, [file] * 3)
+
+	def testByStat(self):
+		file = self.dir / "a.sh"
+		file.write_text("# one")
+		with CommentCache(self.cacheFile, by_content=False) as cache:
+			list(iter_comments_file(file, cache=cache))
+			list(iter_comments_file(file, cache=cache))
+			self.assertEqual((cache.hits, cache.misses), (1, 1))
+			os.utime(file, ns=(0, 0))
+			list(iter_comments_file(file, cache=cache))
+			self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+	def testMappedIsAnotherParser(self):
+		file = self.dir / "a.c"
+		file.write_text("// one")
+		with CommentCache(self.cacheFile) as cache:
+			list(iter_comments_file(file, cache=cache))
+			list(iter_comments_file(file, mapped=True, cache=cache))
+			self.assertEqual(cache.misses, 2)
+
+	def testErrorsAreNotCached(self):
+		file = self.dir / "a.c"
+		file.write_text("/* open")
+		with CommentCache(self.cacheFile) as cache:
+			for _ in range(2):
+				with self.assertRaises(UnterminatedCommentError):
+					iter_comments_file(file, cache=cache)
+			self.assertEqual(cache.stats().entries, 0)
+
+	def testEviction(self):
+		with CommentCache(self.cacheFile, max_size=2000) as cache:
+			for i in range(50):
+				file = self.dir / f"{i}.c"
+				file.write_text(f"// comment {i} " + "x" * (i * 37 % 101))
+				iter_comments_file(file, cache=cache)
+			stats = cache.stats()
+			self.assertGreater(stats.evictions, 0)
+			self.assertLessEqual(stats.size, 2000)
+			self.assertEqual(stats.entries, 50 - stats.evictions)
+			# the most recent files are still there
+			iter_comments_file(self.dir / "49.c", cache=cache)
+			self.assertEqual(cache.hits, 1)
+
+	def testScanTree(self):
+		root = self.dir / "tree"
+		root.mkdir()
+		makeTree(root)
+		for workers in (1, 2):
+			with CommentCache(self.cacheFile) as cache:
+				results = [(r.path, describe(r.comments), repr(r.error))
+						   for r in scan_tree(root, workers=workers, chunk_size=1, cache=cache)]
+				self.assertEqual(results,
+								 [(r.path, describe(r.comments), repr(r.error))
+								  for r in scan_tree(root, workers=1)])
+				# the file with an error is parsed every time
+				if workers == 1:
+					self.assertEqual((cache.hits, cache.misses), (0, 3))
+				else:
+					self.assertEqual((cache.hits, cache.misses), (2, 1))
@@ -5,7 +5,7 @@ import unittest
 from typing import List
 
 from commie import iter_comments_css
-from commie.x01_common import Comment
+from commie.x01_common import Comment, Span
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -61,3 +61,13 @@ class CssParserTest(unittest.TestCase):
 		comments = commentsToList(code)
 
 		self.assertEqual(len(comments), 3)
+
+	def testEmptyComment(self):
+		code = "a { } /**/"
+		comments = commentsToList(code)
+
+		self.assertEqual(len(comments), 1)
+
+		self.assertEqual(comments[0].code_span, Span(6, 10))
+		self.assertEqual(comments[0].text_span, Span(8, 8))
+		self.assertEqual(comments[0].text, "")
@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import io
+import re
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+from commie.tests.helper import random_sources, restoredRegistry
+from commie.tests.mapped_test import describe
+
+FILTERS = [
+	CommentFilter("x"),
+	CommentFilter(re.compile(r"^\s*ё|x$")),
+	CommentFilter(multiline=True),
+	CommentFilter(multiline=False, min_length=2),
+	CommentFilter(start=5, end=40),
+]
+
+
+async def collect(asyncIterator) -> list:
+	return [item async for item in asyncIterator]
+
+
+def describeOrError(comments) -> tuple:
+	result = []
+	try:
+		for c in comments:
+			result.extend(describe([c]))
+	except Exception as e:
+		return result, type(e).__name__
+	return result, ""
+
+
+class FilterTest(unittest.TestCase):
+
+	def testSameAsFilteredLater(self):
+		pieces = ['"', "'", "`", "\\", "\n", "#", "//", "/*", "*/", "<!--", "-->",
+				  "x", " ", "ё"]
+		names = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh", "a.py"]
+		for i, source in enumerate(random_sources(pieces, count=2000)):
+			name = names[i % len(names)]
+			for filter in FILTERS:
+				all_, error = describeOrError(iter_comments_str(source, name))
+				expected = [d for d, c in zip(all_, iter_comments_str(source, name))
+							if filter.accepts_comment(c)], error
+				self.assertEqual(describeOrError(iter_comments_str(source, name, filter)),
+								 expected, (source, name, filter))
+
+	def testStreamAndIncremental(self):
+		pieces = ['"', "'", "\\", "\n", "#", "//", "/*", "*/", "<!--", "-->", "x", " ", "ё"]
+		names = ["a.c", "a.scss", "a.html", "a.sh", "a.py"]
+		for i, source in enumerate(random_sources(pieces, count=500)):
+			name = names[i % len(names)]
+			for filter in FILTERS:
+				def stream(filter):
+					return iter_comments_stream(io.StringIO(source), name, 3, filter)
+
+				comments, error = [], ""
+				try:
+					comments.extend(stream(None))
+				except Exception as e:
+					error = type(e).__name__
+				if error != "IndentationError":
+					expected = describe(c for c in comments if filter.accepts_comment(c)), error
+					self.assertEqual(describeOrError(stream(filter)), expected,
+									 (source, name, filter))
+				try:
+					incremental = IncrementalComments(source, name, filter)
+					expected = describe(iter_comments_str(source, name, filter))
+				except Exception:
+					continue
+				self.assertEqual(describe(incremental.comments), expected, (source, name, filter))
+				try:
+					incremental.edit(len(source) // 2, 0, " x\n")
+				except Exception:
+					continue  # an unclosed comment, or Python that tokenize rejects
+				edited = source[:len(source) // 2] + " x\n" + source[len(source) // 2:]
+				self.assertEqual(describe(incremental.comments),
+								 describe(iter_comments_str(edited, name, filter)),
+								 (source, name, filter))
+
+	def testAsync(self):
+		source = "int a; // x\n/* y */ // x2\n"
+		filter = CommentFilter("x")
+		with TemporaryDirectory() as temp:
+			file = Path(temp) / "a.c"
+			file.write_text(source)
+			comments = asyncio.run(collect(aiter_comments_file(file, filter=filter)))
+			self.assertEqual([c.code for c in comments], ["// x", "// x2"])
+			[result] = asyncio.run(collect(aiter_comments_many([file], filter=filter)))
+			self.assertEqual([c.code for c in result.comments], ["// x", "// x2"])
+
+	def testFiles(self):
+		source = "int a; // x\n/* ё\nx */ char *b = \"// x\"; // y\n"
+		expected = describe(c for c in iter_comments_c(source) if "x" in c.text)
+		self.assertEqual(len(expected), 2)
+		with TemporaryDirectory() as temp:
+			root = Path(temp)
+			(root / "a.c").write_text(source, encoding="utf-8")
+			(root / "b.c").write_text(source, encoding="utf-8")
+			filter = CommentFilter("x")
+			for mapped in (False, True):
+				self.assertEqual(describe(iter_comments_file(root / "a.c", mapped, filter=filter)),
+								 expected)
+			with CommentCache(root / "cache.sqlite") as cache:
+				for _ in range(2):
+					self.assertEqual(describe(iter_comments_file(root / "a.c", cache=cache,
+																 filter=filter)), expected)
+					# the cache keeps all the comments
+					self.assertEqual(len(iter_comments_file(root / "a.c", cache=cache)), 3)
+				for workers in (1, 2):
+					results = list(scan_tree(root, workers=workers, filter=filter, cache=cache))
+					self.assertEqual([describe(r.comments) for r in results], [expected] * 2)
+					results = list(scan_tree(root, workers=workers, filter=filter))
+					self.assertEqual([describe(r.comments) for r in results], [expected] * 2)
+
+	def testMany(self):
+		items = [("# a\n# b", "a.sh"), ("/* a */ // b", "a.c"), ("# a", "a.txt")]
+		results = list(iter_comments_many(items, filter=CommentFilter("b")))
+		self.assertEqual([[c.code for c in r.comments] for r in results],
+						 [["# b"], ["// b"], []])
+
+	def testRegisteredParser(self):
+		with restoredRegistry():
+			register_language("filter-test", lambda code: iter_comments_shell(code),
+							  [".filter-test"])
+			comments = iter_comments_str("# a\n# b\n", "x.filter-test", CommentFilter("b"))
+		self.assertEqual([c.code for c in comments], ["# b"])
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import shutil
+import subprocess
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+
+
+def git(repo: Path, *args: str) -> str:
+	return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test",
+						   "-c", "user.email=test@example.com", *args],
+						  check=True, stdout=subprocess.PIPE,
+						  stderr=subprocess.PIPE).stdout.decode().strip()
+
+
+def commit(repo: Path, files: dict) -> str:
+	for name, content in files.items():
+		path = repo / name
+		if content is None:
+			path.unlink()
+			continue
+		path.parent.mkdir(parents=True, exist_ok=True)
+		path.write_bytes(content.encode())
+	git(repo, "add", "-A")
+	git(repo, "commit", "-q", "-m", "commit")
+	return git(repo, "rev-parse", "HEAD")
+
+
+def texts(results) -> dict:
+	return {r.path.as_posix(): [c.text for c in r.comments] for r in results}
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class GitTest(unittest.TestCase):
+
+	def setUp(self):
+		self.temp = TemporaryDirectory()
+		self.repo = Path(self.temp.name)
+		git(self.repo, "init", "-q")
+		self.first = commit(self.repo, {
+			"a.py": "# a\nx = 1\n",
+			"src/b.c": "/* b */ int b; // ё\n",
+			"readme.txt": "# not a comment\n",
+			"c.sh": "# c\n"})
+		self.second = commit(self.repo, {
+			"a.py": "# a2\n",
+			"src/d.go": "// d\r\n",
+			"c.sh": None})
+
+	def tearDown(self):
+		self.temp.cleanup()
+
+	def testRevisions(self):
+		for workers in (1, 2):
+			self.assertEqual(texts(scan_git(self.repo, workers=workers)), {
+				"a.py": [" a2"], "src/b.c": [" b ", " ё"], "src/d.go": [" d\r"]})
+			self.assertEqual(texts(scan_git(str(self.repo), self.first, workers=workers)), {
+				"a.py": [" a"], "src/b.c": [" b ", " ё"], "c.sh": [" c"]})
+
+	def testSince(self):
+		self.assertEqual(texts(scan_git(self.repo, since=self.first, workers=1)), {
+			"a.py": [" a2"], "src/d.go": [" d\r"]})
+		self.assertEqual(texts(scan_git(self.repo, since=self.second, workers=1)), {})
+
+	def testWorkingTreeIgnored(self):
+		(self.repo / "a.py").write_text("# changed\n")
+		self.assertEqual(texts(scan_git(self.repo, workers=1))["a.py"], [" a2"])
+
+	def testFilter(self):
+		results = scan_git(self.repo, workers=1, filter=CommentFilter(multiline=True))
+		self.assertEqual(texts(results)["src/b.c"], [" b "])
+
+	def testErrors(self):
+		commit(self.repo, {"bad.c": "/* unterminated"})
+		[result] = [r for r in scan_git(self.repo, workers=1) if r.path.name == "bad.c"]
+		self.assertIsInstance(result.error, UnterminatedCommentError)
+		with self.assertRaises(subprocess.CalledProcessError):
+			list(scan_git(self.repo, "no-such-revision"))
+
+	def testMissingObject(self):
+		blob = git(self.repo, "rev-parse", "HEAD:src/b.c")
+		(self.repo / ".git" / "objects" / blob[:2] / blob[2:]).unlink()
+		results = {r.path.as_posix(): r for r in scan_git(self.repo, workers=1)}
+		self.assertIsInstance(results["src/b.c"].error, FileError)
+		self.assertEqual([c.text for c in results["a.py"].comments], [" a2"])
+
+
+class BlobsTest(unittest.TestCase):
+
+	def testSameAsStr(self):
+		blobs = [("a.c", "/* x */ // y".encode()), ("b.sh", b"\xff"), ("c.py", b"# z")]
+		for workers in (1, 2):
+			results = list(scan_blobs(iter(blobs), workers=workers, chunk_size=2))
+			self.assertEqual([r.path.name for r in results], ["a.c", "b.sh", "c.py"])
+			self.assertEqual([c.text for c in results[0].comments], [" x ", " y"])
+			self.assertIsInstance(results[1].error, UnicodeDecodeError)
+			self.assertEqual([c.text for c in results[2].comments], [" z"])
+
+	def testReadError(self):
+		error = FileError("cannot read")
+		[result] = scan_blobs([("a.c", error)], workers=1)
+		self.assertIs(result.error, error)
@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+from commie.tests.helper import random_sources
+
+
+def texts(groups) -> list:
+	return [[c.text for c in group] for group in groups]
+
+
+class DetachedGlueTest(unittest.TestCase):
+
+	def testRandom(self):
+		pieces = ["\n", "\n", "\r\n", " ", "  ", "\t", "\f", "\u2028", "x", "//", "// x\n",
+				  "# x\n", "/*", "*/", "#"]
+		for i, source in enumerate(random_sources(pieces, count=3000)):
+			name = ["a.c", "a.sh", "a.py"][i % 3]
+			try:
+				comments = list(iter_comments_str(source, name))
+			except Exception:
+				continue
+			expected = texts(group_singleline_comments(comments))
+			self.assertEqual(texts(group_singleline_comments(c.detach() for c in comments)),
+							 expected, (source, name))
+			if i % 10 == 0:
+				with TemporaryDirectory() as temp:
+					file = Path(temp) / name
+					file.write_bytes(source.encode())
+					mapped = iter_comments_file(file, mapped=True)
+					self.assertEqual(texts(group_singleline_comments(mapped)), expected,
+									 (source, name))
+			try:
+				stream = list(iter_comments_stream(io.StringIO(source), name, chunk_size=3))
+			except Exception:
+				# tokenize finds errors the fast Python parser does not
+				continue
+			self.assertEqual(texts(group_singleline_comments(stream)), expected, (source, name))
+
+	def testEntryPoints(self):
+		source = "int a;\n  // one\n  // two\n\n\n  // three\nint b; // four\n  // five\n"
+		expected = [[" one", " two"], [" three"], [" four"], [" five"]]
+		self.assertEqual(texts(group_singleline_comments(iter_comments_str(source, "a.c"))),
+						 expected)
+		with TemporaryDirectory() as temp:
+			root = Path(temp)
+			file = root / "a.c"
+			file.write_text(source)
+			self.assertEqual(texts(group_singleline_comments(
+				iter_comments_file(file, mapped=True))), expected)
+			with CommentCache(root / "cache.sqlite") as cache:
+				for _ in range(2):  # a miss, then a hit
+					self.assertEqual(texts(group_singleline_comments(
+						iter_comments_file(file, cache=cache))), expected)
+			[result] = scan_tree(root, workers=1)
+			self.assertEqual(texts(group_singleline_comments(result.comments)), expected)
+			[result] = iter_comments_many([(source, "a.c")], workers=2)
+			self.assertEqual(texts(group_singleline_comments(result.comments)), expected)
@@ -6,6 +6,8 @@ import unittest
 from typing import List
 
 from commie import iter_comments_go, Comment, UnterminatedCommentError
+from commie.parsers.c_parser_state import _iter_comments_stepwise
+from commie.tests.helper import random_sources, spansOrError
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -84,3 +86,10 @@ class GoParserTest(unittest.TestCase):
 		code = 'a := 1 /* Unterminated\\n comment'
 		with self.assertRaises(UnterminatedCommentError):
 			commentsToList(code)
+
+	def testSameAsStepwise(self):
+		pieces = ['/', '*', '"', "'", '`', '\\', '\n', 'a', '//', '/*', '*/']
+		for code in random_sources(pieces):
+			self.assertEqual(spansOrError(iter_comments_go(code)),
+							 spansOrError(_iter_comments_stepwise(code, "\"'`")),
+							 repr(code))
@@ -1,2 +1,45 @@
+import random
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from commie import x02_detector
+from commie.x01_common import Comment
+
+
 def minimize(text:str) -> str:
-	return " ".join(text.split())
\ No newline at end of file
+	return " ".join(text.split())
+
+
+def random_sources(pieces: Sequence[str], count: int = 3000,
+				   max_pieces: int = 30, seed: int = 1) -> Iterable[str]:
+	"""Generates short sources glued from the given pieces. The sequence is
+	the same on every run."""
+	rnd = random.Random(seed)
+	for _ in range(count):
+		yield "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, max_pieces)))
+
+
+def spansOrError(comments: Iterable[Comment]) -> Tuple[List[tuple], str]:
+	"""Returns spans of all the comments and the name of the exception that
+	stopped the iteration (if any)."""
+	result: List[tuple] = []
+	try:
+		for c in comments:
+			result.append((c.code_span, c.text_span, c.multiline))
+	except Exception as e:
+		return result, type(e).__name__
+	return result, ""
+
+
+@contextmanager
+def restoredRegistry() -> Iterator[None]:
+	"""Restores the registered languages, extensions and file names when
+	the block ends, so a test does not leave its parsers to other tests."""
+	registries = (x02_detector._LANGUAGES, x02_detector._EXTENSIONS, x02_detector._FILENAMES)
+	saved: List[Tuple[dict, dict]] = [(registry, dict(registry)) for registry in registries]
+	try:
+		yield
+	finally:
+		for registry, copy in saved:
+			registry.clear()
+			registry.update(copy)
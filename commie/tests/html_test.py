@@ -7,6 +7,8 @@ from typing import List
 
 from commie.x01_common import Comment
 from .. import iter_comments_html, UnterminatedCommentError
+from ..parsers.html_parser_regex import _extract_comments_regex
+from .helper import random_sources, spansOrError
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -97,3 +99,17 @@ class HtmlParserTest(unittest.TestCase):
 		code = 'not a comment-->'
 		comments = commentsToList(code)
 		self.assertEqual(comments, [])
+
+	def testCommentInQuotedLiteral(self):
+		code = '<p title="<!-- not a comment -->">"unpaired <!-- comment -->'
+		comments = commentsToList(code)
+
+		self.assertEqual(len(comments), 1)
+		self.assertEqual(comments[0].code, '<!-- comment -->')
+
+	def testSameAsRegex(self):
+		pieces = ['<!--', '-->', '<', '!', '-', '"', '\n', 'a', ' ', '<!-- x -->']
+		for code in random_sources(pieces):
+			self.assertEqual(spansOrError(iter_comments_html(code)),
+							 spansOrError(_extract_comments_regex(code)),
+							 repr(code))
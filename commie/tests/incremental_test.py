@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import random
+import unittest
+
+from commie import *
+from commie.tests.helper import random_sources, spansOrError
+from commie.x02_detector import pickfunc
+
+
+class IncrementalTest(unittest.TestCase):
+
+	def testSameAsFullParse(self):
+		pieces = ['"', "'", "`", "\\", "\n", "#", "//", "/*", "*/", "/", "*",
+				  "<!--", "-->", "x", " ", "ё"]
+		names = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh", "a.py"]
+		rnd = random.Random(1)
+		for i, source in enumerate(random_sources(pieces, count=1000)):
+			name = names[i % len(names)]
+			try:
+				comments = IncrementalComments(source, name)
+			except Exception:
+				continue
+			for _ in range(10):
+				offset = rnd.randint(0, len(comments.source))
+				removed = rnd.randint(0, min(3, len(comments.source) - offset))
+				inserted = "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 3)))
+				spans, error = spansOrError(pickfunc(name)(
+					comments.source[:offset] + inserted + comments.source[offset + removed:]))
+				try:
+					result = spansOrError(comments.edit(offset, removed, inserted))
+				except Exception as e:
+					self.assertEqual(type(e).__name__, error)
+				else:
+					self.assertEqual(result, (spans, error),
+									 (name, source, offset, removed, inserted))
+
+	def testRescansLittle(self):
+		source = "int x; /* comment */\n" * 10000
+		comments = IncrementalComments(source, "a.c")
+		offset = source.index("x", len(source) // 2)
+		result = comments.edit(offset, 1, "longer_name")
+		self.assertEqual(len(result), 10000)
+		self.assertLess(comments.rescanned.end - comments.rescanned.start, 100)
+		self.assertEqual(result[-1].code_span.end, len(comments.source) - 1)
+		self.assertEqual(result[-1].line, 10000)
+
+	def testStaleComments(self):
+		comments = IncrementalComments("a /* b */ c /* d */", "a.css")
+		first = comments.edit(0, 1, "x")
+		self.assertIs(comments.comments, first)
+		second = comments.edit(0, 1, "y")
+		self.assertEqual([c.code_span.start for c in second], [2, 12])
+		with self.assertRaises(RuntimeError):
+			first[0]
+		with self.assertRaises(RuntimeError):
+			len(first)
+
+	def testUnterminated(self):
+		comments = IncrementalComments("a /* b */ c", "a.css")
+		with self.assertRaises(UnterminatedCommentError):
+			comments.edit(11, 0, " /* d")
+		self.assertEqual([c.text for c in comments.edit(16, 0, " */")], [" b ", " d "])
+
+	def testOutOfSource(self):
+		comments = IncrementalComments("# abc", "a.sh")
+		with self.assertRaises(ValueError):
+			comments.edit(3, 5, "")
@@ -0,0 +1,43 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+
+from commie import *
+from commie.tests.helper import random_sources, spansOrError
+
+
+class ManyTest(unittest.TestCase):
+
+	def makeItems(self):
+		pieces = ['"', "'", "\\", "\n", "#", "//", "/*", "*/", "<!--", "-->", "x", " ", "ё"]
+		names = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh", "a.py", "a.txt"]
+		return [(source, names[i % len(names)])
+				for i, source in enumerate(random_sources(pieces, count=500))]
+
+	def check(self, items, results):
+		self.assertEqual([r.position for r in results], list(range(len(items))))
+		for (code, filename), result in zip(items, results):
+			try:
+				spans, error = spansOrError(iter_comments_str(code, filename))
+			except FormatUndetectedError:
+				spans, error = [], "FormatUndetectedError"
+			if error:
+				self.assertEqual((result.comments, type(result.error).__name__), ([], error))
+			else:
+				self.assertIsNone(result.error)
+				self.assertEqual(spansOrError(result.comments), (spans, ""), (code, filename))
+
+	def testSameAsStr(self):
+		items = self.makeItems()
+		self.check(items, list(iter_comments_many(items, chunk_size=7)))
+
+	def testWorkers(self):
+		items = self.makeItems()
+		results = list(iter_comments_many(iter(items), workers=2, chunk_size=50))
+		self.check(items, results)
+		self.assertTrue(all(c.is_detached for r in results for c in r.comments))
+
+	def testLines(self):
+		[result] = iter_comments_many([("x = 1\n\n# third", "a.py")])
+		self.assertEqual((result.comments[0].line, result.comments[0].text), (3, " third"))
@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List
+
+from commie import *
+from commie import x02_mapped
+from commie.x02_detector import pickfunc
+from commie.tests.helper import random_sources
+
+
+def describe(comments) -> List[tuple]:
+	return [(c.code_span, c.text_span, c.multiline, c.code, c.text,
+			 c.line, c.column, c.end_line, c.end_column) for c in comments]
+
+
+class MappedTest(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.dir = Path(self.tempDir.name)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def write(self, name: str, data: bytes) -> Path:
+		file = self.dir / name
+		file.write_bytes(data)
+		return file
+
+	def assertSameAsStr(self, name: str, source: str):
+		file = self.write(name, source.encode("utf-8"))
+		func = pickfunc(name)
+		try:
+			expected = describe(func(source))
+		except UnterminatedCommentError:
+			with self.assertRaises(UnterminatedCommentError):
+				list(iter_comments_file(file, mapped=True))
+			return
+		mapped = list(iter_comments_file(file, mapped=True))
+		self.assertTrue(all(c.is_detached for c in mapped))
+		self.assertEqual(describe(mapped), expected, repr(source))
+
+	def testLanguages(self):
+		pieces = ['"', "'", "`", "\\", "\n", "\r\n", "#", "//", "/*", "*/",
+				  "<!--", "-->", "x", "ё", "日本", "😀"]
+		names = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh"]
+		for i, source in enumerate(random_sources(pieces, count=1500)):
+			self.assertSameAsStr(names[i % len(names)], source)
+
+	def testSmallPieces(self):
+		# the bytes between comments are decoded in pieces that may end in
+		# the middle of a character
+		source = "ё😀 日本\n" * 50 + "/* ё */ x // 😀\n" + "日本\n" * 50 + "/**/"
+		old = x02_mapped._PIECE_SIZE
+		x02_mapped._PIECE_SIZE = 7
+		try:
+			self.assertSameAsStr("a.c", source)
+		finally:
+			x02_mapped._PIECE_SIZE = old
+
+	def testEmpty(self):
+		self.assertEqual(list(iter_comments_file(self.write("a.c", b""), mapped=True)), [])
+
+	def testInvalidUtf8(self):
+		file = self.write("a.c", b"// ok\n\xff\xfe // more")
+		with self.assertRaises(UnicodeDecodeError):
+			list(iter_comments_file(file, mapped=True))
+
+	def testStopEarly(self):
+		file = self.write("a.sh", b"# one\n# two\n# three\n")
+		comments = iter_comments_file(file, mapped=True)
+		self.assertEqual(next(iter(comments)).text, " one")
+		comments.close()  # type: ignore
+
+	def testFallsBackToReading(self):
+		file = self.write("a.py", "x = 1  # ё\n".encode("utf-8"))
+		self.assertEqual([c.text for c in iter_comments_file(file, mapped=True)], [" ё"])
@@ -2,10 +2,14 @@
 # SPDX-FileCopyrightText: Copyright (c) 2015 Jean-Ralph Aviles
 # SPDX-License-Identifier: BSD-3-Clause
 
+import tokenize
 import unittest
+from pathlib import Path
 from typing import List
 
 from .. import iter_comments_python, Comment
+from ..parsers.python_parser import _extract_comments_tokenize, _fstring_is_plain
+from .helper import random_sources, spansOrError
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -68,3 +72,67 @@ class PythonParserTest(unittest.TestCase):
 		self.assertEqual(comments[0].code, "# this is another comment")
 		self.assertEqual(comments[0].text, " this is another comment")
 		self.assertEqual(comments[0].multiline, False)
+
+	def testNonAsciiBeforeComment(self):
+		code = 'name = "Артём"\n# author\n'
+		for comments in [commentsToList(code), list(_extract_comments_tokenize(code))]:
+			self.assertEqual(len(comments), 1)
+			self.assertEqual(comments[0].code, "# author")
+
+	def testTripleQuotedString(self):
+		code = 'x = """\n# not a comment\n"""  # comment\n'
+		comments = commentsToList(code)
+		self.assertEqual([c.code for c in comments], ["# comment"])
+
+	def testUnterminatedTripleQuotedString(self):
+		code = '# comment\nx = """\n# not a comment\n'
+		with self.assertRaises(tokenize.TokenError):
+			commentsToList(code)
+
+	def testUnclosedBracket(self):
+		code = 'x = (1,  # comment\n'
+		with self.assertRaises(tokenize.TokenError):
+			commentsToList(code)
+
+
+class TokenizeEquivalenceTest(unittest.TestCase):
+	"""The scanner must find exactly the same comments as tokenize."""
+
+	def assertSameAsTokenize(self, code: str):
+		expected = spansOrError(_extract_comments_tokenize(code))
+		if expected[1] == "IndentationError":
+			return  # indentation is not checked by the scanner
+		self.assertEqual(spansOrError(iter_comments_python(code)), expected, repr(code))
+
+	def testStdlibModules(self):
+		import argparse, dataclasses
+		for module in [tokenize, argparse, dataclasses]:
+			self.assertSameAsTokenize(Path(module.__file__).read_text(encoding="utf-8"))
+
+	def testRandom(self):
+		pieces = ["#", "'", '"', "'''", '"""', "\\", "\n", "\r\n", "\r", "(", ")",
+				  "[", "]", "a", " ", "f", "{", "}", "# x\n", "x = 1\n", "\\\n",
+				  "0x", "1_", "0", ".", "e", "+", ":", "\t", "\x0c", "\x0b"]
+		for code in random_sources(pieces):
+			self.assertSameAsTokenize(code)
+
+	def testFStringIsPlain(self):
+		def plain(code: str) -> bool:
+			return _fstring_is_plain(code, 0, len(code))
+
+		self.assertTrue(plain('f"{x} {{literal}} {y!r:>{width}}"'))
+		self.assertFalse(plain('f"{d['))  # cut by a nested quote of the same kind
+		self.assertFalse(plain('f"""{x  # comment\n}"""'))
+		self.assertFalse(plain('f"}"'))
+		self.assertTrue(plain('f"{{{x}}} {id(self):#x} {d[{1: 2}[1]]}"'))
+		self.assertFalse(plain('f"{a)}"'))
+		self.assertFalse(plain('f"{0x}"'))
+		self.assertFalse(plain('f"{a\\b}"'))
+		self.assertFalse(plain('f"{d[\'key\']}"'))
+
+	def testRejectedByCTokenizer(self):
+		for code in [")[a [[)]f", ":?\x0c0x ", " :#)#\n\t=", "0b2\n", "1_ # x\n", "x\x0b # x\n",
+					 "f'{a)}' # x\n", "f'{0x}' # x\n", "elif '({' # x\n", "x\0 # x\n",
+					 "(" * 201 + ")" * 201 + " # x\n", "if x:\n\ty\n        # x\n",
+					 'f"!r{\':}e:e.("""', '\r\n\nf"{\'\t}f"']:
+			self.assertSameAsTokenize(code)
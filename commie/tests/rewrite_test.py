@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import re
+import unittest
+
+from commie import *
+from commie.tests.helper import random_sources
+
+NAMES = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh", "a.py"]
+
+
+def replacedBySlicing(source: str, filename: str, fn) -> str:
+	for comment in reversed(list(iter_comments_str(source, filename))):
+		start, end = comment.code_span
+		source = source[:start] + fn(comment) + source[end:]
+	return source
+
+
+def strippedBySlicing(source: str, filename: str, keepNewlines: bool) -> str:
+	result = ""
+	pos = 0
+	for comment in iter_comments_str(source, filename):
+		start, end = comment.code_span
+		result += source[pos:start]
+		if keepNewlines and "\n" in comment.code:
+			result += "".join(re.findall(r"\r?\n", comment.code))
+		elif filename != "a.html" and result[-1:].strip() and source[end:end + 1].strip():
+			result += " "
+		pos = end
+	return result + source[pos:]
+
+
+class RewriteTest(unittest.TestCase):
+
+	def testSameAsSlicing(self):
+		pieces = ['"', "'", "`", "\\", "\n", "\r\n", "#", "//", "/*", "*/", "<!--", "-->",
+				  "x", " ", "ё"]
+		for i, source in enumerate(random_sources(pieces, count=2000)):
+			name = NAMES[i % len(NAMES)]
+			try:
+				expected = replacedBySlicing(source, name, lambda c: "")
+			except Exception as e:
+				with self.assertRaises(type(e)):
+					strip_comments(source, name)
+				continue
+			for keepNewlines in (False, True):
+				self.assertEqual(strip_comments(source, name, keepNewlines),
+								 strippedBySlicing(source, name, keepNewlines), (source, name))
+			stripped = strip_comments(source, name)
+			self.assertEqual(stripped.count("\n"),
+							 expected.count("\n") + sum(c.code.count("\n") for c in
+														iter_comments_str(source, name)))
+			fn = lambda c: f"[{c.line}:{c.column}:{c.text}]"
+			self.assertEqual(replace_comments(source, name, fn),
+							 replacedBySlicing(source, name, fn), (source, name))
+
+	def testManyComments(self):
+		# the time is measured by benchmarks/rewrite_comments.py
+		source = "int a; /* b */ // c\n" * 200_000
+		stripped = strip_comments(source, "a.c")
+		replaced = replace_comments(source, "a.c", lambda c: "")
+		self.assertEqual(stripped, "int a;  \n" * 200_000)
+		self.assertEqual(replaced, stripped)
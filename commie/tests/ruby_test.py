@@ -5,7 +5,7 @@
 import unittest
 from typing import List
 
-from commie import iter_comments_ruby, Comment
+from commie import iter_comments_ruby, Comment, Span
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -98,3 +98,12 @@ class ShellParserTest(unittest.TestCase):
 		self.assertEqual(comments[0].code, '# "a comment"')
 		self.assertEqual(comments[0].text, ' "a comment"')
 		self.assertEqual(comments[0].multiline, False)
+
+	def testEmptyComment(self):
+		code = "puts 1 #\nputs 2"
+		comments = commentsToList(code)
+
+		self.assertEqual(len(comments), 1)
+
+		self.assertEqual(comments[0].code_span, Span(7, 8))
+		self.assertEqual(comments[0].text_span, Span(8, 8))
@@ -5,7 +5,7 @@ import unittest
 from typing import List
 
 from commie import iter_comments_sass
-from commie.x01_common import Comment
+from commie.x01_common import Comment, Span
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -85,3 +85,14 @@ class SassParserTest(unittest.TestCase):
 
 		self.assertEqual(len(comments[0].code.splitlines()), 4)
 		self.assertEqual(len(comments[1].code.splitlines()), 1)
+
+	def testTextRepeatsMarkup(self):
+		# the inner text "/" also occurs at the start of the comment
+		code = "a { } ///"
+		comments = commentsToList(code)
+
+		self.assertEqual(len(comments), 1)
+
+		self.assertEqual(comments[0].code_span, Span(6, 9))
+		self.assertEqual(comments[0].text_span, Span(8, 9))
+		self.assertEqual(comments[0].text, "/")
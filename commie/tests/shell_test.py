@@ -6,6 +6,8 @@ import unittest
 from typing import List
 
 from commie import iter_comments_shell, Comment
+from commie.parsers.shell_parser_state import _extract_comments_stepwise
+from commie.tests.helper import random_sources, spansOrError
 
 
 def commentsToList(code: str) -> List[Comment]:
@@ -71,3 +73,10 @@ class ShellParserTest(unittest.TestCase):
 		self.assertEqual(comments[0].code, "# this is another comment")
 		self.assertEqual(comments[0].text, " this is another comment")
 		self.assertEqual(comments[0].multiline, False)
+
+	def testSameAsStepwise(self):
+		pieces = ['#', '"', "'", '\\', '\n', 'a', ' ', '# x', '$#']
+		for code in random_sources(pieces):
+			self.assertEqual(spansOrError(iter_comments_shell(code)),
+							 spansOrError(_extract_comments_stepwise(code)),
+							 repr(code))
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import asyncio
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import *
+from commie.tests.tree_test import makeTree
+
+
+class StatsTest(unittest.TestCase):
+
+	def setUp(self):
+		self.stats = ParseStats()
+		add_observer(self.stats)
+
+	def tearDown(self):
+		remove_observer(self.stats)
+
+	def testStr(self):
+		self.assertEqual(len(list(iter_comments_str("x = 'ё' # a\n# b", "a.py"))), 2)
+		with self.assertRaises(UnterminatedCommentError):
+			list(iter_comments_str("/* a */ /* b", "a.css"))
+
+		parsers = self.stats.parsers()
+		self.assertEqual(sorted(parsers), ["css", "python"])
+		python = parsers["python"]
+		self.assertEqual((python.files, python.bytes, python.comments, python.errors),
+						 (1, 16, 2, ()))
+		self.assertGreater(python.seconds, 0)
+		css = parsers["css"]
+		self.assertEqual((css.files, css.comments, css.errors),
+						 (1, 1, (("UnterminatedCommentError", 1),)))
+
+		slowest = self.stats.slowest()
+		self.assertEqual(sorted(e.file for e in slowest), ["a.css", "a.py"])
+		self.assertGreaterEqual(slowest[0].seconds, slowest[1].seconds)
+
+	def testStoppedEarly(self):
+		comments = iter(iter_comments_str("# a\n# b\n# c", "a.sh"))
+		next(comments)
+		del comments
+		self.assertEqual(self.stats.parsers()["shell"].comments, 1)
+
+	def testPrometheus(self):
+		list(iter_comments_str("<!-- a -->", "a.html"))
+		list(iter_comments_str("<!-- b -->", "b.html"))
+		text = self.stats.prometheus()
+		self.assertIn('# TYPE commie_files_total counter\ncommie_files_total{parser="html"} 2\n',
+					  text)
+		self.assertIn('commie_comments_total{parser="html"} 2\n', text)
+		self.assertNotIn("errors", text)
+
+	def testTreeWorkers(self):
+		with TemporaryDirectory() as temp:
+			makeTree(Path(temp))
+			for workers in (1, 2):
+				list(scan_tree(temp, workers=workers, chunk_size=1))
+		parsers = self.stats.parsers()
+		self.assertEqual(parsers["c"].files, 4)
+		self.assertEqual(parsers["c"].comments, 4)
+		self.assertEqual(parsers["c"].errors, (("UnterminatedCommentError", 2),))
+		self.assertEqual(parsers["python"].files, 2)
+
+	def testCache(self):
+		with TemporaryDirectory() as temp:
+			makeTree(Path(temp))
+			with CommentCache(Path(temp) / "cache.sqlite") as cache:
+				for workers in (1, 2):
+					list(scan_tree(temp, workers=workers, chunk_size=1, cache=cache))
+		c = self.stats.parsers()["c"]
+		# the hits are not parsed
+		self.assertEqual((c.files, c.cache_misses, c.cache_hits), (3, 3, 1))
+		self.assertEqual(c.errors, (("UnterminatedCommentError", 2),))
+		self.assertIn('commie_cache_hits_total{parser="c"} 1\n', self.stats.prometheus())
+
+	def testAsyncProcessPool(self):
+		async def parse(file: Path):
+			return [c async for c in aiter_comments_file(file, executor)]
+
+		with TemporaryDirectory() as temp, ProcessPoolExecutor(1) as executor:
+			makeTree(Path(temp))
+			asyncio.run(parse(Path(temp) / "a.c"))
+			with self.assertRaises(UnterminatedCommentError):
+				asyncio.run(parse(Path(temp) / "sub" / "bad.js"))
+		c = self.stats.parsers()["c"]
+		self.assertEqual((c.files, c.comments), (2, 2))
+		self.assertEqual(c.errors, (("UnterminatedCommentError", 1),))
+
+	def testRemoved(self):
+		remove_observer(self.stats)
+		list(iter_comments_str("// a", "a.c"))
+		add_observer(self.stats)
+		self.assertEqual(self.stats.parsers(), {})
@@ -0,0 +1,118 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import io
+import unittest
+from typing import List
+
+from commie import *
+from commie.parsers.python_parser import _extract_comments_tokenize
+from commie.tests.helper import random_sources, restoredRegistry
+from commie.x02_detector import pickfunc
+
+
+def describe(comments) -> List[tuple]:
+	return [(c.code_span, c.text_span, c.multiline, c.code, c.text,
+			 c.line, c.column, c.end_line, c.end_column) for c in comments]
+
+
+def describeOrError(comments) -> tuple:
+	result: List[tuple] = []
+	try:
+		for c in comments:
+			result.extend(describe([c]))
+	except Exception as e:
+		return result, type(e).__name__
+	return result, ""
+
+
+class RecordingStream(io.StringIO):
+	"""Remembers the largest size it was asked to read."""
+
+	def __init__(self, text: str):
+		super().__init__(text)
+		self.max_size = 0
+
+	def read(self, size=-1):
+		self.max_size = max(self.max_size, size)
+		return super().read(size)
+
+
+class StreamTest(unittest.TestCase):
+
+	def assertSameAsStr(self, filename: str, source: str, chunk_size: int):
+		expected = describeOrError(pickfunc(filename)(source))
+		if filename.endswith(".py"):
+			expected = describeOrError(_extract_comments_tokenize(source))
+		stream = io.StringIO(source)
+		self.assertEqual(
+			describeOrError(iter_comments_stream(stream, filename, chunk_size)),
+			expected, (filename, source, chunk_size))
+
+	def testLanguages(self):
+		pieces = ['"', "'", "`", "\\", "\n", "#", "//", "/*", "*/", "/", "*",
+				  "<!--", "-->", "<!-", "--", "x", " ", "ё"]
+		names = ["a.c", "a.go", "a.scss", "a.css", "a.html", "a.rb", "a.sh"]
+		for i, source in enumerate(random_sources(pieces, count=3000)):
+			self.assertSameAsStr(names[i % len(names)], source, 1 + i % 7)
+
+	def testPython(self):
+		pieces = ["#", "x", " ", "\n", "'", '"', "'''", "(", ")", "\\", "ё", "\r\n"]
+		for i, source in enumerate(random_sources(pieces, count=500)):
+			self.assertSameAsStr("a.py", source, 1 + i % 5)
+
+	def testBytes(self):
+		source = "/* ё */ x = '日本'; // 😀\n" * 20
+		expected = describe(iter_comments_c(source))
+		for chunk_size in (1, 2, 3, 5, 64):
+			stream = io.BytesIO(source.encode("utf-8"))
+			self.assertEqual(describe(iter_comments_stream(stream, "a.c", chunk_size)),
+							 expected)
+
+	def testRegisteredParser(self):
+		with restoredRegistry():
+			register_language("stream-test", lambda code: iter_comments_shell(code),
+							  [".stream-test"])
+			comments = list(iter_comments_stream(io.StringIO("a # b\n" * 100), "x.stream-test",
+												 8))
+		self.assertEqual(len(comments), 100)
+		self.assertEqual(comments[-1].line, 100)
+
+	def testUnterminated(self):
+		with self.assertRaises(UnterminatedCommentError):
+			list(iter_comments_stream(io.StringIO("x /* y\n" * 10), "a.c", 4))
+
+	def testBoundedReads(self):
+		stream = RecordingStream("int x; // comment\n" * 1000)
+		self.assertEqual(len(list(iter_comments_stream(stream, "a.c", 32))), 1000)
+		self.assertEqual(stream.max_size, 32)
+
+	def testLongComment(self):
+		source = "x /*" + "ё" * 5000 + "*/ y"
+		stream = RecordingStream(source)
+		comments = list(iter_comments_stream(stream, "a.css", 16))
+		self.assertEqual(describe(comments), describe(iter_comments_css(source)))
+		# reads grow with the comment, so it is not rescanned once per chunk
+		self.assertGreater(stream.max_size, 1000)
+
+	def testLongLine(self):
+		# minified code: a single line
+		for filename, unit in [("a.scss", 'x="a";/*c*/'), ("a.c", 'x="a";/*c*/'),
+							   ("a.css", "a{b:c}/*c*/"), ("a.html", '<a title="x"><!--c-->'),
+							   ("a.rb", "x=1;y=2;")]:
+			source = unit * 2000
+			stream = RecordingStream(source)
+			comments = list(iter_comments_stream(stream, filename, 32))
+			self.assertEqual(describe(comments), describe(pickfunc(filename)(source)))
+			# the line is not kept in memory
+			self.assertLess(stream.max_size, 64, filename)
+
+	def testLongLineLiterals(self):
+		# a Ruby literal may end at any quote further on the line: the rest of
+		# the line is kept until it ends
+		source = "x='a';" * 400 + " # end\n"
+		stream = RecordingStream(source)
+		comments = list(iter_comments_stream(stream, "a.rb", 32))
+		self.assertEqual(describe(comments), describe(iter_comments_ruby(source)))
+		self.assertGreater(stream.max_size, 1000)
+
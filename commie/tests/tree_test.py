@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from commie import scan_tree, iter_comments_file, UnterminatedCommentError, \
+	FormatUndetectedError
+
+
+def makeTree(root: Path):
+	(root / "sub").mkdir()
+	(root / ".git").mkdir()
+	(root / "a.c").write_text("int a; // first\n/* second */")
+	(root / "sub" / "b.py").write_text("x = 1\n\n# third\n")
+	(root / "sub" / "bad.js").write_text("/* unterminated")
+	(root / "notes.txt").write_text("# not parsed")
+	(root / ".git" / "hook.sh").write_text("# skipped")
+
+
+class ScanTreeTest(unittest.TestCase):
+
+	def scan(self, workers: int):
+		with TemporaryDirectory() as temp:
+			root = Path(temp)
+			makeTree(root)
+			return {str(r.path.relative_to(root)): r for r in scan_tree(root, workers=workers,
+																		 chunk_size=1)}
+
+	def check(self, results):
+		self.assertEqual(sorted(results), ["a.c", "sub/b.py", "sub/bad.js"])
+
+		a = results["a.c"]
+		self.assertIsNone(a.error)
+		self.assertEqual([c.code for c in a.comments], ["// first", "/* second */"])
+		self.assertTrue(all(c.is_detached for c in a.comments))
+
+		b = results["sub/b.py"].comments[0]
+		self.assertEqual((b.text, b.line, b.column, b.code_span.start), (" third", 3, 0, 7))
+
+		self.assertIsInstance(results["sub/bad.js"].error, UnterminatedCommentError)
+
+	def testSingleProcess(self):
+		self.check(self.scan(workers=1))
+
+	def testProcessPool(self):
+		self.check(self.scan(workers=2))
+
+	def testSniff(self):
+		with TemporaryDirectory() as temp:
+			root = Path(temp)
+			makeTree(root)
+			(root / "deploy").write_text("#!/usr/bin/env bash\n# deploy it\necho '#'\n")
+			(root / "page").write_text("<!DOCTYPE html>\n<!-- page -->")
+			(root / "README").write_text("# not a script\n")
+			results = {r.path.name: r for r in scan_tree(root, workers=1, sniff=True)}
+			self.assertEqual(sorted(results), ["a.c", "b.py", "bad.js", "deploy", "page"])
+			self.assertEqual([c.text for c in results["deploy"].comments],
+							 ["!/usr/bin/env bash", " deploy it"])
+			self.assertEqual([c.text for c in results["page"].comments], [" page "])
+
+			self.assertEqual(len(list(iter_comments_file(root / "deploy", sniff=True))), 2)
+			with self.assertRaises(FormatUndetectedError):
+				iter_comments_file(root / "deploy")
+			with self.assertRaises(FormatUndetectedError):
+				iter_comments_file(root / "README", sniff=True)
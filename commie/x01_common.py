@@ -2,8 +2,30 @@
 # SPDX-FileCopyrightText: Copyright (c) 2015 Jean-Ralph Aviles
 # SPDX-License-Identifier: BSD-3-Clause
 
+import hashlib
+import sys
 import unittest
-from typing import NamedTuple, Optional
+from bisect import bisect_right
+from typing import NamedTuple, Optional, List, Tuple
+
+
+def blanks_before(text: str, pos: int, before: str = "") -> str:
+	"""Returns the whitespace that ends at `pos` in the text, but not more
+	than three line breaks of it. That is enough to tell whether a comment
+	starts its line and whether it is on the line next to the previous
+	comment (see `group_singleline_comments`).
+
+	When the text is a part of the source, `before` is the source before
+	it (or just the whitespace at its end)."""
+	start = pos
+	newlines = 0
+	while start > 0 and newlines < 3 and text[start - 1].isspace():
+		start -= 1
+		if text[start] == "\n":
+			newlines += 1
+	if start == 0 and newlines < 3 and before:
+		return blanks_before(before + text[:pos], len(before) + pos)
+	return text[start:pos]
 
 
 class Span(NamedTuple):
@@ -14,10 +36,80 @@ class Span(NamedTuple):
 		return text[self.start:self.end]
 
 
+class LineIndex:
+	"""Converts positions in a text to line and column numbers.
+
+	Line starts are found on the first lookup, after that each lookup is a
+	binary search. Parsers create one index per source and share it between
+	all the comments found in it. Lines are numbered from 1, columns from 0.
+
+	The text may also be a fragment of a larger source: then `offset`,
+	`line` and `column` tell where the fragment starts in that source.
+	"""
+
+	__slots__ = ("text", "offset", "line", "column", "_starts", "_digest")
+
+	def __init__(self, text: str, offset: int = 0, line: int = 1, column: int = 0):
+		self.text = text
+		self.offset = offset
+		self.line = line
+		self.column = column
+		self._starts: Optional[List[int]] = None
+		self._digest: Optional[Tuple[int, bytes]] = None
+
+	@property
+	def digest(self) -> Tuple[int, bytes]:
+		"""The length and a BLAKE2 hash of the text, computed once. Comments
+		of equal sources that are different objects (a file read twice) are
+		compared by it, not by the whole text."""
+		if self._digest is None:
+			data = self.text.encode("utf-8", "surrogatepass")
+			self._digest = len(self.text), hashlib.blake2b(data).digest()
+		return self._digest
+
+	@property
+	def line_starts(self) -> List[int]:
+		"""Positions (relative to the text) where the lines start."""
+		if self._starts is None:
+			starts = [0]
+			find = self.text.find
+			pos = find("\n")
+			while pos >= 0:
+				starts.append(pos + 1)
+				pos = find("\n", pos + 1)
+			self._starts = starts
+		return self._starts
+
+	def line_of(self, pos: int) -> int:
+		return self.line - 1 + bisect_right(self.line_starts, pos - self.offset)
+
+	def column_of(self, pos: int) -> int:
+		return pos - self.line_start(pos)
+
+	def line_start(self, pos: int) -> int:
+		"""Returns the position where the line containing `pos` starts."""
+		starts = self.line_starts
+		index = bisect_right(starts, pos - self.offset) - 1
+		if index == 0:
+			return self.offset - self.column
+		return self.offset + starts[index]
+
+
 class Comment:
-	"""Represents comments found in a source code string."""
+	"""Represents comments found in a source code string.
+
+	A detached comment (see `detach`) does not keep the source. Its `source`
+	is just the code of the comment, but spans, lines and columns are still
+	the ones of the original source. It keeps its line and column as numbers
+	instead of a line index, and the whitespace before the code (see
+	`blanks`) as an interned string shared with the other comments.
+	"""
+
+	__slots__ = ("source", "code_span", "text_span", "multiline",
+				 "_text", "_code", "_line_index", "_line", "_column", "_blanks")
 
-	def __init__(self, source: str, code_span: Span, text_span: Span, multiline: bool):
+	def __init__(self, source: str, code_span: Span, text_span: Span, multiline: bool,
+				 line_index: LineIndex = None):
 
 		self.source = source
 		self.code_span: Span = code_span
@@ -26,19 +118,102 @@ class Comment:
 
 		self._text: Optional[str] = None
 		self._code: Optional[str] = None
+		self._line_index: Optional[LineIndex] = line_index
+		# the line and the column of a detached comment, None if not detached
+		self._line: Optional[int] = None
+		self._column = 0
+		self._blanks: Optional[str] = None
+
+	@classmethod
+	def _detached(cls, code: str, code_span: Span, text_span: Span, multiline: bool,
+				  line: int, column: int, blanks: str) -> 'Comment':
+		comment = cls(code, code_span, text_span, multiline)
+		comment._line = line
+		comment._column = column
+		# the same few runs of whitespace come before most comments
+		comment._blanks = sys.intern(blanks)
+		return comment
+
+	def detach(self) -> 'Comment':
+		"""Returns the same comment that does not refer to the source. When
+		all comments of a source are detached, the source can be garbage
+		collected."""
+		if self._line is not None:
+			return self
+		return Comment._detached(self.code, self.code_span, self.text_span, self.multiline,
+								 self.line, self.column, self.blanks)
+
+	@property
+	def is_detached(self) -> bool:
+		return self._line is not None
+
+	def _extract(self, span: Span) -> str:
+		if self._line is None:
+			return span.extract(self.source)
+		offset = self.code_span.start
+		return self.source[span.start - offset:span.end - offset]
 
 	@property
 	def text(self) -> str:
 		if self._text is None:
-			self._text = self.text_span.extract(self.source)
+			self._text = self._extract(self.text_span)
 		return self._text
 
 	@property
 	def code(self) -> str:
 		if self._code is None:
-			self._code = self.code_span.extract(self.source)
+			self._code = self._extract(self.code_span)
 		return self._code
 
+	@property
+	def blanks(self) -> str:
+		"""The whitespace right before the comment in the source, up to three
+		line breaks of it (see `blanks_before`). Detached comments keep it,
+		so they can be grouped like the others."""
+		if self._blanks is None:
+			self._blanks = blanks_before(self.source, self.code_span.start)
+		return self._blanks
+
+	@property
+	def line_index(self) -> LineIndex:
+		"""The index of the source. It is shared by all the comments a parser
+		found in the same source. A detached comment gets a new index of its
+		code each time."""
+		if self._line is not None:
+			return LineIndex(self.source, self.code_span.start, self._line, self._column)
+		if self._line_index is None:
+			self._line_index = LineIndex(self.source)
+		return self._line_index
+
+	@property
+	def line(self) -> int:
+		"""The number of the line where the comment starts (from 1)."""
+		if self._line is not None:
+			return self._line
+		return self.line_index.line_of(self.code_span.start)
+
+	@property
+	def column(self) -> int:
+		"""The column where the comment starts (from 0)."""
+		if self._line is not None:
+			return self._column
+		return self.line_index.column_of(self.code_span.start)
+
+	@property
+	def end_line(self) -> int:
+		"""The number of the line where the comment ends."""
+		if self._line is not None:
+			return self._line + self.source.count("\n")
+		return self.line_index.line_of(self.code_span.end)
+
+	@property
+	def end_column(self) -> int:
+		"""The column right after the last character of the comment."""
+		if self._line is not None:
+			last = self.source.rfind("\n")
+			return self._column + len(self.source) if last < 0 else len(self.source) - last - 1
+		return self.line_index.column_of(self.code_span.end)
+
 	def __str__(self):
 		return self.code
 
@@ -46,11 +221,23 @@ class Comment:
 		return f"Comment({repr(self.source)}, {self.code_span}, {self.text_span}, {self.multiline})"
 
 	def __eq__(self, other):
+		# Cached values do not take part. Sources are compared last: usually
+		# it is the same object, otherwise their digests are compared, each
+		# computed once per source. A detached source is just the code
 		if isinstance(other, self.__class__):
-			if self.__dict__ == other.__dict__:
+			if self.code_span != other.code_span or self.text_span != other.text_span \
+					or self.multiline != other.multiline or self.is_detached != other.is_detached:
+				return False
+			if self.source is other.source:
 				return True
+			if self._line is not None:
+				return self.source == other.source
+			return self.line_index.digest == other.line_index.digest
 		return False
 
+	def __hash__(self):
+		return hash((hash(self.source), self.code_span, self.text_span, self.multiline))
+
 
 class TestComment(unittest.TestCase):
 	def test(self):
@@ -63,3 +250,112 @@ class TestComment(unittest.TestCase):
 		self.assertEqual(str(c),
 						 "/* commented */")
 
+
+	def test_lines(self):
+		source = "int x; /* one\n two */\n// three"
+		index = LineIndex(source)
+		a = Comment(source, Span(7, 21), Span(9, 19), True, index)
+		b = Comment(source, Span(22, 30), Span(24, 30), False, index)
+
+		self.assertEqual((a.line, a.column, a.end_line, a.end_column), (1, 7, 2, 7))
+		self.assertEqual((b.line, b.column, b.end_line, b.end_column), (3, 0, 3, 8))
+		self.assertIs(a.line_index, b.line_index)
+
+	def test_equality_ignores_caches(self):
+		a = Comment("/* a */", Span(0, 7), Span(2, 5), True)
+		b = Comment("/* a */", Span(0, 7), Span(2, 5), True)
+		self.assertEqual(a.text, " a ")
+		self.assertEqual(a, b)
+
+
+	def test_detach(self):
+		source = "int x;\nint y; /* one\n two */ z"
+		index = LineIndex(source)
+		c = Comment(source, Span(14, 28), Span(16, 26), True, index)
+		d = c.detach()
+
+		self.assertTrue(d.is_detached)
+		self.assertFalse(c.is_detached)
+		self.assertEqual(d.source, "/* one\n two */")
+		self.assertEqual((d.code, d.text), (c.code, c.text))
+		self.assertEqual((d.code_span, d.text_span, d.multiline),
+						 (c.code_span, c.text_span, c.multiline))
+		self.assertEqual((d.line, d.column, d.end_line, d.end_column),
+						 (c.line, c.column, c.end_line, c.end_column))
+		self.assertEqual((d.blanks, c.blanks), (" ", " "))
+		self.assertEqual(d.line_index.line_of(27), 3)
+		self.assertIs(d.detach(), d)
+
+	def test_detached_is_smaller(self):
+		source = "int x;\n" * 1000 + "int y;\n  // one\n"
+		c = Comment(source, Span(source.index("//"), len(source) - 1),
+					Span(source.index("//") + 2, len(source) - 1), False)
+		d = c.detach()
+		self.assertEqual((d.line, d.column, d.end_line, d.end_column), (1002, 2, 1002, 8))
+		self.assertIsNone(d._line_index)
+		self.assertIs(d.blanks, c.detach().blanks)
+
+	def test_blanks_before(self):
+		self.assertEqual(blanks_before("a \n\t b", 5), " \n\t ")
+		self.assertEqual(blanks_before("  b", 2), "  ")
+		self.assertEqual(blanks_before("a\n\n \n\n b", 7), "\n \n\n ")
+		self.assertEqual(blanks_before(" \n b", 3, "x\t"), "\t \n ")
+		self.assertEqual(blanks_before("\n\n\n b", 4, "x\t"), "\n\n\n ")
+
+	def test_equality_and_hash(self):
+		source = "int x; /* a */ /* b */"
+		copy = "".join(list(source))  # equal, but not the same object
+		a = Comment(source, Span(7, 14), Span(9, 12), True)
+		b = Comment(copy, Span(7, 14), Span(9, 12), True)
+		other = Comment(source, Span(15, 22), Span(17, 20), True)
+
+		self.assertEqual(a, b)
+		self.assertEqual(hash(a), hash(b))
+		self.assertNotEqual(a, other)
+		self.assertNotEqual(a, Comment(source + " ", Span(7, 14), Span(9, 12), True))
+		self.assertNotEqual(a, a.detach())
+		self.assertEqual(a.detach(), b.detach())
+		self.assertEqual(len({a, b, other, a.detach(), b.detach()}), 3)
+
+	def test_equality_by_digest(self):
+		source = "/* a */" + " " * 1000
+		index = LineIndex(source)
+		a = Comment(source, Span(0, 7), Span(2, 5), True, index)
+		b = Comment("".join(list(source)), Span(0, 7), Span(2, 5), True)
+		self.assertEqual(a, b)
+		self.assertEqual(index.digest, b.line_index.digest)
+		digest = index.digest
+		self.assertEqual(a, b)
+		self.assertIs(index.digest, digest)  # not computed again
+		self.assertNotEqual(a, Comment("/* a */" + " " * 999 + "x", Span(0, 7), Span(2, 5), True))
+
+	def test_slots(self):
+		c = Comment("/* a */", Span(0, 7), Span(2, 5), True)
+		with self.assertRaises(AttributeError):
+			c.__dict__
+
+
+class TestLineIndex(unittest.TestCase):
+	def test(self):
+		index = LineIndex("ab\ncd\n\nef")
+		self.assertEqual(index.line_starts, [0, 3, 6, 7])
+		self.assertEqual([index.line_of(p) for p in range(9)], [1, 1, 1, 2, 2, 2, 3, 4, 4])
+		self.assertEqual([index.column_of(p) for p in range(9)], [0, 1, 2, 0, 1, 2, 0, 0, 1])
+		self.assertEqual(index.line_start(4), 3)
+
+	def test_fragment(self):
+		# "cd\nef" taken from "ab\ncd\nef" at offset 3
+		index = LineIndex("cd\nef", offset=3, line=2, column=0)
+		self.assertEqual([index.line_of(p) for p in range(3, 8)], [2, 2, 2, 3, 3])
+		self.assertEqual([index.column_of(p) for p in range(3, 8)], [0, 1, 2, 0, 1])
+
+		# "d\ne" taken from the same source at offset 4
+		index = LineIndex("d\ne", offset=4, line=2, column=1)
+		self.assertEqual([index.line_of(p) for p in range(4, 7)], [2, 2, 3])
+		self.assertEqual([index.column_of(p) for p in range(4, 7)], [1, 2, 0])
+		self.assertEqual(index.line_start(5), 3)
+
+	def test_empty(self):
+		index = LineIndex("")
+		self.assertEqual(index.line_of(0), 1)
+		self.assertEqual(index.column_of(0), 0)
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The parsers check the filter against the positions found by the scanner,
+# before a Comment is created or any text is sliced. The pattern is searched
+# in the source itself between the positions of the text. That is the same
+# as searching in the text, unless the pattern looks outside the text: at
+# the start of the string, at a word boundary or behind. Such patterns get a
+# slice of the text.
+
+import re
+import unittest
+from typing import Iterable, Iterator, Optional, Pattern, Tuple, Union
+
+from .x01_common import Comment
+
+# (code_start, code_end, text_start, text_end, multiline)
+_SpanTuple = Tuple[int, int, int, int, bool]
+
+_LOOKS_OUTSIDE = re.compile(r"\^|\\[AbB]|\(\?<[=!]")
+
+
+class CommentFilter:
+	"""Tells which comments the parsers return.
+
+	`text` is a regex (a str or a compiled pattern) that must be found in
+	the inner text. `multiline` is True for multi-line comments only, False
+	for single-line only. The comment code must start at `start` or later
+	and end at `end` or before. The inner text must be at least `min_length`
+	characters long.
+	"""
+
+	__slots__ = ("text", "multiline", "start", "end", "min_length", "_slice")
+
+	def __init__(self, text: Union[str, Pattern, None] = None, multiline: Optional[bool] = None,
+				 start: int = 0, end: Optional[int] = None, min_length: int = 0):
+		if isinstance(text, str):
+			text = re.compile(text)
+		self.text: Optional[Pattern] = text
+		self.multiline = multiline
+		self.start = start
+		self.end = end
+		self.min_length = min_length
+		self._slice = text is not None and _LOOKS_OUTSIDE.search(text.pattern) is not None
+
+	def __getstate__(self):
+		return self.text, self.multiline, self.start, self.end, self.min_length
+
+	def __setstate__(self, state):
+		self.__init__(*state)
+
+	def __repr__(self):
+		return (f"CommentFilter(text={self.text!r}, multiline={self.multiline!r}, "
+				f"start={self.start!r}, end={self.end!r}, min_length={self.min_length!r})")
+
+	def _accepts_span(self, code_start: int, code_end: int, text_start: int,
+					  text_end: int, multiline: bool) -> bool:
+		if self.multiline is not None and multiline != self.multiline:
+			return False
+		if code_start < self.start or (self.end is not None and code_end > self.end):
+			return False
+		return text_end - text_start >= self.min_length
+
+	def accepts(self, source: str, code_start: int, code_end: int, text_start: int,
+				text_end: int, multiline: bool, offset: int = 0) -> bool:
+		"""Checks the comment at the positions. `offset` is the position of
+		`source[0]` (non-zero when the source is a part of the code)."""
+		if not self._accepts_span(code_start, code_end, text_start, text_end, multiline):
+			return False
+		if self.text is not None:
+			if self._slice:
+				return self.text.search(source[text_start - offset:text_end - offset]) is not None
+			return self.text.search(source, text_start - offset, text_end - offset) is not None
+		return True
+
+	def accepts_bytes(self, data, code_start: int, code_end: int, text_start: int,
+					  text_end: int, multiline: bool) -> bool:
+		"""Checks the comment at the byte positions in the UTF-8 `data`. The
+		positions, `start`, `end` and `min_length` are in bytes. The text is
+		decoded only for the `text` pattern."""
+		if not self._accepts_span(code_start, code_end, text_start, text_end, multiline):
+			return False
+		if self.text is not None:
+			text = bytes(data[text_start:text_end]).decode("utf-8")
+			return self.text.search(text) is not None
+		return True
+
+	def accepts_comment(self, comment: Comment) -> bool:
+		code_start, code_end = comment.code_span
+		text_start, text_end = comment.text_span
+		if self.text is None:
+			return self.accepts("", code_start, code_end, text_start, text_end, comment.multiline)
+		return self.accepts(comment.code, code_start, code_end, text_start, text_end,
+							comment.multiline, code_start)
+
+	def spans(self, source: str, spans: Iterable[_SpanTuple]) -> Iterator[_SpanTuple]:
+		accepts = self.accepts
+		for span in spans:
+			if accepts(source, *span):
+				yield span
+
+
+class TestCommentFilter(unittest.TestCase):
+
+	def test_text(self):
+		source = "x // TODO: y\n/* fixme */ z"
+		spans = [(2, 12, 4, 12, False), (13, 24, 15, 22, True)]
+		self.assertEqual(list(CommentFilter("TODO|FIXME").spans(source, spans)), spans[:1])
+		self.assertEqual(list(CommentFilter(re.compile("todo|fixme", re.I)).spans(source, spans)),
+						 spans)
+		# the pattern does not see the code around the text
+		self.assertEqual(list(CommentFilter(r"//|\*/").spans(source, spans)), [])
+		self.assertEqual(list(CommentFilter(r"y$").spans(source, spans)), spans[:1])
+		self.assertEqual(list(CommentFilter(r"^ fix").spans(source, spans)), spans[1:])
+		self.assertEqual(list(CommentFilter(r"(?<!\*) fix").spans(source, spans)), spans[1:])
+
+	def test_flags(self):
+		spans = [(0, 10, 2, 10, False), (20, 40, 22, 38, True)]
+		self.assertEqual(list(CommentFilter(multiline=True).spans("", spans)), spans[1:])
+		self.assertEqual(list(CommentFilter(multiline=False).spans("", spans)), spans[:1])
+		self.assertEqual(list(CommentFilter(start=5).spans("", spans)), spans[1:])
+		self.assertEqual(list(CommentFilter(end=39).spans("", spans)), spans[:1])
+		self.assertEqual(list(CommentFilter(min_length=9).spans("", spans)), spans[1:])
+
+	def test_bytes(self):
+		data = "/* ё */ // ab".encode()
+		self.assertTrue(CommentFilter("^ ё $").accepts_bytes(data, 0, 8, 2, 6, True))
+		self.assertFalse(CommentFilter("ab").accepts_bytes(data, 0, 8, 2, 6, True))
+		self.assertTrue(CommentFilter("ab", start=9).accepts_bytes(data, 9, 14, 11, 14, False))
+		# the length is in bytes
+		self.assertTrue(CommentFilter(min_length=4).accepts_bytes(data, 0, 8, 2, 6, True))
@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The cache is a single SQLite file, so it can be kept between CI runs as one
+# artifact. The key is a hash of the file (its content or its path, mtime and
+# size), the parser and the code of commie itself: any change of the package
+# makes the old entries unreachable, and they are evicted in time as the
+# least recently used.
+#
+# Worker processes look the files up themselves through a CacheReader: a
+# worker reads a file once, hashes the bytes and parses the same bytes on a
+# miss. Only the calling process writes: it counts the hits and misses the
+# workers return and caches the comments of the misses.
+
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from commie.x01_common import Comment, Span
+
+# (code, code_start, code_end, text_start, text_end, multiline, line, column, blanks)
+CompactComment = Tuple[str, int, int, int, int, bool, int, int, str]
+
+
+def compact_comment(comment: Comment) -> CompactComment:
+	return (comment.code, comment.code_span.start, comment.code_span.end,
+			comment.text_span.start, comment.text_span.end, comment.multiline,
+			comment.line, comment.column, comment.blanks)
+
+
+def expand_comment(compact: CompactComment) -> Comment:
+	code, cs, ce, ts, te, multiline, line, column, blanks = compact
+	return Comment._detached(code, Span(cs, ce), Span(ts, te), multiline, line, column, blanks)
+
+
+_fingerprint: Optional[bytes] = None
+
+
+def _package_fingerprint() -> bytes:
+	"""Hash of the code of the package, computed once per process."""
+	global _fingerprint
+	if _fingerprint is None:
+		digest = hashlib.blake2b(digest_size=16)
+		root = Path(__file__).parent
+		for file in sorted(root.rglob("*.py")):
+			if "tests" not in file.relative_to(root).parts:
+				digest.update(file.relative_to(root).as_posix().encode())
+				digest.update(file.read_bytes())
+		_fingerprint = digest.digest()
+	return _fingerprint
+
+
+class CachedComments(NamedTuple):
+	"""All the comments of a file, looked up in the cache or parsed on a
+	miss (see `cached_file_comments`). `key` is None if the file could not
+	be read, or changed while it was parsed: then nothing is cached. If the
+	file could not be parsed, `error` is the exception."""
+	key: Optional[bytes]
+	hit: bool
+	comments: List[CompactComment]
+	error: Optional[Exception] = None
+
+
+def _key(by_content: bool, file: Path, parser: str, data: Optional[bytes]) -> bytes:
+	digest = hashlib.blake2b(_package_fingerprint(), digest_size=20)
+	digest.update(parser.encode())
+	digest.update(b"\0")
+	if by_content:
+		digest.update(file.read_bytes() if data is None else data)
+	else:
+		stat = file.stat()
+		digest.update(f"{os.path.abspath(file)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+					  .encode(errors="surrogateescape"))
+	return digest.digest()
+
+
+def _decode_value(value: bytes) -> List[CompactComment]:
+	return json.loads(zlib.decompress(value))
+
+
+class CacheReader:
+	"""Looks up the cache file of a `CommentCache` in another process. It
+	only reads: the counters and the order of use are updated when the
+	results get back to the `CommentCache` (see `CommentCache.record`).
+	The reader is pickled without its connection."""
+
+	__slots__ = ("path", "by_content", "_db")
+
+	def __init__(self, path: str, by_content: bool):
+		self.path = path
+		self.by_content = by_content
+		self._db: Optional[sqlite3.Connection] = None
+
+	def __getstate__(self):
+		return self.path, self.by_content
+
+	def __setstate__(self, state):
+		self.__init__(*state)
+
+	def key(self, file: Path, parser: str, data: bytes = None) -> bytes:
+		return _key(self.by_content, file, parser, data)
+
+	def get_compact(self, key: bytes) -> Optional[List[CompactComment]]:
+		if self._db is None:
+			self._db = sqlite3.connect(self.path, timeout=30)
+		row = self._db.execute("SELECT value FROM comments WHERE key = ?", (key,)).fetchone()
+		return None if row is None else _decode_value(row[0])
+
+
+class CacheStats(NamedTuple):
+	hits: int
+	misses: int
+	evictions: int
+	entries: int
+	size: int
+
+
+class CommentCache:
+	"""Persistent cache of the comments found in files, stored in an SQLite
+	file at `path`.
+
+	With `by_content=True` the files are recognized by a hash of the
+	content, otherwise by path, modification time and size (that does not
+	read the files, but a touched file is parsed again).
+
+	When the total size of the entries exceeds `max_size` bytes, the least
+	recently used ones are removed. Changes are saved by `close` (the cache
+	is also a context manager) and from time to time while in use.
+	"""
+
+	_COMMIT_EVERY = 256
+
+	def __init__(self, path: Union[str, Path], max_size: int = 256 * 1024 * 1024,
+				 by_content: bool = True):
+		self.path = str(path)
+		self.max_size = max_size
+		self.by_content = by_content
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._db = sqlite3.connect(str(path), timeout=30)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("PRAGMA synchronous=NORMAL")
+		self._db.execute("CREATE TABLE IF NOT EXISTS comments ("
+						 "key BLOB PRIMARY KEY, value BLOB NOT NULL, "
+						 "size INTEGER NOT NULL, used INTEGER NOT NULL)")
+		self._db.execute("CREATE INDEX IF NOT EXISTS comments_used ON comments (used)")
+		size, used = self._db.execute(
+			"SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) FROM comments").fetchone()
+		self._size: int = size
+		self._clock: int = used
+		self._uncommitted = 0
+
+	def __enter__(self) -> 'CommentCache':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self):
+		self._db.commit()
+		self._db.close()
+
+	def stats(self) -> CacheStats:
+		entries, = self._db.execute("SELECT COUNT(*) FROM comments").fetchone()
+		return CacheStats(self.hits, self.misses, self.evictions, entries, self._size)
+
+	def reader(self) -> CacheReader:
+		"""A reader of the same cache file for worker processes. The changes
+		that are not saved yet are not visible to it."""
+		self._db.commit()
+		return CacheReader(self.path, self.by_content)
+
+	def key(self, file: Path, parser: str, data: bytes = None) -> bytes:
+		"""Returns the key of the comments that the `parser` finds in the
+		file. The parser is any string that tells how the file was parsed.
+		`data` is the content of the file, if it was read already."""
+		return _key(self.by_content, file, parser, data)
+
+	def _tick(self) -> int:
+		self._clock += 1
+		self._uncommitted += 1
+		if self._uncommitted >= self._COMMIT_EVERY:
+			self._db.commit()
+			self._uncommitted = 0
+		return self._clock
+
+	def get_compact(self, key: bytes) -> Optional[List[CompactComment]]:
+		"""Returns the cached comments in the compact form, or None. Unlike
+		`get`, it does not count the hit or the miss."""
+		row = self._db.execute("SELECT value FROM comments WHERE key = ?", (key,)).fetchone()
+		return None if row is None else _decode_value(row[0])
+
+	def get(self, key: bytes) -> Optional[List[Comment]]:
+		"""Returns the cached comments (detached), or None."""
+		compact = self.get_compact(key)
+		if compact is None:
+			self.misses += 1
+			return None
+		self._touch(key)
+		return [expand_comment(c) for c in compact]
+
+	def _touch(self, key: bytes):
+		self.hits += 1
+		self._db.execute("UPDATE comments SET used = ? WHERE key = ?", (self._tick(), key))
+
+	def record(self, result: CachedComments):
+		"""Counts the hit or the miss of `cached_file_comments` (which may
+		have run in another process) and caches the comments of a miss."""
+		if result.key is None:
+			return
+		if result.hit:
+			self._touch(result.key)
+			return
+		self.misses += 1
+		if result.error is None:
+			self.put_compact(result.key, result.comments)
+
+	def put(self, key: bytes, comments: Iterable[Comment]):
+		self.put_compact(key, [compact_comment(c) for c in comments])
+
+	def put_compact(self, key: bytes, comments: List[CompactComment]):
+		value = zlib.compress(json.dumps(comments, ensure_ascii=False).encode(), 1)
+		old = self._db.execute("SELECT size FROM comments WHERE key = ?", (key,)).fetchone()
+		if old is not None:
+			self._size -= old[0]
+		self._db.execute("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?)",
+						 (key, value, len(value), self._tick()))
+		self._size += len(value)
+		self._evict()
+
+	def _evict(self):
+		while self._size > self.max_size:
+			rows = self._db.execute(
+				"SELECT key, size FROM comments ORDER BY used LIMIT 64").fetchall()
+			if not rows:
+				break
+			for key, size in rows:
+				self._db.execute("DELETE FROM comments WHERE key = ?", (key,))
+				self._size -= size
+				self.evictions += 1
+				if self._size <= self.max_size:
+					break
@@ -1,55 +1,134 @@
 # SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
 # SPDX-License-Identifier: BSD-3-Clause
 
+import io
+import locale
+import time
 import unittest
 from pathlib import Path
-from typing import Iterable, Union
+from typing import Callable, Dict, Iterable, Optional, Union
 
 from commie.parsers import *
 from commie.x01_common import Comment
+from commie.x01_filter import CommentFilter
 from commie.x01_errors import *
+from commie.parsers._engines import span_engine
+from commie.x02_cache import CachedComments, CacheReader, CommentCache, compact_comment, \
+	expand_comment
+from commie.x02_mapped import iter_comments_buffer, iter_comments_mapped
+from commie.x02_sniffer import SNIFF_SIZE, sniff_format
+from commie.x02_stats import ParseEvent, notify, observed, parser_name, utf8_size, _observers
 
 
-def pickfunc(filename: str):
-	filename = filename.lower()
-	ext = filename.rpartition(".")[-1]
+# language name -> parser function
+_LANGUAGES: Dict[str, Callable] = {}
+# lowercase extension without the leading dot ("d.ts" for ".d.ts") -> language
+# name, or the parser function it was registered with
+_EXTENSIONS: Dict[str, Union[str, Callable]] = {}
+# lowercase file name -> language name
+_FILENAMES: Dict[str, str] = {}
 
-	if ext in ["c", "cpp", "java",
-			   "h", "hpp",
-			   # Objective-C source code 'implementation' program files usually
-			   # have .m filename extensions, while Objective-C 'header/interface' files
-			   # have .h extensions
-			   "m"]:
-		return iter_comments_c
 
-	if ext in ["go"]:
-		return iter_comments_go
+def _parser(language: Union[str, Callable, None]) -> Optional[Callable]:
+	"""The parser currently registered for a language name."""
+	return _LANGUAGES.get(language) if isinstance(language, str) else language
 
-	if ext in ["js", "ts", "dart"]:
-		return iter_comments_c
 
-	if ext in ["html", "htm", "xml"]:
-		return iter_comments_html
+def register_language(name: str, func: Callable, extensions: Iterable[str] = (),
+					  filenames: Iterable[str] = ()):
+	"""Makes `func` the parser of the language `name`, and of the files with
+	the `extensions` (".d.ts" or "d.ts") or exactly the `filenames`
+	("Makefile"). The names and the extensions are not case-sensitive.
+	A language or an extension registered before is replaced: registering
+	"c" again changes the parser of all the files that were parsed as "c"."""
+	_LANGUAGES[name] = func
+	for extension in extensions:
+		register_extension(extension, name)
+	for filename in filenames:
+		_FILENAMES[filename.lower()] = name
 
-	if ext in ["rb"]:
-		return iter_comments_ruby
 
-	if ext in ["py"]:
-		return iter_comments_python
+def register_extension(extension: str, language: Union[str, Callable]):
+	"""Makes files with the `extension` parsed as the `language`: its
+	registered name or a parser function."""
+	if isinstance(language, str) and language not in _LANGUAGES:
+		raise KeyError(language)
+	_EXTENSIONS[extension.lower().lstrip(".")] = language
 
-	if ext in ["scss"]:
-		return iter_comments_sass
 
-	if ext in ["css"]:
-		return iter_comments_css
+register_language("c", iter_comments_c, [
+	"c", "cpp", "java", "h", "hpp",
+	# Objective-C source code 'implementation' program files usually
+	# have .m filename extensions, while Objective-C 'header/interface' files
+	# have .h extensions
+	"m",
+	"js", "ts", "d.ts", "dart"])
+register_language("go", iter_comments_go, ["go"])
+register_language("html", iter_comments_html, ["html", "htm", "xml"])
+register_language("ruby", iter_comments_ruby, ["rb"])
+register_language("python", iter_comments_python, ["py"])
+register_language("sass", iter_comments_sass, ["scss"])
+register_language("css", iter_comments_css, ["css"])
+register_language("shell", iter_comments_shell, ["sh"], ["Makefile", "GNUmakefile"])
 
-	if ext in ["sh"]:
-		return iter_comments_shell
 
-	raise FormatUndetectedError
+def pickfunc(filename: str) -> Callable:
+	"""Returns the parser of the file. Exact file names are matched first,
+	then the longest registered extension: "a.d.ts" is ".d.ts", not ".ts".
+	The `filename` may be a path."""
+	name = filename.replace("\\", "/").rpartition("/")[-1].lower()
+	func = _parser(_FILENAMES.get(name))
+	if func is not None:
+		return func
+	# "a.d.ts" is looked up as "a.d.ts" (a bare extension like "py" is
+	# also accepted), "d.ts" and "ts"
+	dot = -1
+	while True:
+		func = _parser(_EXTENSIONS.get(name[dot + 1:]))
+		if func is not None:
+			return func
+		dot = name.find(".", dot + 1)
+		if dot < 0:
+			raise FormatUndetectedError
+
+
+def known_format(filename: str) -> bool:
+	"""Tells whether the format of the file is known by its name, so the
+	file is worth reading."""
+	try:
+		pickfunc(filename)
+	except FormatUndetectedError:
+		return False
+	return True
+
+
+def detect(file: Path, sniff: bool = False) -> Callable:
+	"""Returns the parser of the file by its name or, if the name tells
+	nothing and `sniff` is True, by the first bytes of the file."""
+	try:
+		return pickfunc(file.name)
+	except FormatUndetectedError:
+		if not sniff:
+			raise
+	with file.open("rb") as f:
+		head = f.read(SNIFF_SIZE)
+	name = sniff_format(head)
+	func = _LANGUAGES.get(name) or _parser(_EXTENSIONS.get(name)) if name is not None else None
+	if func is None:
+		raise FormatUndetectedError
+	return func
 
 
 class TestPickFunc(unittest.TestCase):
+	def setUp(self):
+		self.registries = [(registry, dict(registry))
+						   for registry in (_LANGUAGES, _EXTENSIONS, _FILENAMES)]
+
+	def tearDown(self):
+		for registry, saved in self.registries:
+			registry.clear()
+			registry.update(saved)
+
 	def test_html(self):
 		self.assertEqual(pickfunc(filename="file.html"), iter_comments_html)
 		self.assertEqual(pickfunc(filename="1991.HTM"), iter_comments_html)
@@ -61,23 +140,173 @@ class TestPickFunc(unittest.TestCase):
 	def test_undetected(self):
 		with self.assertRaises(FormatUndetectedError):
 			pickfunc(filename="ladeda.haha")
+		with self.assertRaises(FormatUndetectedError):
+			pickfunc(filename="README")
+
+	def test_multiple_dots(self):
+		self.assertEqual(pickfunc(filename="types.d.ts"), iter_comments_c)
+		self.assertEqual(pickfunc(filename="jquery.min.js"), iter_comments_c)
+		self.assertEqual(pickfunc(filename="/home/a.b/setup.py"), iter_comments_python)
+
+	def test_exact_name(self):
+		self.assertEqual(pickfunc(filename="Makefile"), iter_comments_shell)
+		self.assertEqual(pickfunc(filename="/src/makefile"), iter_comments_shell)
+
+	def test_register(self):
+		register_extension(".PyI", "python")
+		self.assertEqual(pickfunc(filename="stub.pyi"), iter_comments_python)
+		register_language("test-language", iter_comments_shell, [".test.cfg"], ["Testfile"])
+		self.assertEqual(pickfunc(filename="a.test.cfg"), iter_comments_shell)
+		self.assertEqual(pickfunc(filename="Testfile"), iter_comments_shell)
+		with self.assertRaises(FormatUndetectedError):
+			pickfunc(filename="a.cfg")
+
+	def test_register_again(self):
+		mine = lambda code: iter_comments_c(code)
+		register_language("c", mine)
+		register_language("shell", mine)
+		self.assertIs(pickfunc(filename="a.c"), mine)
+		self.assertIs(pickfunc(filename="a.d.ts"), mine)
+		self.assertIs(pickfunc(filename="Makefile"), mine)
+		register_language("c", iter_comments_c)
+		register_language("shell", iter_comments_shell)
+		self.assertIs(pickfunc(filename="a.c"), iter_comments_c)
+		self.assertIs(pickfunc(filename="Makefile"), iter_comments_shell)
+
+
+# the parsers that take a filter
+_FILTERING = {iter_comments_c, iter_comments_go, iter_comments_sass, iter_comments_css,
+			  iter_comments_html, iter_comments_ruby, iter_comments_python,
+			  iter_comments_shell}
+
+
+def parse_filtered(func: Callable, code: str, filter: Optional[CommentFilter]) \
+		-> Iterable[Comment]:
+	"""Calls the parser with the filter. Parsers registered by the user may
+	take only the code: their comments are filtered afterwards."""
+	if filter is None:
+		return func(code)
+	if func in _FILTERING:
+		return func(code, filter)
+	return (c for c in func(code) if filter.accepts_comment(c))
 
 
-def iter_comments_str(code: str, filename: str) -> Iterable[Comment]:
+def iter_comments_str(code: str, filename: str,
+					  filter: CommentFilter = None) -> Iterable[Comment]:
 	func = pickfunc(filename)
-	return func(code)
+	if _observers:
+		return observed(lambda: parse_filtered(func, code, filter), func, filename,
+						lambda: utf8_size(code))
+	return parse_filtered(func, code, filter)
+
+
+def parser_id(func: Callable, mapped: bool = False) -> str:
+	"""Tells how a file is parsed, for the cache keys."""
+	if mapped and span_engine(func) is not None:
+		return f"{func.__module__}.{func.__qualname__}:mapped"
+	# read_text decodes with the locale encoding
+	return f"{func.__module__}.{func.__qualname__}:{locale.getpreferredencoding(False)}"
+
+
+def iter_comments_file(file: Path, mapped: bool = False, cache: CommentCache = None,
+					   sniff: bool = False, filter: CommentFilter = None) -> Iterable[Comment]:
+	"""Finds comments in the file. The format is detected by the file name.
+	If the name tells nothing and `sniff` is True, the first bytes of the
+	file are read to find a shebang, an Emacs or Vim modeline, or an XML or
+	HTML declaration.
+
+	With `mapped=True` the file is memory-mapped and scanned as UTF-8 bytes
+	without reading it into memory (if the parser of the format supports
+	that, otherwise the file is read as usual). The comments are detached,
+	and the line endings are not translated.
+
+	With a `cache` the comments are looked up in it first, or cached after
+	the parsing. Then they are detached and returned as a list.
+
+	With a `filter` only the comments it accepts are created. The cache
+	keeps all the comments, they are filtered after the lookup.
+	"""
+	func = detect(file, sniff)
+	if cache is not None:
+		result = cached_file_comments(file, func, mapped, cache)
+		cache.record(result)
+		if result.error is not None:
+			raise result.error
+		comments = [expand_comment(c) for c in result.comments]
+		if filter is not None:
+			comments = [c for c in comments if filter.accepts_comment(c)]
+		return comments
+
+	def parse() -> Iterable[Comment]:
+		return _parse_file(file, func, mapped, filter)
+
+	if _observers:
+		return observed(parse, func, str(file), lambda: file.stat().st_size)
+	return parse()
+
+
+def _parse_file(file: Path, func: Callable, mapped: bool, filter: Optional[CommentFilter],
+				data: bytes = None) -> Iterable[Comment]:
+	"""Parses the file, or its content `data` if it was read already."""
+	if mapped and span_engine(func) is not None:
+		if data is None:
+			return iter_comments_mapped(file, func, filter)
+		return iter_comments_buffer(data, func, filter)
+	if data is None:
+		code = file.read_text()
+	else:
+		# decoded as read_text would do it
+		code = io.TextIOWrapper(io.BytesIO(data)).read()
+	return parse_filtered(func, code, filter)
+
+
+def cached_file_comments(file: Path, func: Callable, mapped: bool,
+						 cache: Union[CommentCache, CacheReader]) -> CachedComments:
+	"""Looks up all the comments that `func` finds in the file, or parses
+	the file on a miss. With a cache by content the file is read once: the
+	same bytes are hashed and parsed. Nothing is written to the cache, the
+	result is for `CommentCache.record`.
+
+	The observers get the event of the lookup with `ParseEvent.cache` set
+	to "hit" or "miss"."""
+	started = time.perf_counter()
+	try:
+		data = file.read_bytes() if cache.by_content else None
+		key = cache.key(file, parser_id(func, mapped), data)
+	except OSError as e:
+		return CachedComments(None, False, [], e)
+
+	def size() -> int:
+		return file.stat().st_size if data is None else len(data)
+
+	compact = cache.get_compact(key)
+	if compact is not None:
+		if _observers:
+			notify(ParseEvent(parser_name(func), str(file), size(), len(compact),
+							  time.perf_counter() - started, cache="hit"))
+		return CachedComments(key, True, compact)
 
+	def parse() -> Iterable[Comment]:
+		return _parse_file(file, func, mapped, None, data)
 
-def iter_comments_file(file: Path) -> Iterable[Comment]:
-	return iter_comments_str(file.read_text(), file.name)
+	try:
+		comments = observed(parse, func, str(file), size, "miss") if _observers else parse()
+		compact = [compact_comment(c) for c in comments]
+		if data is None and cache.key(file, parser_id(func, mapped)) != key:
+			# changed after the stat: the comments do not belong to the key
+			return CachedComments(None, False, compact)
+		return CachedComments(key, False, compact)
+	except Exception as e:
+		return CachedComments(key, False, [], e)
 
 
-def iter_comments(codeOrFile: Union[Path, str], filename: str = None) -> Iterable[Comment]:
+def iter_comments(codeOrFile: Union[Path, str], filename: str = None,
+				  filter: CommentFilter = None) -> Iterable[Comment]:
 	if isinstance(codeOrFile, str):
 		if filename is None:
 			raise ValueError("Please specify filename")
-		return iter_comments_str(codeOrFile, filename)
-	return iter_comments_file(codeOrFile)
+		return iter_comments_str(codeOrFile, filename, filter)
+	return iter_comments_file(codeOrFile, filter=filter)
 
 
 class TestIterComments(unittest.TestCase):
@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Reading a huge file with read_text keeps both the bytes and the decoded str
+# in memory before the first comment is found. Here the file is memory-mapped
+# instead, and the span engines of the parsers run over the mapped pages.
+# Only the comments are decoded into str objects. The bytes between them are
+# decoded in bounded pieces just to count characters and lines, so the spans
+# are the same as in the decoded text.
+
+import codecs
+import mmap
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from commie.parsers._engines import span_engine
+from commie.parsers._helper import SpanTuple
+from commie.x01_common import Comment, Span, blanks_before
+from commie.x01_filter import CommentFilter
+
+# how many bytes between comments are decoded at once
+_PIECE_SIZE = 1 << 20
+
+
+class _Cursor:
+	"""Moves forward through UTF-8 bytes and keeps the matching position,
+	line and column in the decoded text, and the whitespace right before
+	the position (see `blanks_before`)."""
+
+	__slots__ = ("data", "byte_pos", "char_pos", "line", "line_start", "blanks")
+
+	def __init__(self, data):
+		self.data = data
+		self.byte_pos = 0
+		self.char_pos = 0
+		self.line = 1
+		self.line_start = 0  # char position where the current line starts
+		self.blanks = ""
+
+	@property
+	def column(self) -> int:
+		return self.char_pos - self.line_start
+
+	def _count(self, text: str):
+		newlines = text.count("\n")
+		if newlines:
+			self.line += newlines
+			self.line_start = self.char_pos + text.rindex("\n") + 1
+		self.char_pos += len(text)
+		self.blanks = blanks_before(text, len(text), self.blanks)
+
+	def take(self, byte_pos: int) -> str:
+		"""Moves to the `byte_pos` and returns the decoded text in between.
+		Raises UnicodeDecodeError on invalid UTF-8."""
+		text = self.data[self.byte_pos:byte_pos].decode("utf-8")
+		self._count(text)
+		self.byte_pos = byte_pos
+		return text
+
+	def skip_to(self, byte_pos: int):
+		"""Same as `take`, but long runs of bytes are decoded piece by piece,
+		so the memory does not grow with the distance."""
+		if byte_pos - self.byte_pos <= _PIECE_SIZE:
+			self.take(byte_pos)
+			return
+		decoder = codecs.getincrementaldecoder("utf-8")()
+		while self.byte_pos < byte_pos:
+			end = min(self.byte_pos + _PIECE_SIZE, byte_pos)
+			self._count(decoder.decode(self.data[self.byte_pos:end], end == byte_pos))
+			self.byte_pos = end
+
+
+def _spans_to_detached(data, spans: Iterable[SpanTuple],
+					   filter: CommentFilter = None) -> Iterator[Comment]:
+	cursor = _Cursor(data)
+	detached = Comment._detached
+	for code_start, code_end, text_start, text_end, multiline in spans:
+		cursor.skip_to(code_start)
+		start, line, column, blanks = cursor.char_pos, cursor.line, cursor.column, cursor.blanks
+		code = cursor.take(code_end)
+		end = cursor.char_pos
+		# the markers around the text are ASCII: one byte is one character
+		text_start, text_end = start + text_start - code_start, end - (code_end - text_end)
+		if filter is not None and not filter.accepts(code, start, end, text_start, text_end,
+													 multiline, start):
+			continue
+		yield detached(code, Span(start, end), Span(text_start, text_end),
+					   multiline, line, column, blanks)
+	# the rest is decoded only to fail on invalid UTF-8 as read_text would
+	cursor.skip_to(len(data))
+
+
+def iter_comments_buffer(data: bytes, func: Callable,
+						 filter: CommentFilter = None) -> Iterator[Comment]:
+	"""Same as `iter_comments_mapped` for the content of a file that is
+	already read."""
+	engine = span_engine(func)
+	assert engine is not None
+	return _spans_to_detached(data, engine(data), filter)
+
+
+def iter_comments_mapped(file: Path, func: Callable,
+						 filter: CommentFilter = None) -> Iterable[Comment]:
+	"""Finds comments in the UTF-8 `file` without reading it into memory.
+	`func` is the parser function for the file format, it must have a span
+	engine (see `span_engine`).
+
+	Yields detached comments with the same spans as if the file was decoded
+	to str. Line endings are not translated: the spans and texts are as in
+	`file.read_bytes().decode()`.
+	"""
+	engine = span_engine(func)
+	assert engine is not None
+	with open(file, "rb") as f:
+		# an empty file cannot be mapped, it has no comments anyway
+		if f.seek(0, 2) == 0:
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			spans = engine(data)
+			try:
+				yield from _spans_to_detached(data, spans, filter)
+			finally:
+				# matches refer to the map: it cannot be closed while they live
+				spans.close()
@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The sniffer only tells the name of a language or an extension, and the
+# detector looks it up in its registry. So the sniffed files get the same
+# parsers as the files with the extensions, including the ones registered
+# by the user.
+
+import re
+import unittest
+from typing import Optional
+
+SNIFF_SIZE = 512
+
+_SHEBANG = re.compile(r"#!\s*(\S+)(.*)")
+_EMACS = re.compile(r"-\*-\s*(.*?)\s*-\*-")
+_EMACS_MODE = re.compile(r"(?:^|;)\s*mode\s*:\s*([\w+.-]+)", re.IGNORECASE)
+_VIM = re.compile(r"(?:^|\s)(?:vi|vim|ex):.*?\b(?:ft|filetype|syn|syntax)=([\w+.-]+)")
+_VERSION = re.compile(r"[\d.]+$")
+
+# interpreters, modes and file types that are neither a registered language
+# nor an extension -> one of them
+_ALIASES = {
+	"python": "python", "pypy": "python",
+	"sh": "shell", "bash": "shell", "zsh": "shell", "ksh": "shell", "dash": "shell",
+	"ash": "shell", "fish": "shell", "shell-script": "shell", "make": "shell",
+	"makefile": "shell",
+	"ruby": "ruby", "jruby": "ruby",
+	"node": "js", "nodejs": "js", "deno": "js", "javascript": "js", "js2": "js",
+	"typescript": "ts", "c++": "cpp", "objc": "m", "nxml": "xml",
+}
+
+_MARKUP = ("<?xml", "<!doctype", "<html", "<!--")
+
+
+def _name(word: str) -> str:
+	word = word.lower()
+	if word.endswith("-mode"):
+		word = word[:-len("-mode")]
+	return _ALIASES.get(word, word)
+
+
+def _interpreter(line: str) -> Optional[str]:
+	match = _SHEBANG.match(line)
+	if match is None:
+		return None
+	words = [match.group(1)] + match.group(2).split()
+	program = words[0].rpartition("/")[-1]
+	if program == "env":
+		# "#!/usr/bin/env -S VAR=1 python3 -u"
+		words = [w for w in words[1:] if not w.startswith("-") and "=" not in w]
+		if not words:
+			return None
+		program = words[0].rpartition("/")[-1]
+	return _name(_VERSION.sub("", program) or program)
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+	"""Guesses the format by the beginning of a file: a shebang, an Emacs
+	or Vim modeline, or an XML or HTML declaration. Returns the name of a
+	language or an extension, or None."""
+	if head.startswith(b"\xef\xbb\xbf"):
+		head = head[3:]
+	text = head.decode("utf-8", "replace")
+	lines = text.splitlines()[:5]
+	if not lines:
+		return None
+
+	for line in lines[:2]:
+		# the Emacs modeline may follow a shebang
+		match = _EMACS.search(line)
+		if match is not None:
+			variables = match.group(1)
+			if ":" in variables:
+				mode = _EMACS_MODE.search(variables)
+				if mode is not None:
+					return _name(mode.group(1))
+			elif variables:
+				return _name(variables)
+	for line in lines:
+		match = _VIM.search(line)
+		if match is not None:
+			return _name(match.group(1))
+
+	interpreter = _interpreter(lines[0])
+	if interpreter is not None:
+		return interpreter
+
+	if text.lstrip().lower().startswith(_MARKUP):
+		return "html"
+	return None
+
+
+class TestSniff(unittest.TestCase):
+
+	def test_shebang(self):
+		self.assertEqual(sniff_format(b"#!/bin/sh\necho"), "shell")
+		self.assertEqual(sniff_format(b"#! /usr/local/bin/bash -e\n"), "shell")
+		self.assertEqual(sniff_format(b"#!/usr/bin/env python3.9\n"), "python")
+		self.assertEqual(sniff_format(b"#!/usr/bin/env -S PYTHONPATH=. python -u\n"), "python")
+		self.assertEqual(sniff_format(b"#!/usr/bin/env node\n"), "js")
+		self.assertEqual(sniff_format(b"#!/usr/bin/ruby2.7"), "ruby")
+		self.assertEqual(sniff_format(b"#!/usr/bin/env\n"), None)
+
+	def test_modelines(self):
+		self.assertEqual(sniff_format(b"#!/bin/whatever\n# -*- mode: ruby; coding: utf-8 -*-\n"),
+						 "ruby")
+		self.assertEqual(sniff_format(b"/* -*- C++ -*- */\n"), "cpp")
+		self.assertEqual(sniff_format(b"# -*- coding: utf-8 -*-\n"), None)
+		self.assertEqual(sniff_format(b"x\ny\n# vim: set ts=4 ft=python :\n"), "python")
+		self.assertEqual(sniff_format(b"// vi: filetype=javascript\n"), "js")
+
+	def test_markup(self):
+		self.assertEqual(sniff_format(b'\xef\xbb\xbf<?xml version="1.0"?>'), "html")
+		self.assertEqual(sniff_format(b"\n  <!DOCTYPE html>\n<html>"), "html")
+
+	def test_unknown(self):
+		self.assertEqual(sniff_format(b""), None)
+		self.assertEqual(sniff_format(b"just some text\n"), None)
+		self.assertEqual(sniff_format(b"\xff\xfe\x00binary"), None)
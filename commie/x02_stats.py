@@ -0,0 +1,231 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The observers are global, like logging handlers: a slow scan can be
+# inspected without passing anything through the code that started it. When
+# there are no observers, the dispatch checks one list and returns the
+# parser's own generator, so the parsing costs the same as without them.
+
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, \
+	TypeVar
+
+from commie import parsers
+
+
+class ParseEvent(NamedTuple):
+	"""One source parsed by `iter_comments_str`, `iter_comments_file` or
+	`iter_comments_bytes`.
+
+	`file` is the filename or the path. `bytes` is the size of the source
+	in UTF-8. `seconds` is the wall time spent in the parser (and reading
+	the file), but not in the code that iterates over the comments. `error`
+	is the exception that stopped the parsing.
+
+	`cache` is "hit" or "miss" for a file looked up in a `CommentCache`.
+	A hit is not parsed: `seconds` is the time of the lookup."""
+	parser: str
+	file: str
+	bytes: int
+	comments: int
+	seconds: float
+	error: Optional[BaseException] = None
+	cache: Optional[str] = None
+
+
+Observer = Callable[[ParseEvent], None]
+
+_observers: List[Observer] = []
+
+_PARSER_NAMES = {func: name[len("iter_comments_"):]
+				 for name, func in vars(parsers).items() if name.startswith("iter_comments_")}
+
+
+def parser_name(func: Callable) -> str:
+	"""Short name of the parser: "c" for `iter_comments_c`."""
+	name = _PARSER_NAMES.get(func)
+	if name is None:
+		name = f"{func.__module__}.{func.__qualname__}"
+	return name
+
+
+def add_observer(observer: Observer):
+	"""Makes the `observer` called with a `ParseEvent` after each source
+	is parsed (after the iteration over its comments ends). The observers
+	are called in the thread that iterates over the comments."""
+	_observers.append(observer)
+
+
+def remove_observer(observer: Observer):
+	_observers.remove(observer)
+
+
+def observing() -> bool:
+	return bool(_observers)
+
+
+def notify(event: ParseEvent):
+	for observer in list(_observers):
+		observer(event)
+
+
+@contextmanager
+def collected_events() -> Iterator[List[ParseEvent]]:
+	"""Within the block, the events are only appended to the list. Worker
+	processes use it to send the events to the observers of the parent (a
+	forked worker has copies of them, that must not be called)."""
+	events: List[ParseEvent] = []
+	saved = list(_observers)
+	_observers[:] = [events.append]
+	try:
+		yield events
+	finally:
+		_observers[:] = saved
+
+
+# Comment, or ByteComment for bytes
+C = TypeVar("C")
+
+
+def _iter_observed(comments: Iterable[C], parser: str, file: str, size: int,
+				   seconds: float, cache: Optional[str]) -> Iterator[C]:
+	count = 0
+	error: Optional[BaseException] = None
+	started = time.perf_counter()
+	try:
+		for comment in comments:
+			seconds += time.perf_counter() - started
+			count += 1
+			yield comment
+			started = time.perf_counter()
+		seconds += time.perf_counter() - started
+	except Exception as e:
+		seconds += time.perf_counter() - started
+		error = e
+		raise
+	finally:
+		# also when the caller stops iterating early
+		notify(ParseEvent(parser, file, size, count, seconds, error, cache))
+
+
+def observed(parse: Callable[[], Iterable[C]], func: Callable, file: str,
+			 size: Callable[[], int], cache: str = None) -> Iterable[C]:
+	"""Calls `parse` and reports the parsing to the observers. `size`
+	returns the size of the source in bytes. `cache` is "miss" if the
+	file was not found in a cache."""
+	parser = parser_name(func)
+	started = time.perf_counter()
+	try:
+		comments = parse()
+	except Exception as e:
+		notify(ParseEvent(parser, file, 0, 0, time.perf_counter() - started, e, cache))
+		raise
+	return _iter_observed(comments, parser, file, size(), time.perf_counter() - started, cache)
+
+
+def utf8_size(code: str) -> int:
+	return len(code) if code.isascii() else len(code.encode("utf-8", "surrogatepass"))
+
+
+class ParserCounters(NamedTuple):
+	files: int = 0
+	bytes: int = 0
+	comments: int = 0
+	seconds: float = 0.0
+	errors: Tuple[Tuple[str, int], ...] = ()  # (exception class name, count)
+	cache_hits: int = 0
+	cache_misses: int = 0
+
+
+class ParseStats:
+	"""An observer that sums the events per parser and remembers the
+	`slowest` files. Cache hits are only counted: the files were not
+	parsed. It is thread-safe.
+
+		stats = ParseStats()
+		add_observer(stats)
+		...
+		print(stats.prometheus())
+	"""
+
+	def __init__(self, slowest: int = 10):
+		self._lock = threading.Lock()
+		self._counters: Dict[str, List] = {}
+		self._errors: Dict[Tuple[str, str], int] = {}
+		self._slowest_count = slowest
+		self._slowest: List[Tuple[float, int, ParseEvent]] = []  # heap
+		self._events = 0
+
+	def __call__(self, event: ParseEvent):
+		with self._lock:
+			counters = self._counters.get(event.parser)
+			if counters is None:
+				counters = self._counters[event.parser] = [0, 0, 0, 0.0, 0, 0]
+			if event.cache == "hit":
+				counters[4] += 1
+				return
+			if event.cache == "miss":
+				counters[5] += 1
+			counters[0] += 1
+			counters[1] += event.bytes
+			counters[2] += event.comments
+			counters[3] += event.seconds
+			if event.error is not None:
+				key = (event.parser, type(event.error).__name__)
+				self._errors[key] = self._errors.get(key, 0) + 1
+			self._events += 1
+			item = (event.seconds, self._events, event)
+			if len(self._slowest) < self._slowest_count:
+				heapq.heappush(self._slowest, item)
+			elif self._slowest and item > self._slowest[0]:
+				heapq.heapreplace(self._slowest, item)
+
+	def parsers(self) -> Dict[str, ParserCounters]:
+		"""Counters per parser name."""
+		with self._lock:
+			result = {}
+			for parser, (files, size, comments, seconds, hits, misses) in self._counters.items():
+				errors = tuple(sorted((error, n) for (p, error), n in self._errors.items()
+									  if p == parser))
+				result[parser] = ParserCounters(files, size, comments, seconds, errors, hits,
+												misses)
+			return result
+
+	def slowest(self) -> List[ParseEvent]:
+		"""The events of the slowest files, the slowest first."""
+		with self._lock:
+			return [event for _, _, event in sorted(self._slowest, reverse=True)]
+
+	def samples(self, prefix: str = "commie") -> Iterator[Tuple[str, Dict[str, str], float]]:
+		"""Yields the counters as (metric name, labels, value), for example
+		to set them to Prometheus client counters."""
+		for parser, counters in sorted(self.parsers().items()):
+			labels = {"parser": parser}
+			yield f"{prefix}_files_total", labels, counters.files
+			yield f"{prefix}_bytes_total", labels, counters.bytes
+			yield f"{prefix}_comments_total", labels, counters.comments
+			yield f"{prefix}_seconds_total", labels, counters.seconds
+			for error, count in counters.errors:
+				yield f"{prefix}_errors_total", {"parser": parser, "error": error}, count
+			if counters.cache_hits or counters.cache_misses:
+				yield f"{prefix}_cache_hits_total", labels, counters.cache_hits
+				yield f"{prefix}_cache_misses_total", labels, counters.cache_misses
+
+	def prometheus(self, prefix: str = "commie") -> str:
+		"""The counters in the Prometheus text exposition format."""
+		by_name: Dict[str, List[str]] = {}
+		for name, labels, value in self.samples(prefix):
+			text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+			by_name.setdefault(name, []).append(f"{name}{{{text}}} {value}")
+		lines = []
+		for name, samples in by_name.items():
+			lines.append(f"# TYPE {name} counter")
+			lines.extend(samples)
+		return "".join(line + "\n" for line in lines)
+
+
+def _escape(label: str) -> str:
+	return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
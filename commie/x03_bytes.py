@@ -0,0 +1,211 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The span engines scan UTF-8 bytes as well as str, and their positions
+# in bytes are what indexers store anyway. So the data is never decoded
+# as a whole: a comment decodes its own code or text when asked. A parser
+# without an engine (Python, registered ones) still gets the decoded str,
+# and its positions are converted to bytes.
+
+import hashlib
+import re
+import unittest
+from bisect import bisect_right
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from commie.parsers._engines import span_engine
+from commie.parsers._helper import SpanTuple
+from commie.x01_common import Span
+from commie.x01_filter import CommentFilter
+from commie.x02_detector import pickfunc
+from commie.x02_stats import _observers, observed
+
+_NEWLINE = re.compile(b"\n")
+
+
+class _ByteLines:
+	"""Line starts of the bytes, found on the first lookup."""
+
+	__slots__ = ("data", "_starts", "_digest")
+
+	def __init__(self, data) -> None:
+		self.data = data
+		self._starts: Optional[List[int]] = None
+		self._digest: Optional[Tuple[int, bytes]] = None
+
+	@property
+	def digest(self) -> Tuple[int, bytes]:
+		"""The length and a BLAKE2 hash of the data, computed once (see
+		`LineIndex.digest`)."""
+		if self._digest is None:
+			self._digest = len(self.data), hashlib.blake2b(self.data).digest()
+		return self._digest
+
+	@property
+	def line_starts(self) -> List[int]:
+		if self._starts is None:
+			self._starts = [0]
+			self._starts.extend(m.end() for m in _NEWLINE.finditer(self.data))
+		return self._starts
+
+	def line_of(self, pos: int) -> int:
+		return bisect_right(self.line_starts, pos)
+
+	def column_of(self, pos: int) -> int:
+		starts = self.line_starts
+		return pos - starts[bisect_right(starts, pos) - 1]
+
+
+class ByteComment:
+	"""A comment found in UTF-8 bytes by `iter_comments_bytes`.
+
+	The spans, and the columns, are byte offsets in `data`. `code_bytes` and
+	`text_bytes` are slices of the data; `code` and `text` are decoded on
+	the first access.
+	"""
+
+	__slots__ = ("data", "code_span", "text_span", "multiline", "_text", "_lines")
+
+	def __init__(self, data, code_span: Span, text_span: Span, multiline: bool,
+				 lines: _ByteLines = None):
+		self.data = data
+		self.code_span = code_span
+		self.text_span = text_span
+		self.multiline = multiline
+		self._text: Optional[str] = None
+		self._lines = lines if lines is not None else _ByteLines(data)
+
+	@property
+	def code_bytes(self) -> bytes:
+		return bytes(self.data[self.code_span.start:self.code_span.end])
+
+	@property
+	def text_bytes(self) -> bytes:
+		return bytes(self.data[self.text_span.start:self.text_span.end])
+
+	@property
+	def code(self) -> str:
+		return self.code_bytes.decode("utf-8")
+
+	@property
+	def text(self) -> str:
+		if self._text is None:
+			self._text = self.text_bytes.decode("utf-8")
+		return self._text
+
+	@property
+	def line(self) -> int:
+		"""The number of the line where the comment starts (from 1)."""
+		return self._lines.line_of(self.code_span.start)
+
+	@property
+	def column(self) -> int:
+		"""The byte offset of the comment from the start of its line."""
+		return self._lines.column_of(self.code_span.start)
+
+	@property
+	def end_line(self) -> int:
+		"""The number of the line where the comment ends."""
+		return self._lines.line_of(self.code_span.end)
+
+	@property
+	def end_column(self) -> int:
+		"""The byte offset right after the comment from the start of its line."""
+		return self._lines.column_of(self.code_span.end)
+
+	def __str__(self):
+		return self.code
+
+	def __repr__(self):
+		return f"ByteComment({self.code_bytes!r}, {self.code_span}, {self.text_span}, " \
+			   f"{self.multiline})"
+
+	def __eq__(self, other):
+		# as in Comment: the data is compared last, by its digest unless it
+		# is the same object (a mmap is not comparable itself)
+		if isinstance(other, ByteComment):
+			if self.code_span != other.code_span or self.text_span != other.text_span \
+					or self.multiline != other.multiline:
+				return False
+			if self.data is other.data:
+				return True
+			return self._lines.digest == other._lines.digest
+		return False
+
+	def __hash__(self):
+		# equal comments have equal code, and it is shorter than the data
+		return hash((self.code_bytes, self.code_span, self.text_span, self.multiline))
+
+
+def _str_spans(func: Callable, data) -> Iterator[SpanTuple]:
+	"""Spans of a parser without an engine, in bytes."""
+	source = bytes(data).decode("utf-8")
+	comments = func(source)
+	if source.isascii():
+		for c in comments:
+			yield c.code_span.start, c.code_span.end, c.text_span.start, c.text_span.end, \
+				  c.multiline
+		return
+	# the positions only grow: each piece between them is encoded once
+	char_pos = byte_pos = 0
+
+	def to_bytes(pos: int) -> int:
+		nonlocal char_pos, byte_pos
+		byte_pos += len(source[char_pos:pos].encode("utf-8"))
+		char_pos = pos
+		return byte_pos
+
+	for c in comments:
+		code_start = to_bytes(c.code_span.start)
+		text_start = to_bytes(c.text_span.start)
+		text_end = to_bytes(c.text_span.end)
+		yield code_start, to_bytes(c.code_span.end), text_start, text_end, c.multiline
+
+
+def _iter_byte_comments(func: Callable, data,
+						filter: Optional[CommentFilter]) -> Iterator[ByteComment]:
+	engine = span_engine(func)
+	spans: Iterable[SpanTuple] = _str_spans(func, data) if engine is None else engine(data)
+	if filter is not None:
+		spans = (s for s in spans if filter.accepts_bytes(data, *s))
+	lines = _ByteLines(data)
+	for code_start, code_end, text_start, text_end, multiline in spans:
+		yield ByteComment(data, Span(code_start, code_end), Span(text_start, text_end),
+						  multiline, lines)
+
+
+def iter_comments_bytes(data, filename: str,
+						filter: CommentFilter = None) -> Iterable[ByteComment]:
+	"""Finds comments in UTF-8 `data`: bytes, bytearray, memoryview or mmap.
+	The format is detected by the `filename`.
+
+	The comments have byte offsets instead of character positions. The data
+	is not decoded, except for the Python parser (and parsers registered
+	without a span engine), which needs str. With a `filter`, its `start`,
+	`end` and `min_length` are in bytes too.
+	"""
+	func = pickfunc(filename)
+	if _observers:
+		return observed(lambda: _iter_byte_comments(func, data, filter), func, filename,
+						lambda: len(data))
+	return _iter_byte_comments(func, data, filter)
+
+
+class TestByteComment(unittest.TestCase):
+
+	def test(self):
+		data = "ё = 1 /* a\nб */ // в".encode()
+		a, b = iter_comments_bytes(data, "a.c")
+		self.assertEqual((a.code_span, a.text_span, a.multiline), ((7, 17), (9, 15), True))
+		self.assertEqual((a.code, a.text, a.text_bytes), ("/* a\nб */", " a\nб ", " a\nб ".encode()))
+		self.assertEqual((a.line, a.column, b.line, b.column), (1, 7, 2, 6))
+		self.assertEqual((a.end_line, a.end_column, b.end_line, b.end_column), (2, 5, 2, 11))
+		self.assertEqual(b.text, " в")
+
+	def test_equal(self):
+		data = b"/* a */ // b"
+		a, b = iter_comments_bytes(data, "a.c")
+		self.assertEqual(list(iter_comments_bytes(bytearray(data), "a.c")), [a, b])
+		self.assertNotEqual(a, b)
+		self.assertNotEqual(next(iter(iter_comments_bytes(b"/* x */", "a.c"))), a)
+		self.assertEqual(len({a, b, *iter_comments_bytes(data, "a.c")}), 2)
@@ -1,21 +1,31 @@
 # SPDX-FileCopyrightText: Copyright (c) 2021 Art Galkin <ortemeo.werhal.com>
 # SPDX-License-Identifier: BSD-3-Clause
 
+import re
 import unittest
 from typing import *
 
-from .x01_common import Comment
+from .x01_common import Comment, LineIndex
 
+_BLANKS = re.compile(r"\s*")
 
-def _startsTheLine(text: str, pos: int) -> bool:
+
+def _startsTheLine(text: str, pos: int, lineIndex: LineIndex = None) -> bool:
 	"""Returns True if the line contains only blanks to
 	the left to the pos"""
 
-	prevNewLinePos = text.rfind("\n", 0, pos + 1)
-	# if this is the first string, we'll get prevNewLinePos=-1.
-	# But we still can get the followining substring:
-	lineStart = text[prevNewLinePos + 1:pos]
-	return not lineStart.strip()  # true if all blanks
+	if lineIndex is None:
+		lineIndex = LineIndex(text)
+	# matching in place: the beginning of the line is not copied
+	return _BLANKS.match(text, lineIndex.line_start(pos), pos).end() == pos
+
+
+def _commentStartsTheLine(comment: Comment) -> bool:
+	if comment.is_detached:
+		# the source is gone, but the blanks before the comment tell
+		blanks = comment.blanks
+		return "\n" in blanks or len(blanks) == comment.code_span.start
+	return _startsTheLine(comment.source, comment.code_span.start, comment.line_index)
 
 
 class TestStartsTheLine(unittest.TestCase):
@@ -53,6 +63,21 @@ def _oneEmptyLineBetween(text: str, start: int, end: int) -> bool:
 	return len(linesBetween) == 2 and not any(s.strip() for s in linesBetween)
 
 
+def _adjacent(previous: Comment, comment: Comment) -> bool:
+	"""Returns True if there is nothing but one line break (or one empty
+	line) between the comments. Detached comments have no source between
+	them, so the blanks before the comment are looked at."""
+	if comment.source is previous.source and not comment.is_detached:
+		return _oneEmptyLineBetween(comment.source, previous.code_span.end,
+									comment.code_span.start)
+	blanks = comment.blanks
+	blanksStart = comment.code_span.start - len(blanks)
+	if blanksStart > previous.code_span.end:
+		# code or more than three line breaks between
+		return False
+	return _oneEmptyLineBetween(blanks, previous.code_span.end - blanksStart, len(blanks))
+
+
 def group_singleline_comments(comments: Iterable[Comment]) -> Iterable[List[Comment]]:
 	"""Combines adjacent single-line comments into groups."""
 
@@ -60,9 +85,8 @@ def group_singleline_comments(comments: Iterable[Comment]) -> Iterable[List[Comm
 
 	for comment in comments:
 
-		if not comment.multiline and _startsTheLine(comment.source, comment.code_span.start):
-			if group and not _oneEmptyLineBetween(comment.source, group[-1].code_span.end,
-												  comment.code_span.start):
+		if not comment.multiline and _commentStartsTheLine(comment):
+			if group and not _adjacent(group[-1], comment):
 				if group:
 					yield group
 					group = []
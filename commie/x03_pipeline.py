@@ -0,0 +1,153 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# What scan_tree, iter_comments_many, scan_blobs and the async API share:
+# the tasks go to a process pool in chunks, and only a few tasks per worker
+# are in flight, so the memory of the calling process does not depend on
+# the number of tasks. The results travel back in the compact form of
+# x02_cache together with the parse events of the worker, and are expanded
+# into detached comments in the calling process.
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, NamedTuple, Optional, Tuple, \
+	TypeVar, Union
+
+from .x01_common import Comment
+from .x01_filter import CommentFilter
+from .x02_cache import CachedComments, CacheReader, CommentCache, CompactComment, \
+	compact_comment, expand_comment
+from .x02_detector import cached_file_comments, detect, iter_comments_file
+from .x02_stats import ParseEvent, collected_events, notify
+
+
+class FileComments(NamedTuple):
+	"""Comments found in a single file by `scan_tree`. The comments are
+	detached. If the file could not be parsed, `error` is the exception
+	and `comments` is empty."""
+	path: Path
+	comments: List[Comment]
+	error: Optional[Exception] = None
+
+
+# (path, comments, error): the form in which results travel from workers
+CompactFileResult = Tuple[str, List[CompactComment], Optional[Exception]]
+# the results of a task and the parse events collected while it ran
+FileBatchResult = Tuple[List[CompactFileResult], List[ParseEvent]]
+# the same for the files looked up in a cache
+CachedBatchResult = Tuple[List[Tuple[str, CachedComments]], List[ParseEvent]]
+
+T = TypeVar("T")
+K = TypeVar("K")
+R = TypeVar("R")
+
+
+def batches(items: Iterable[T], size: int) -> Iterator[List[T]]:
+	batch: List[T] = []
+	for item in items:
+		batch.append(item)
+		if len(batch) >= size:
+			yield batch
+			batch = []
+	if batch:
+		yield batch
+
+
+def run_tasks(func: Callable[..., R], tasks: Iterable[Tuple[K, Optional[tuple]]],
+			  workers: int) -> Iterator[Tuple[K, Optional[R]]]:
+	"""Calls `func(*args)` for each (key, args) of the `tasks` and yields
+	(key, result) in the order of the tasks. A task without args is not run,
+	its result is None.
+
+	With `workers` > 1 the calls run in a pool of that many processes. At
+	most two tasks per worker are in flight, so the tasks may be a lazy
+	iterable of any length. If the caller stops iterating, the tasks that
+	have not started are cancelled. Otherwise the calls run in the calling
+	process, one by one, as the results are taken."""
+	if workers <= 1:
+		for key, args in tasks:
+			yield key, None if args is None else func(*args)
+		return
+
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		pending: Deque[Tuple[K, Future]] = deque()
+		try:
+			for key, args in tasks:
+				if args is None:
+					future: Future = Future()
+					future.set_result(None)
+				else:
+					future = executor.submit(func, *args)
+				pending.append((key, future))
+				if len(pending) >= workers * 2:
+					done, future = pending.popleft()
+					yield done, future.result()
+			while pending:
+				done, future = pending.popleft()
+				yield done, future.result()
+		finally:
+			# the caller may stop iterating early
+			for _, future in pending:
+				future.cancel()
+
+
+def collecting_events(parse: Callable[[], T], observe: bool) -> Tuple[T, List[ParseEvent]]:
+	"""Calls `parse`. With `observe=True` (in a worker process) the parse
+	events are returned to be passed to the observers of the parent."""
+	if observe:
+		with collected_events() as events:
+			return parse(), events
+	return parse(), []
+
+
+def parse_files(paths: List[str], observe: bool = False, sniff: bool = False,
+				filter: CommentFilter = None) -> FileBatchResult:
+	"""Parses the files, see `collecting_events`."""
+
+	def parse() -> List[CompactFileResult]:
+		results: List[CompactFileResult] = []
+		for path in paths:
+			try:
+				comments = [compact_comment(c)
+							for c in iter_comments_file(Path(path), sniff=sniff, filter=filter)]
+			except Exception as e:
+				results.append((path, [], e))
+			else:
+				results.append((path, comments, None))
+		return results
+
+	return collecting_events(parse, observe)
+
+
+def lookup_files(paths: List[str], cache: Union[CommentCache, CacheReader],
+				 observe: bool = False, sniff: bool = False) -> CachedBatchResult:
+	"""Looks up the files in the cache and parses the misses, see
+	`cached_file_comments` and `collecting_events`."""
+
+	def lookup() -> List[Tuple[str, CachedComments]]:
+		results: List[Tuple[str, CachedComments]] = []
+		for path in paths:
+			try:
+				func = detect(Path(path), sniff)
+			except Exception as e:
+				results.append((path, CachedComments(None, False, [], e)))
+			else:
+				results.append((path, cached_file_comments(Path(path), func, False, cache)))
+		return results
+
+	return collecting_events(lookup, observe)
+
+
+def expand_result(result: CompactFileResult) -> FileComments:
+	path, compact, error = result
+	return FileComments(Path(path), [expand_comment(c) for c in compact], error)
+
+
+def expand_results(parsed: FileBatchResult) -> Iterator[FileComments]:
+	"""Passes the events of a task to the observers, then yields its results."""
+	results, events = parsed
+	for event in events:
+		notify(event)
+	for result in results:
+		yield expand_result(result)
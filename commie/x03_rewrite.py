@@ -0,0 +1,120 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The output is collected as a list of pieces (the code between comments and
+# the replacements) and joined once, so the time is linear in the size of
+# the source whatever the number of comments. Stripping works on the spans
+# of the engine and creates no Comment objects at all.
+
+import re
+import unittest
+from typing import Callable, Iterable, List
+
+from commie.parsers import iter_comments_html
+from commie.parsers._engines import span_engine
+from commie.parsers._helper import SpanTuple
+from commie.x01_common import Comment, LineIndex, Span
+from commie.x01_filter import CommentFilter
+from commie.x02_detector import parse_filtered, pickfunc
+from commie.x02_stats import _observers, observed, utf8_size
+
+_LINE_BREAK = re.compile(r"\r?\n")
+
+
+def _spans(source: str, func: Callable, filename: str,
+		   filter: CommentFilter = None) -> Iterable[SpanTuple]:
+
+	def parse() -> Iterable[SpanTuple]:
+		engine = span_engine(func)
+		if engine is None:
+			return ((c.code_span.start, c.code_span.end, c.text_span.start, c.text_span.end,
+					 c.multiline) for c in parse_filtered(func, source, filter))
+		spans = engine(source)
+		return spans if filter is None else filter.spans(source, spans)
+
+	if _observers:
+		return observed(parse, func, filename, lambda: utf8_size(source))
+	return parse()
+
+
+def strip_comments(source: str, filename: str, keep_newlines: bool = True,
+				   filter: CommentFilter = None) -> str:
+	"""Returns the source without comments. The format is detected by the
+	`filename`.
+
+	With `keep_newlines` the line breaks inside multi-line comments are
+	kept, so the code stays on the same lines. Otherwise the line breaks
+	are removed with the comment.
+
+	A comment that would join two non-blank characters is replaced by a
+	space, as the C preprocessor does: `int/**/x` becomes `int x`. In HTML
+	a comment does not separate words, so there it is just removed.
+
+	With a `filter` only the comments it accepts are removed."""
+	func = pickfunc(filename)
+	separate = func is not iter_comments_html
+	pieces: List[str] = []
+	append = pieces.append
+	find = source.find
+	size = len(source)
+	pos = 0
+	last = ""  # the last character of the output
+	for code_start, code_end, _, _, _ in _spans(source, func, filename, filter):
+		if pos < code_start:
+			append(source[pos:code_start])
+			last = source[code_start - 1]
+		if keep_newlines and find("\n", code_start, code_end) >= 0:
+			append("".join(_LINE_BREAK.findall(source, code_start, code_end)))
+			last = "\n"
+		elif separate and last and not last.isspace() \
+				and code_end < size and not source[code_end].isspace():
+			append(" ")
+			last = " "
+		pos = code_end
+	append(source[pos:])
+	return "".join(pieces)
+
+
+def replace_comments(source: str, filename: str, fn: Callable[[Comment], str],
+					 filter: CommentFilter = None) -> str:
+	"""Returns the source with each comment replaced by `fn(comment)`. The
+	format is detected by the `filename`. With a `filter` only the comments
+	it accepts are replaced."""
+	pieces: List[str] = []
+	append = pieces.append
+	index = LineIndex(source)
+	pos = 0
+	spans = _spans(source, pickfunc(filename), filename, filter)
+	for code_start, code_end, text_start, text_end, multiline in spans:
+		append(source[pos:code_start])
+		append(fn(Comment(source, Span(code_start, code_end), Span(text_start, text_end),
+						  multiline, index)))
+		pos = code_end
+	append(source[pos:])
+	return "".join(pieces)
+
+
+class TestRewrite(unittest.TestCase):
+
+	def test_strip(self):
+		source = "int a; /* one\r\ntwo */ int b; // three\nint c;"
+		self.assertEqual(strip_comments(source, "a.c"), "int a; \r\n int b; \nint c;")
+		self.assertEqual(strip_comments(source, "a.c", keep_newlines=False),
+						 "int a;  int b; \nint c;")
+		self.assertEqual(strip_comments(source, "a.c", filter=CommentFilter("three")),
+						 "int a; /* one\r\ntwo */ int b; \nint c;")
+
+	def test_strip_separates_tokens(self):
+		self.assertEqual(strip_comments("int/**/x = a/*c*/-/*d*/-b;", "a.c"), "int x = a - -b;")
+		self.assertEqual(strip_comments("return/* c */value;", "a.c", keep_newlines=False),
+						 "return value;")
+		self.assertEqual(strip_comments("a/* x\n */b", "a.c", keep_newlines=False), "a b")
+		self.assertEqual(strip_comments("a/*x*//*y*/b /* z */ c/**/", "a.c"), "a b  c")
+		self.assertEqual(strip_comments("a{/**/color:red}", "a.css"), "a{ color:red}")
+		self.assertEqual(strip_comments("<b>a</b><!-- x --><i>b</i>", "a.html"),
+						 "<b>a</b><i>b</i>")
+
+	def test_replace(self):
+		source = "x = 1  # one\n# two\n"
+		self.assertEqual(replace_comments(source, "a.py", lambda c: f"# {c.line}"),
+						 "x = 1  # 1\n# 2\n")
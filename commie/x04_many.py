@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# A batched wrapper around the parsers. Each source is scanned by the span
+# engine of its parser directly, with no generator between the engine and
+# the list of comments. Worker processes get whole chunks, so a task
+# carries many small sources instead of one.
+
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .parsers._engines import span_engine
+from .parsers._helper import SpanTuple
+from .x01_common import Comment, Span, LineIndex
+from .x01_filter import CommentFilter
+from .x02_cache import CompactComment, compact_comment, expand_comment
+from .x02_detector import pickfunc, parse_filtered
+from .x02_stats import ParseEvent, notify, observed, observing, utf8_size
+from .x03_pipeline import batches, collecting_events, run_tasks
+
+
+class SourceComments(NamedTuple):
+	"""Comments found in one source by `iter_comments_many`. The `position` is
+	the index of the source among the items. If the source could not be
+	parsed, `error` is the exception and `comments` is empty."""
+	position: int
+	comments: List[Comment]
+	error: Optional[Exception] = None
+
+
+# (position, (code, filename))
+_Item = Tuple[int, Tuple[str, str]]
+_Result = Tuple[List[Comment], Optional[Exception]]
+_CompactResult = Tuple[List[CompactComment], Optional[Exception]]
+
+
+def _parse(func: Callable, code: str, filename: str, observe: bool,
+		   filter: Optional[CommentFilter]) -> List[Comment]:
+	if observe:
+		return list(observed(lambda: parse_filtered(func, code, filter), func, filename,
+							 lambda: utf8_size(code)))
+	engine = span_engine(func)
+	if engine is None:
+		return list(parse_filtered(func, code, filter))
+	spans: Iterable[SpanTuple] = engine(code)
+	if filter is not None:
+		spans = filter.spans(code, spans)
+	index = LineIndex(code)
+	return [Comment(code, Span(cs, ce), Span(ts, te), multiline, index)
+			for cs, ce, ts, te, multiline in spans]
+
+
+def _parse_chunk(items: Sequence[_Item], filter: Optional[CommentFilter]) -> List[_Result]:
+	"""Returns the results in the order of the items."""
+	results: List[_Result] = []
+	observe = observing()
+	for _, (code, filename) in items:
+		try:
+			results.append((_parse(pickfunc(filename), code, filename, observe, filter), None))
+		except Exception as e:
+			results.append(([], e))
+	return results
+
+
+def _parse_chunk_compact(items: Sequence[_Item], observe: bool, filter: Optional[CommentFilter]) \
+		-> Tuple[List[_CompactResult], List[ParseEvent]]:
+	"""Runs in a worker process."""
+
+	def parse() -> List[_CompactResult]:
+		return [([compact_comment(c) for c in comments], error)
+				for comments, error in _parse_chunk(items, filter)]
+
+	return collecting_events(parse, observe)
+
+
+def _expand(items: Sequence[_Item], parsed: Tuple[List[_CompactResult], List[ParseEvent]]) \
+		-> Iterator[SourceComments]:
+	results, events = parsed
+	for event in events:
+		notify(event)
+	for (position, _), (compact, error) in zip(items, results):
+		yield SourceComments(position, [expand_comment(c) for c in compact], error)
+
+
+def iter_comments_many(items: Iterable[Tuple[str, str]], workers: int = 1,
+					   chunk_size: int = 256,
+					   filter: CommentFilter = None) -> Iterator[SourceComments]:
+	"""Finds comments in many sources given as (code, filename) pairs. The
+	format of each source is detected by its filename. Yields a
+	`SourceComments` for each item, in the order of the items. Errors do not
+	stop the parsing: they are reported in `SourceComments.error`.
+
+	The items are taken by chunks of `chunk_size`. With `workers` > 1 each
+	chunk is one task for a pool of that many processes, and the comments
+	are detached.
+
+	With a `filter` only the comments it accepts are created.
+	"""
+	chunks = batches(enumerate(items), chunk_size)
+	if workers <= 1:
+		for chunk in chunks:
+			for (position, _), (comments, error) in zip(chunk, _parse_chunk(chunk, filter)):
+				yield SourceComments(position, comments, error)
+		return
+
+	tasks = ((chunk, (chunk, observing(), filter)) for chunk in chunks)
+	for chunk, parsed in run_tasks(_parse_chunk_compact, tasks, workers):
+		assert parsed is not None
+		yield from _expand(chunk, parsed)
@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union, Collection
+
+from .x01_errors import FormatUndetectedError
+from .x01_filter import CommentFilter
+from .x02_cache import CommentCache, expand_comment
+from .x02_detector import pickfunc, detect
+from .x02_stats import notify, observing
+from .x03_pipeline import CachedBatchResult, FileComments, batches, expand_results, \
+	lookup_files, parse_files, run_tasks
+
+
+def _iter_files(root: str, skip_dirs: Collection[str], sniff: bool) -> Iterator[str]:
+	"""Yields paths of the files with known formats, sorted by name within
+	each directory. Symlinks to directories are not followed."""
+	stack = [root]
+	while stack:
+		directory = stack.pop()
+		try:
+			with os.scandir(directory) as it:
+				entries = sorted(it, key=lambda e: e.name)
+		except OSError:
+			continue
+		subdirs = []
+		for entry in entries:
+			if entry.is_dir(follow_symlinks=False):
+				if entry.name not in skip_dirs:
+					subdirs.append(entry.path)
+			elif entry.is_file():
+				try:
+					pickfunc(entry.name)
+				except FormatUndetectedError:
+					if not sniff:
+						continue
+					try:
+						detect(Path(entry.path), sniff=True)
+					except (FormatUndetectedError, OSError):
+						continue
+				yield entry.path
+		stack.extend(reversed(subdirs))
+
+
+def _cached_results(parsed: CachedBatchResult, cache: CommentCache,
+				   filter: Optional[CommentFilter]) -> Iterator[FileComments]:
+	"""Records the lookups of a task in the cache and yields the comments
+	the `filter` accepts (the cache keeps all of them)."""
+	results, events = parsed
+	for event in events:
+		notify(event)
+	for path, cached in results:
+		cache.record(cached)
+		comments = [expand_comment(c) for c in cached.comments]
+		if filter is not None:
+			comments = [c for c in comments if filter.accepts_comment(c)]
+		yield FileComments(Path(path), comments, cached.error)
+
+
+def scan_tree(root: Union[str, Path], workers: int = None, chunk_size: int = 64,
+			  skip_dirs: Collection[str] = (".git", ".hg", ".svn"),
+			  cache: CommentCache = None, sniff: bool = False,
+			  filter: CommentFilter = None) -> Iterable[FileComments]:
+	"""Finds comments in all files with known formats under the `root`
+	directory. Yields a `FileComments` for each file.
+
+	The files are parsed by `workers` processes (by default, one per CPU),
+	`chunk_size` files per task. Only a few tasks per worker are in flight
+	at any time, so the memory of the calling process does not grow with the
+	size of the tree. With `workers=1` everything runs in the calling
+	process.
+
+	Results come in the order of the tree walk. Errors do not stop the scan:
+	they are reported in `FileComments.error`.
+
+	With a `cache` the workers look up the files in it, and only the files
+	that are not there are parsed. Each file is read once: the same bytes
+	are hashed and parsed. The calling process counts the hits and the
+	misses and caches the new comments.
+
+	With a `filter` only the comments it accepts are returned (see
+	`CommentFilter`).
+
+	With `sniff=True` the files with unknown names are also parsed, if their
+	first bytes tell the format (see `iter_comments_file`).
+
+	The parse events of the worker processes are passed to the observers
+	(see `add_observer`) of the calling process.
+	"""
+	if workers is None:
+		workers = os.cpu_count() or 1
+	observe = workers > 1 and observing()
+	paths = batches(_iter_files(str(root), skip_dirs, sniff), chunk_size)
+
+	if cache is None:
+		tasks = ((None, (batch, observe, sniff, filter)) for batch in paths)
+		for _, parsed in run_tasks(parse_files, tasks, workers):
+			yield from expand_results(parsed)
+		return
+
+	# the workers only read the cache file
+	reader = cache if workers <= 1 else cache.reader()
+	lookups = ((None, (batch, reader, observe, sniff)) for batch in paths)
+	for _, looked_up in run_tasks(lookup_files, lookups, workers):
+		yield from _cached_results(looked_up, cache, filter)
@@ -0,0 +1,187 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The source is read chunk by chunk and each chunk is appended to the code
+# left from the previous one. The span engine scans the code as not final: it
+# returns the position of the first comment (or literal) that the next chunk
+# could change, and everything before that position is dropped. So the buffer
+# holds a chunk plus the unfinished comment. When the buffer does not shrink,
+# the next read is as long as the buffer: then a long comment is rescanned
+# only a few times, not once per chunk.
+#
+# The same holds for whatever an engine cannot settle before its line ends:
+# a single-line comment, an unpaired quote, a Ruby literal. On minified code
+# that is a single line, the buffer then holds the rest of the line.
+#
+# Python code is tokenized line by line: tokenize itself works on streams.
+
+import codecs
+import tokenize
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, TextIO, Union
+
+from commie.parsers import iter_comments_python
+from commie.parsers._engines import span_engine, SpanEngine
+from commie.x01_common import Comment, Span, LineIndex, blanks_before
+from commie.x01_filter import CommentFilter
+from commie.x02_detector import pickfunc, parse_filtered
+
+_Reader = Callable[[int], str]
+
+
+def _text_reader(stream: Union[TextIO, BinaryIO]) -> _Reader:
+	"""Returns a function that reads a str of about the given size from the
+	stream, or an empty str at the end. Bytes are decoded as UTF-8."""
+	decoder = codecs.getincrementaldecoder("utf-8")()
+
+	def read(size: int) -> str:
+		while True:
+			data = stream.read(size)
+			if isinstance(data, str):
+				return data
+			if not data:
+				return decoder.decode(b"", True)
+			text = decoder.decode(data)
+			if text:
+				return text
+			# a few bytes of a character, read on
+
+	return read
+
+
+def _iter_engine(engine: SpanEngine, read: _Reader, chunk_size: int,
+				 filter: Optional[CommentFilter]) -> Iterator[Comment]:
+	buffer = ""
+	base = 0  # position of buffer[0] in the source
+	line, column = 1, 0  # the same position as line and column
+	blanks = ""  # the whitespace right before buffer[0]
+	final = False
+	while not final:
+		chunk = read(max(chunk_size, len(buffer)))
+		if chunk:
+			buffer += chunk
+		else:
+			final = True
+
+		index = LineIndex(buffer, base, line, column)
+		spans = engine(buffer, 0, final)
+		while True:
+			try:
+				code_start, code_end, text_start, text_end, multiline = next(spans)
+			except StopIteration as stop:
+				restart = stop.value
+				break
+			if filter is not None and not filter.accepts(
+					buffer, base + code_start, base + code_end, base + text_start,
+					base + text_end, multiline, base):
+				continue
+			start = base + code_start
+			yield Comment._detached(buffer[code_start:code_end],
+									Span(start, base + code_end),
+									Span(base + text_start, base + text_end),
+									multiline, index.line_of(start), index.column_of(start),
+									blanks_before(buffer, code_start, blanks))
+
+		if restart:
+			blanks = blanks_before(buffer, restart, blanks)
+			newlines = buffer.count("\n", 0, restart)
+			if newlines:
+				line += newlines
+				column = restart - buffer.rindex("\n", 0, restart) - 1
+			else:
+				column += restart
+			buffer = buffer[restart:]
+			base += restart
+
+
+class _LineReader:
+	"""Splits the text into lines for tokenize and remembers where the
+	recent lines start."""
+
+	def __init__(self, read: _Reader, chunk_size: int):
+		self.read = read
+		self.chunk_size = chunk_size
+		self.pending = ""
+		self.pos = 0  # position in the pending text
+		self.line_start = 0  # position in the source of the next line
+		self.line_number = 0
+		self.line_starts: Dict[int, int] = {}
+		self.lines: Dict[int, str] = {}
+
+	def readline(self) -> str:
+		end = self.pending.find("\n", self.pos) + 1
+		while not end:
+			chunk = self.read(self.chunk_size)
+			if not chunk:
+				end = len(self.pending)
+				break
+			self.pending = self.pending[self.pos:] + chunk
+			self.pos = 0
+			end = self.pending.find("\n") + 1
+		result = self.pending[self.pos:end]
+		self.pos = end
+		self.line_number += 1
+		self.line_starts[self.line_number] = self.line_start
+		self.lines[self.line_number] = result
+		self.line_start += len(result)
+		return result
+
+	def forget_before(self, line_number: int):
+		for old in [n for n in self.line_starts if n < line_number]:
+			del self.line_starts[old]
+			del self.lines[old]
+
+	def blanks_before(self, line_number: int, column: int) -> str:
+		"""The whitespace before the position, found in the three lines
+		before it at most: that is all `blanks_before` needs."""
+		text = "".join(self.lines[n] for n in range(max(1, line_number - 3), line_number))
+		return blanks_before(self.lines[line_number], column, text)
+
+
+def _iter_python(read: _Reader, chunk_size: int,
+				 filter: Optional[CommentFilter]) -> Iterator[Comment]:
+	lines = _LineReader(read, chunk_size)
+	for token in tokenize.generate_tokens(lines.readline):
+		number, column = token.start
+		# tokens go in order: only the blanks before a comment may refer to
+		# the three previous lines
+		lines.forget_before(number - 3)
+		if token.type == tokenize.COMMENT:
+			start = lines.line_starts[number] + column
+			end = start + len(token.string)
+			if filter is not None and not filter.accepts(token.string, start, end, start + 1, end,
+														 False, start):
+				continue
+			yield Comment._detached(token.string, Span(start, end), Span(start + 1, end),
+									False, number, column, lines.blanks_before(number, column))
+
+
+def iter_comments_stream(stream: Union[TextIO, BinaryIO], filename: str,
+						 chunk_size: int = 1 << 16,
+						 filter: CommentFilter = None) -> Iterator[Comment]:
+	"""Finds comments in the code read from a file object: a file, a pipe,
+	a socket file or a decompressor. The format is detected by the
+	`filename`. Binary streams are decoded as UTF-8.
+
+	The stream is read by `chunk_size` characters (or bytes). Only the current
+	chunk and the comment that is not finished yet are kept in memory (or
+	the rest of the line after a quote without a pair, see the README).
+	Comments are detached, their positions are counted from the beginning of
+	the stream.
+
+	Python code is tokenized, so the comments are exactly as tokenize
+	finds them (unlike `iter_comments_python`, this also raises
+	IndentationError on inconsistent dedents). Parsers registered by
+	`register_language` get the whole stream read into a str.
+
+	With a `filter` only the comments it accepts are created. Its `start`
+	and `end` are counted from the beginning of the stream.
+	"""
+	func = pickfunc(filename)
+	read = _text_reader(stream)
+	if func is iter_comments_python:
+		return _iter_python(read, chunk_size, filter)
+	engine = span_engine(func)
+	if engine is None:
+		# a registered parser without an engine needs the whole source
+		return iter(parse_filtered(func, "".join(iter(lambda: read(chunk_size), "")), filter))
+	return _iter_engine(engine, read, chunk_size, filter)
@@ -0,0 +1,203 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The span engines have no state between comments: right after a comment
+# they are in the same state as at the beginning of the code. So after an
+# edit the scan restarts from the end of the last comment that cannot
+# change. The engines look one character past the end of a comment, and the
+# HTML and SASS engines look for the pair of a quote up to the end of the
+# line, so the comment must end before the edit and start before the line of
+# the edit. The scan goes on until it finds a comment after the edit that is
+# also an old comment, shifted by the length difference. Both scans are at
+# the same comment followed by the same code, so the rest is the old
+# comments shifted.
+#
+# The spans are kept like a gap buffer: the comments before the last edit
+# have positions counted from the start of the source, and the comments
+# after it from the end. An edit does not change the positions counted from
+# the end, so only the comments between two edits are moved from one list
+# to the other.
+#
+# The comments returned after an edit are a view of these lists, not a copy:
+# the view checks the version of the source and fails once it is edited.
+
+from itertools import chain
+from typing import Callable, List, Optional, Sequence, Union, overload
+
+from commie.parsers._engines import span_engine
+from commie.parsers._helper import SpanTuple
+from commie.x01_common import Comment, Span, LineIndex
+from commie.x01_filter import CommentFilter
+from commie.x02_detector import pickfunc
+
+
+def _shift(span: SpanTuple, delta: int) -> SpanTuple:
+	cs, ce, ts, te, multiline = span
+	return cs + delta, ce + delta, ts + delta, te + delta, multiline
+
+
+class _CommentList(Sequence[Comment]):
+	"""Comments of one version of the source. They are created on access
+	from the spans of the `owner`, until it is edited."""
+
+	def __init__(self, owner: 'IncrementalComments', head: List[SpanTuple],
+				 tail: List[SpanTuple]):
+		self._owner = owner
+		self._version = owner._version
+		self._source = owner.source
+		self._head = head
+		self._tail = tail  # reversed, positions counted from the end
+		self._index = LineIndex(self._source)
+
+	def _check(self):
+		if self._owner._version != self._version:
+			raise RuntimeError("The source was edited after the comments were returned")
+
+	def __len__(self) -> int:
+		self._check()
+		return len(self._head) + len(self._tail)
+
+	def _comment(self, i: int) -> Comment:
+		if i < len(self._head):
+			cs, ce, ts, te, multiline = self._head[i]
+		else:
+			cs, ce, ts, te, multiline = _shift(self._tail[len(self) - 1 - i], len(self._source))
+		return Comment(self._source, Span(cs, ce), Span(ts, te), multiline, self._index)
+
+	@overload
+	def __getitem__(self, i: int) -> Comment: ...
+
+	@overload
+	def __getitem__(self, i: slice) -> List[Comment]: ...
+
+	def __getitem__(self, i: Union[int, slice]) -> Union[Comment, List[Comment]]:
+		self._check()
+		if isinstance(i, slice):
+			return [self._comment(j) for j in range(*i.indices(len(self)))]
+		if i < 0:
+			i += len(self)
+		if not 0 <= i < len(self):
+			raise IndexError(i)
+		return self._comment(i)
+
+
+class IncrementalComments:
+	"""Comments of a source that is being edited, for example in an editor.
+
+	After each `edit` only the code around the edited text is scanned again.
+	The comments are always the same as a full parse of the new source
+	would give. They are created on access, so an edit takes time
+	proportional to the changed part of the source, not to the number of
+	comments in it.
+
+	Python sources have no span engine: they are parsed again in full.
+
+	With a `filter` only the comments it accepts are returned. All the spans
+	are still kept, since the rescan after an edit stops at an old comment,
+	but the filter is checked against them before any Comment is created.
+	The accepted spans are found on the first access after an edit.
+
+	The sequence of the comments is a view of the current version of the
+	source: it raises RuntimeError once the source is edited again.
+	"""
+
+	def __init__(self, source: str, filename: str, filter: CommentFilter = None):
+		self._func: Callable = pickfunc(filename)
+		self._engine = span_engine(self._func)
+		self._filter = filter
+		self.source = source
+		# the comments before the gap, then the comments after the gap in
+		# reverse order, with positions counted from the end of the source
+		self._head: List[SpanTuple] = []
+		self._tail: List[SpanTuple] = []
+		self._valid = False
+		self._version = 0
+		self._comments: Optional[_CommentList] = None
+		# the part of the current source that the last parse scanned
+		self.rescanned = Span(0, len(source))
+		self._parse_all()
+
+	def _parse_all(self):
+		self.rescanned = Span(0, len(self.source))
+		self._head, self._tail = [], []
+		if self._engine is None:
+			self._head = [(c.code_span.start, c.code_span.end, c.text_span.start,
+						   c.text_span.end, c.multiline) for c in self._func(self.source)]
+		else:
+			self._head = list(self._engine(self.source))
+		self._valid = True
+
+	@property
+	def comments(self) -> Sequence[Comment]:
+		"""The comments of the current source."""
+		if not self._valid:
+			self._parse_all()  # the last edit left an unclosed comment
+		if self._comments is None:
+			head, tail = self._head, self._tail
+			if self._filter is not None:
+				length = len(self.source)
+				spans = chain(head, (_shift(span, length) for span in reversed(tail)))
+				head, tail = list(self._filter.spans(self.source, spans)), []
+			self._comments = _CommentList(self, head, tail)
+		return self._comments
+
+	def _move_gap(self, line_break: int, offset: int, length: int):
+		"""Moves the gap to the edit: the comments before it start before the
+		line of the edit and end before the edit. `length` is the length of
+		the source before the edit."""
+		head, tail = self._head, self._tail
+		while head and (head[-1][0] > line_break or head[-1][1] >= offset):
+			tail.append(_shift(head.pop(), -length))
+		while tail:
+			span = _shift(tail[-1], length)
+			if span[0] > line_break or span[1] >= offset:
+				break
+			head.append(span)
+			tail.pop()
+
+	def edit(self, offset: int, removed_len: int, inserted_text: str) -> Sequence[Comment]:
+		"""Replaces `removed_len` characters at the `offset` with the
+		`inserted_text` and returns the comments of the new source.
+
+		Raises UnterminatedCommentError if the new source has an unclosed
+		comment. The edit is applied anyway, the next one parses the source
+		in full."""
+		old_length = len(self.source)
+		if not 0 <= offset <= offset + removed_len <= old_length:
+			raise ValueError("The edit is out of the source")
+		line_break = self.source.rfind("\n", 0, offset)
+		self.source = self.source[:offset] + inserted_text + self.source[offset + removed_len:]
+		self._version += 1
+		self._comments = None
+
+		if not self._valid or self._engine is None:
+			self._parse_all()
+			return self.comments
+
+		self._move_gap(line_break, offset, old_length)
+		head, tail = self._head, self._tail
+		restart = head[-1][1] if head else 0
+		length = len(self.source)
+		edit_end = offset + len(inserted_text)
+		# old comments that start here (counting from the end) or later are
+		# not touched by the edit
+		unchanged = offset + removed_len - old_length
+
+		self._valid = False
+		scan_end = length
+		for span in self._engine(self.source, restart):
+			if span[0] >= edit_end:
+				relative = _shift(span, -length)
+				while tail and (tail[-1][0] < relative[0] or tail[-1][0] < unchanged):
+					tail.pop()
+				if tail and tail[-1] == relative:
+					# the rest are the old comments
+					scan_end = span[1]
+					break
+			head.append(span)
+		else:
+			tail.clear()
+		self._valid = True
+
+		self.rescanned = Span(restart, scan_end)
+		return self.comments
@@ -0,0 +1,107 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# Files are read and parsed in an executor, so the event loop only turns
+# the results into comments. Results travel from the executor in the
+# compact form of x02_cache: it is cheap to pickle if the executor is a
+# process pool.
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple, Union
+
+from commie.x01_common import Comment
+from commie.x01_filter import CommentFilter
+from commie.x02_cache import CompactComment, compact_comment, expand_comment
+from commie.x02_detector import iter_comments_file
+from commie.x02_stats import ParseEvent, collected_events, notify, observing
+from commie.x03_pipeline import FileComments, expand_results, parse_files
+
+
+def _parse_compact(path: str, mapped: bool, filter: Optional[CommentFilter]) \
+		-> Tuple[List[CompactComment], Optional[Exception]]:
+	try:
+		return [compact_comment(c)
+				for c in iter_comments_file(Path(path), mapped, filter=filter)], None
+	except Exception as e:
+		return [], e
+
+
+def _parse_file(path: str, mapped: bool, observe: bool, filter: Optional[CommentFilter]) \
+		-> Tuple[List[CompactComment], List[ParseEvent], Optional[Exception]]:
+	if observe:
+		with collected_events() as events:
+			compact, error = _parse_compact(path, mapped, filter)
+		return compact, events, error
+	compact, error = _parse_compact(path, mapped, filter)
+	return compact, [], error
+
+
+def _observe(executor: Optional[Executor]) -> bool:
+	"""Whether the events must be sent from the executor. The observers are
+	called in threads, but not in other processes."""
+	return isinstance(executor, ProcessPoolExecutor) and observing()
+
+
+async def aiter_comments_file(file: Union[str, Path], executor: Executor = None,
+							  mapped: bool = False,
+							  filter: CommentFilter = None) -> AsyncIterator[Comment]:
+	"""Asynchronous `iter_comments_file`. The file is read and parsed in the
+	`executor` (by default, in the default executor of the loop). The
+	comments are detached. With a `filter` only the comments it accepts are
+	created."""
+	loop = asyncio.get_running_loop()
+	compact, events, error = await loop.run_in_executor(executor, _parse_file, str(file),
+														mapped, _observe(executor), filter)
+	for event in events:
+		notify(event)
+	if error is not None:
+		raise error
+	for comment in compact:
+		yield expand_comment(comment)
+
+
+async def aiter_comments_many(files: Iterable[Union[str, Path]], executor: Executor = None,
+							  concurrency: int = None,
+							  filter: CommentFilter = None) -> AsyncIterator[FileComments]:
+	"""Finds comments in the files, yields a `FileComments` for each file as
+	soon as it is parsed (not in the order of `files`). Errors are reported
+	in `FileComments.error`.
+
+	The files are read and parsed in the `executor`: a thread pool keeps the
+	event loop free, a process pool also parses files in parallel. At most
+	`concurrency` files (by default, two per CPU) are in progress or wait
+	for the caller to take their results. So `files` may be a lazy iterable
+	of any length.
+
+	The parse events of a process pool are passed to the observers (see
+	`add_observer`) of the calling process.
+
+	With a `filter` only the comments it accepts are created.
+	"""
+	if concurrency is None:
+		concurrency = (os.cpu_count() or 1) * 2
+	loop = asyncio.get_running_loop()
+	observe = _observe(executor)
+	paths = iter(files)
+	pending: Set[asyncio.Future] = set()
+	try:
+		while True:
+			while len(pending) < concurrency:
+				path = next(paths, None)
+				if path is None:
+					break
+				pending.add(loop.run_in_executor(executor, parse_files, [str(path)], observe,
+												 False, filter))
+			if not pending:
+				return
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+			for future in done:
+				for result in expand_results(future.result()):
+					yield result
+	finally:
+		# the caller may stop iterating early
+		for future in pending:
+			future.cancel()
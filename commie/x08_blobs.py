@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# A blob is the content of a file that is not on the disk: a git object or an
+# archive member. The calling process reads the blobs, and the workers decode
+# and parse them, chunk by chunk. Only a few chunks per worker are read
+# ahead, so the memory is bounded by the chunks in flight, not by the size of
+# the repository or the archive.
+
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .x01_filter import CommentFilter
+from .x02_cache import compact_comment
+from .x02_detector import iter_comments_str
+from .x02_stats import observing
+from .x03_pipeline import CompactFileResult, FileBatchResult, FileComments, batches, \
+	collecting_events, expand_results, run_tasks
+
+# (path, content), or (path, the error raised while reading the content)
+Blob = Tuple[str, Union[bytes, Exception]]
+
+
+def _parse_blobs(blobs: List[Blob], observe: bool,
+				 filter: Optional[CommentFilter]) -> FileBatchResult:
+
+	def parse() -> List[CompactFileResult]:
+		results: List[CompactFileResult] = []
+		for path, data in blobs:
+			if isinstance(data, Exception):
+				results.append((path, [], data))
+				continue
+			try:
+				code = data.decode("utf-8")
+				comments = [compact_comment(c) for c in iter_comments_str(code, path, filter)]
+			except Exception as e:
+				results.append((path, [], e))
+			else:
+				results.append((path, comments, None))
+		return results
+
+	return collecting_events(parse, observe)
+
+
+def scan_blobs(blobs: Iterable[Blob], workers: int = None, chunk_size: int = 64,
+			   filter: CommentFilter = None) -> Iterator[FileComments]:
+	"""Finds comments in (path, bytes) pairs. The format is detected by the
+	path, the bytes are decoded as UTF-8 (the line endings are not
+	translated). Yields a `FileComments` for each pair, in the same order,
+	with detached comments. Errors are reported in `FileComments.error`.
+	The content may also be an exception raised while reading it: it is
+	reported as the error of the pair.
+
+	The pairs are parsed by `workers` processes (by default, one per CPU),
+	`chunk_size` pairs per task. With `workers=1` everything runs in the
+	calling process."""
+	if workers is None:
+		workers = os.cpu_count() or 1
+	# in the calling process, one blob at a time: only the current one is
+	# kept in memory
+	chunks = batches(blobs, chunk_size if workers > 1 else 1)
+	tasks = ((None, (chunk, workers > 1 and observing(), filter)) for chunk in chunks)
+	for _, parsed in run_tasks(_parse_blobs, tasks, workers):
+		assert parsed is not None
+		yield from expand_results(parsed)
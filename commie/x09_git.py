@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The files of a revision are listed by `git ls-tree` (or, for the changes
+# since another revision, by `git diff-tree`), and their contents come from
+# a single `git cat-file --batch` process: one request per blob, no
+# checkout and no temporary files.
+
+import os
+import subprocess
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+from .x01_errors import FileError
+from .x01_filter import CommentFilter
+from .x02_detector import known_format
+from .x03_pipeline import FileComments
+from .x08_blobs import scan_blobs
+
+# modes of the tree entries that are not regular files
+_SYMLINK = b"120000"
+_SUBMODULE = b"160000"
+
+
+def _git(repo: str, *args: str) -> bytes:
+	return subprocess.run(["git", "-C", repo, *args], check=True,
+						  stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+
+
+def _tree_files(repo: str, revision: str) -> Iterator[Tuple[str, str]]:
+	"""Yields (path, blob id) of the files of the revision."""
+	for entry in _git(repo, "ls-tree", "-r", "-z", "--full-tree", revision).split(b"\0"):
+		if not entry:
+			continue
+		meta, _, path = entry.partition(b"\t")
+		mode, kind, blob = meta.split()
+		if kind == b"blob" and mode != _SYMLINK:
+			yield os.fsdecode(path), blob.decode()
+
+
+def _changed_files(repo: str, since: str, revision: str) -> Iterator[Tuple[str, str]]:
+	"""Yields (path, blob id) of the files added or modified after `since`."""
+	fields = _git(repo, "diff-tree", "-r", "-z", "--no-renames", "--diff-filter=d",
+				  since, revision).split(b"\0")
+	# ":old_mode new_mode old_blob new_blob status", then the path
+	for meta, path in zip(fields[0::2], fields[1::2]):
+		_, mode, _, blob, _ = meta.split()
+		if mode not in (_SYMLINK, _SUBMODULE):
+			yield os.fsdecode(path), blob.decode()
+
+
+class _CatFile:
+	"""A `git cat-file --batch` process that reads blobs one by one."""
+
+	def __init__(self, repo: str):
+		self._process = subprocess.Popen(["git", "-C", repo, "cat-file", "--batch"],
+										 stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+	def __enter__(self) -> '_CatFile':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self):
+		stdin, stdout = self._process.stdin, self._process.stdout
+		assert stdin is not None and stdout is not None
+		stdin.close()
+		self._process.wait()
+		stdout.close()
+
+	def read(self, blob: str) -> Union[bytes, FileError]:
+		"""Returns the content of the blob, or the error if git cannot
+		read it (a missing object in a broken or shallow repository)."""
+		stdin, stdout = self._process.stdin, self._process.stdout
+		assert stdin is not None and stdout is not None
+		stdin.write(blob.encode() + b"\n")
+		stdin.flush()
+		# "<id> blob <size>" or "<id> missing"
+		header = stdout.readline().split()
+		if len(header) != 3:
+			return FileError(f"Cannot read the git object {blob}")
+		data = stdout.read(int(header[2]))
+		stdout.read(1)  # the newline after the content
+		return data
+
+
+def scan_git(repo: Union[str, Path], revision: str = "HEAD", since: str = None,
+			 workers: int = None, chunk_size: int = 64,
+			 filter: CommentFilter = None) -> Iterator[FileComments]:
+	"""Finds comments in the files of a `revision` of the local git
+	repository at `repo`, without a checkout. The files are read from the
+	git objects, the working tree is not used at all.
+
+	With `since` (another revision) only the files added or modified
+	between `since` and `revision` are parsed.
+
+	Yields a `FileComments` for each file with a known format, in the order
+	of git. The paths are relative to the root of the repository. The files
+	are decoded as UTF-8, the line endings are not translated. `workers`,
+	`chunk_size` and `filter` are as in `scan_tree`. A file whose object
+	git cannot read is reported with a `FileError` in `FileComments.error`.
+
+	Raises subprocess.CalledProcessError if git cannot list the files (for
+	example, the revision does not exist).
+	"""
+	repo = str(repo)
+	if since is None:
+		files = _tree_files(repo, revision)
+	else:
+		files = _changed_files(repo, since, revision)
+	files = ((path, blob) for path, blob in files if known_format(path))
+	with _CatFile(repo) as cat:
+		blobs = ((path, cat.read(blob)) for path, blob in files)
+		for result in scan_blobs(blobs, workers, chunk_size, filter):
+			yield result
@@ -0,0 +1,72 @@
+# SPDX-FileCopyrightText: Copyright (c) 2021 Artёm IG <github.com/rtmigo>
+# SPDX-License-Identifier: BSD-3-Clause
+
+# The members are read one by one, in the order of the archive, and handed
+# to scan_blobs as soon as they are read. A tar archive is read as a
+# stream ("r|*"), so it may be compressed or come from a pipe. A zip
+# archive needs a seekable file: its directory is at the end.
+
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Union
+
+from .x01_filter import CommentFilter
+from .x02_detector import known_format
+from .x03_pipeline import FileComments
+from .x08_blobs import Blob, scan_blobs
+
+
+def _tar_blobs(archive: tarfile.TarFile) -> Iterator[Blob]:
+	for member in archive:
+		if member.isfile() and known_format(member.name):
+			file = archive.extractfile(member)
+			assert file is not None
+			yield member.name, file.read()
+
+
+def _zip_blobs(archive: zipfile.ZipFile) -> Iterator[Blob]:
+	for info in archive.infolist():
+		if not info.is_dir() and known_format(info.filename):
+			yield info.filename, archive.read(info)
+
+
+def _is_zip(file: Union[str, Path, BinaryIO]) -> bool:
+	if isinstance(file, (str, Path)):
+		return zipfile.is_zipfile(file)
+	if not file.seekable():
+		return False
+	position = file.tell()
+	try:
+		return zipfile.is_zipfile(file)
+	finally:
+		file.seek(position)
+
+
+def scan_archive(file: Union[str, Path, BinaryIO], workers: int = None,
+				 chunk_size: int = 64,
+				 filter: CommentFilter = None) -> Iterator[FileComments]:
+	"""Finds comments in the files inside a tar (plain or compressed) or zip
+	archive without extracting it. `file` is a path or a binary file
+	object.
+
+	Yields a `FileComments` for each member with a known format, in the
+	order of the archive. `FileComments.path` is the path of the member
+	inside the archive. The members are decoded as UTF-8, the line endings
+	are not translated. `workers`, `chunk_size` and `filter` are as in
+	`scan_tree`. With `workers=1` only one member is kept in memory at a
+	time; with a pool, a few chunks per worker.
+
+	Raises tarfile.TarError or zipfile.BadZipFile if the archive cannot be
+	read.
+	"""
+	if _is_zip(file):
+		with zipfile.ZipFile(file) as zip_archive:
+			yield from scan_blobs(_zip_blobs(zip_archive), workers, chunk_size, filter)
+		return
+	if isinstance(file, (str, Path)):
+		tar_archive = tarfile.open(file, "r|*")
+	else:
+		tar_archive = tarfile.open(fileobj=file, mode="r|*")
+	with tar_archive:
+		yield from scan_blobs(_tar_blobs(tar_archive), workers, chunk_size, filter)